@@ -0,0 +1,102 @@
+"""Shared helpers for the benchmarks: timing, percentiles, JSON results.
+
+Every benchmark writes its results as JSON (by default to
+benchmarks/results/<suite>-<commit>.json) with enough metadata — commit,
+python version, machine — to tell runs apart. Compare two runs with:
+
+    python -m benchmarks.compare benchmarks/results/micro-abc1234.json benchmarks/results/micro-def5678.json
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+def summarize(samples_ms):
+    """Latency summary (ms) for a list of samples in ms."""
+    return {
+        "n": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "p50_ms": round(percentile(samples_ms, 50), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+    }
+
+def time_calls(fn, min_runs=5, min_seconds=0.5, max_runs=10000):
+    """Call fn repeatedly (after one warm-up call) and summarize the timings.
+
+    Runs at least min_runs times and until min_seconds have passed, so fast
+    functions get enough samples and slow ones don't take forever.
+    """
+    fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_seconds):
+        call_started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - call_started) * 1000)
+    return summarize(samples)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def use_scratch_sqlite():
+    """Point the app (storage + sessions) at throwaway sqlite files, with rate
+    limits off (call before the app touches storage).
+
+    Returns:
+        str: The database path.
+    """
+    scratch = tempfile.mkdtemp(prefix="promptl-bench-")
+    path = os.path.join(scratch, "bench.db")
+    os.environ["PROMPTL_STORAGE"] = "sqlite"
+    os.environ["PROMPTL_SQLITE_PATH"] = path
+    os.environ["PROMPTL_SESSION_DB"] = os.path.join(scratch, "sessions.db")
+    os.environ["PROMPTL_SEARCH_DB"] = os.path.join(scratch, "search.db")
+    os.environ["PROMPTL_DRAFTS_DB"] = os.path.join(scratch, "drafts.db")
+    # the load test is one client hammering the app — measure it, don't throttle it
+    os.environ["PROMPTL_RATELIMIT"] = "off"
+    os.environ["PROMPTL_SHED_LOAD"] = "0"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    return path
+
+def save_results(suite, results, output=None):
+    """Write a suite's results (plus run metadata) as JSON.
+
+    Returns:
+        str: Where they were written.
+    """
+    commit = git_commit()
+    report = {
+        "suite": suite,
+        "commit": commit,
+        "ran_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{suite}-{commit}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    return output
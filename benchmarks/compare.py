@@ -0,0 +1,61 @@
+"""Diff two benchmark result files (e.g. from two commits).
+
+    python -m benchmarks.compare OLD.json NEW.json [--metric p50_ms] [--threshold 10]
+
+Lists every case in both files with its old/new value and the % change,
+flagging changes past the threshold. Exits 1 if anything got slower by
+more than the threshold, so it can gate CI.
+"""
+
+import argparse
+import json
+import sys
+
+def _cases(results, prefix=""):
+    """Flatten a results dict to {case name: summary} (summaries hold 'p50_ms' etc.)."""
+    cases = {}
+    for name, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            cases[prefix + name] = value
+        elif isinstance(value, dict):
+            cases.update(_cases(value, prefix + name + "/"))
+    return cases
+
+def compare(old, new, metric="p50_ms", threshold=10.0):
+    """Compare two result reports.
+
+    Returns:
+        list: (case, old value, new value, % change, flag) rows.
+    """
+    old_cases, new_cases = _cases(old["results"]), _cases(new["results"])
+    rows = []
+    for case in old_cases.keys() & new_cases.keys():
+        before, after = old_cases[case][metric], new_cases[case][metric]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = "slower" if change > threshold else "faster" if change < -threshold else ""
+        rows.append((case, before, after, change, flag))
+    return sorted(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms", help="summary field to compare (p50_ms, p95_ms, p99_ms, mean_ms)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="%% change that counts as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    rows = compare(old, new, metric=args.metric, threshold=args.threshold)
+    print(f"{old.get('commit')} → {new.get('commit')}  ({args.metric})")
+    for case, before, after, change, flag in rows:
+        print(f"{case:<40} {before:>10.3f} → {after:>10.3f}  {change:+7.1f}%  {flag}")
+
+    if any(flag == "slower" for *_, flag in rows):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
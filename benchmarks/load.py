@@ -0,0 +1,105 @@
+"""End-to-end load scenario against a local sqlite stand-in.
+
+Each virtual user logs in once (through a stubbed token verifier, so no
+firebase is needed), then loops home → save-writing → prior-pieces, all
+through flask's test client on a thread pool. Run from the project root:
+
+    python -m benchmarks.load [--users 20] [--iterations 10] [--threads 8] [--output results.json]
+
+Reports throughput plus p50/p95/p99 per step and overall, and writes them
+as JSON (see benchmarks/common.py).
+
+note: the app runs in-process (no gunicorn, no network), so this measures
+the app + storage layer itself, not the server in front of it.
+"""
+
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import save_results, summarize, use_scratch_sqlite
+
+STEPS = ["login", "home", "save-writing", "prior-pieces"]
+STORY_FILLER = " and then the story kept going for a good while longer."
+
+def _stub_verifier(id_token):
+    """Stands in for firebase: every token is valid and is its own uid."""
+    return {"uid": id_token, "email": f"{id_token}@bench.local"}
+
+def _prompt_words(html):
+    # index.html shows the five prompt words in <b> tags inside .flex-item
+    return re.findall(r'<div class="flex-item[^"]*">\s*<img[^>]*>\s*<b>([^<]*)</b>', html)
+
+def _virtual_user(app, uid, iterations):
+    """Run one user's session. Returns {step: [latencies ms]} and an error count."""
+    client = app.test_client()
+    timings = {step: [] for step in STEPS}
+    errors = 0
+
+    def timed(step, call):
+        nonlocal errors
+        started = time.perf_counter()
+        response = call()
+        timings[step].append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors += 1
+        return response
+
+    timed("login", lambda: client.post("/auth/session", json={"idToken": uid}))
+    for i in range(iterations):
+        home = timed("home", lambda: client.get("/home"))
+        story = " ".join(_prompt_words(home.get_data(as_text=True))) + STORY_FILLER * 3
+        timed("save-writing", lambda: client.post("/save-writing", data={"title": f"story {i}", "story": story}))
+        timed("prior-pieces", lambda: client.get("/prior-pieces"))
+    return timings, errors
+
+def run(users=20, iterations=10, threads=8):
+    use_scratch_sqlite()
+    import utils.database as db
+    from main import app
+
+    db.verify_id_token = _stub_verifier
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(_virtual_user, app, f"bench-user-{n}", iterations) for n in range(users)]
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    all_samples = {step: [] for step in STEPS}
+    errors = 0
+    for timings, user_errors in outcomes:
+        errors += user_errors
+        for step, samples in timings.items():
+            all_samples[step].extend(samples)
+    requests = sum(len(samples) for samples in all_samples.values())
+
+    return {
+        "config": {"users": users, "iterations": iterations, "threads": threads},
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "overall": summarize([s for samples in all_samples.values() for s in samples]),
+        "steps": {step: summarize(samples) for step, samples in all_samples.items()},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test on a scratch sqlite database.")
+    parser.add_argument("--users", type=int, default=20, help="virtual users")
+    parser.add_argument("--iterations", type=int, default=10, help="home → save → archive loops per user")
+    parser.add_argument("--threads", type=int, default=8, help="users running at once")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = run(users=args.users, iterations=args.iterations, threads=args.threads)
+    print(f"{results['requests']} requests in {results['seconds']}s "
+          f"({results['requests_per_second']} req/s), {results['errors']} errors")
+    for step, summary in results["steps"].items():
+        print(f"{step:<14} p50 {summary['p50_ms']:>8.2f} ms   p95 {summary['p95_ms']:>8.2f} ms   "
+              f"p99 {summary['p99_ms']:>8.2f} ms")
+    print(f"results written to {save_results('load', results, args.output)}")
+
+if __name__ == "__main__":
+    main()
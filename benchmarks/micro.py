@@ -0,0 +1,116 @@
+"""Micro-benchmarks: prompt generation, scoring + content compression across story sizes, template rendering.
+
+Nothing here touches storage. Run from the project root:
+
+    python -m benchmarks.micro [--quick] [--output results.json]
+
+Prints one line per case and writes everything as JSON (see
+benchmarks/common.py) so runs can be diffed between commits.
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import save_results, time_calls, use_scratch_sqlite
+
+STORY_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]   # chars
+ARCHIVE_SIZES = [10, 100, 1_000, 10_000]                  # stories on the page
+FILLER_WORDS = "the a once upon time there was and then suddenly every day of course".split()
+
+def make_story(size, story_prompts, seed=0):
+    """A story of about `size` chars, with the prompts sprinkled through it."""
+    rng = random.Random(seed)
+    words = FILLER_WORDS + list(story_prompts.values())
+    pieces, length = [], 0
+    while length < size:
+        word = rng.choice(words)
+        pieces.append(word)
+        length += len(word) + 1
+    return " ".join(pieces)[:size]
+
+def make_listing(count):
+    """`count` stories shaped the way /prior-pieces hands them to its template."""
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": f"story{i:06d}",
+            "title": f"Story number {i}",
+            "word_count": 100 + i % 400,
+            "points_earned": (i * 7) % 85,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+def bench_prompts():
+    import utils.prompts as prompts
+    return {"gen_all_prompts": time_calls(prompts.gen_all_prompts)}
+
+def bench_scoring(sizes):
+    import utils.model as model
+    import utils.prompts as prompts
+
+    story_prompts = prompts.gen_all_prompts()
+    results = {}
+    for size in sizes:
+        story = make_story(size, story_prompts)
+        results[f"calculate_points/{size}"] = time_calls(lambda: model.calculate_points(story_prompts, story))
+        results[f"get_story_metrics/{size}"] = time_calls(lambda: model.get_story_metrics(story, story_prompts))
+    return results
+
+def bench_content(sizes):
+    # what compressed storage adds to a save (compress) and to /read-story (decompress)
+    import utils.compression as compression
+    import utils.prompts as prompts
+
+    story_prompts = prompts.gen_all_prompts()
+    results = {}
+    for size in sizes:
+        story = make_story(size, story_prompts)
+        packed = compression.compress_content(story)
+        results[f"compress_content/{size}"] = time_calls(lambda: compression.compress_content(story))
+        results[f"decompress_content/{size}"] = time_calls(lambda: compression.decompress_content(packed))
+    return results
+
+def bench_templates(counts):
+    # main imports the storage layer, which wants a backend configured
+    use_scratch_sqlite()
+    from flask import render_template
+
+    from main import app
+
+    results = {}
+    with app.test_request_context("/prior-pieces"):
+        for count in counts:
+            stories = make_listing(count)
+            results[f"prior-pieces.html/{count}"] = time_calls(
+                lambda: render_template("prior-pieces.html", stories=stories, next_page="x", prev_page="y"),
+                min_runs=3,
+            )
+    return results
+
+def run(quick=False):
+    story_sizes = STORY_SIZES[:3] if quick else STORY_SIZES
+    archive_sizes = ARCHIVE_SIZES[:3] if quick else ARCHIVE_SIZES
+
+    results = {}
+    results.update(bench_prompts())
+    results.update(bench_scoring(story_sizes))
+    results.update(bench_content(story_sizes))
+    results.update(bench_templates(archive_sizes))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for prompts, scoring and templates.")
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick)
+    for name, summary in results.items():
+        print(f"{name:<32} p50 {summary['p50_ms']:>10.3f} ms   p99 {summary['p99_ms']:>10.3f} ms   (n={summary['n']})")
+    print(f"results written to {save_results('micro', results, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Story save latency: the old 3-call save vs the single-commit add_story.
+
+Run from the project root against the configured storage backend — point
+it at the firestore emulator (FIRESTORE_EMULATOR_HOST) or a scratch sqlite
+file, never production:
+
+    PROMPTL_STORAGE=sqlite PROMPTL_SQLITE_PATH=/tmp/bench.db python -m benchmarks.save_latency
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.save_latency --saves 500
+
+Prints p50/p99 (ms) for both paths plus the speedup, and the same numbers
+as JSON on the last line.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+import utils.database as db
+import utils.prompts as prompts
+from benchmarks.common import summarize
+from utils.sqlite_store import SQLiteStore
+from utils.storage import backend_class, next_streak
+
+STORY = "Once upon a time a story was saved to the database over and over again. " * 20
+
+def _legacy_add_story_firestore(store, uid, story_doc):
+    """The pre-batch save: add(), then get() the user, then update() it."""
+    from firebase_admin import firestore
+
+    user_ref = store._users().document(uid)
+    user_ref.collection("stories").add(story_doc)
+    user = user_ref.get().to_dict()
+    now = datetime.now(timezone.utc)
+    user_ref.update({
+        "totalPoints": firestore.Increment(story_doc["pointsEarned"]),
+        "totalWords": firestore.Increment(story_doc["wordCount"]),
+        "currentStreak": next_streak(user.get("lastStoryDate"), user.get("currentStreak"), now.date()),
+        "lastStoryDate": now,
+    })
+
+def _legacy_add_story_sqlite(store, uid, story_doc):
+    """Same three separate round trips, each its own sqlite commit."""
+    from utils.sqlite_store import _new_story_id, _to_db_time
+
+    conn = store._conn()
+    now = datetime.now(timezone.utc)
+    conn.execute(
+        "INSERT INTO stories (id, uid, title, content, prompts, wordCount, pointsEarned, createdAt)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (_new_story_id(), uid, story_doc["title"], story_doc["content"], json.dumps(story_doc["prompts"]),
+         story_doc["wordCount"], story_doc["pointsEarned"], _to_db_time(now)),
+    )
+    user = store.get_user(uid)
+    conn.execute(
+        "UPDATE users SET totalPoints = totalPoints + ?, totalWords = totalWords + ?,"
+        " currentStreak = ?, lastStoryDate = ? WHERE uid = ?",
+        (story_doc["pointsEarned"], story_doc["wordCount"],
+         next_streak(user["lastStoryDate"], user["currentStreak"], now.date()), _to_db_time(now), uid),
+    )
+
+def run(saves=200, uid="bench-save-latency"):
+    """Time `saves` story saves through each path.
+
+    Returns:
+        dict: {"before": {...}, "after": {...}, "p50_speedup": x, "p99_speedup": y}
+    """
+    store = db.get_store()
+    # by the configured backend, not isinstance — with PROMPTL_METRICS=1 the
+    # store is wrapped in metrics' timing proxy
+    legacy = _legacy_add_story_sqlite if backend_class() is SQLiteStore else _legacy_add_story_firestore
+    store.get_or_create_user(uid, f"{uid}@example.com")
+
+    story_prompts = prompts.gen_all_prompts()
+    story_doc = {
+        "title": "benchmark story",
+        "content": STORY,
+        "prompts": story_prompts,
+        "wordCount": len(STORY.split()),
+        "pointsEarned": 25,
+    }
+
+    results = {}
+    for label, save in (
+        ("before", lambda: legacy(store, uid, dict(story_doc, createdAt=datetime.now(timezone.utc)))),
+        ("after", lambda: store.add_story(uid, story_doc["title"], story_doc["content"], story_prompts,
+                                          story_doc["wordCount"], story_doc["pointsEarned"])),
+    ):
+        save()  # warm up connections before timing
+        samples = []
+        for _ in range(saves):
+            started = time.perf_counter()
+            save()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[label] = summarize(samples)
+
+    results["p50_speedup"] = round(results["before"]["p50_ms"] / results["after"]["p50_ms"], 2)
+    results["p99_speedup"] = round(results["before"]["p99_ms"] / results["after"]["p99_ms"], 2)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare story save latency before/after batching.")
+    parser.add_argument("--saves", type=int, default=200, help="saves to time per path")
+    args = parser.parse_args(argv)
+
+    results = run(saves=args.saves)
+    for label in ("before", "after"):
+        r = results[label]
+        print(f"{label:>6}: p50 {r['p50_ms']:.2f} ms   p99 {r['p99_ms']:.2f} ms   ({r['n']} saves)")
+    print(f"speedup: p50 {results['p50_speedup']}x   p99 {results['p99_speedup']}x")
+    print(json.dumps(results))
+
+if __name__ == "__main__":
+    main()
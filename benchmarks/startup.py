@@ -0,0 +1,156 @@
+"""Startup report: import cost per module, and time to the first request.
+
+Every measurement runs in a fresh interpreter (startup cost only shows up
+once per process), against a scratch sqlite database. Run from the
+project root:
+
+    python -m benchmarks.startup [--runs 5] [--top 15] [--output results.json]
+
+Reports:
+  - imports: `python -X importtime -c "import main"`, as the median over
+    the runs — total, self time per top-level package, and the slowest
+    modules by cumulative time
+  - cold: a plain process — import main, then the first two requests: a
+    login (token check + user read/create) and /prizes (template render +
+    leaderboard reads), each timed on its own
+  - preloaded: the same, but with utils/startup.py's preload() +
+    warm_worker() run first, which is what a gunicorn worker has done
+    before it accepts anything (see gunicorn.conf.py)
+
+`login` + `first_page` in cold vs preloaded is the drop the first users
+of a fresh worker see. The results are JSON (see benchmarks/common.py),
+so two commits can be diffed with benchmarks.compare.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.common import save_results, summarize, use_scratch_sqlite
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in the child; prints its phase timings (ms) as one JSON line
+FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+if sys.argv[1] == "preloaded":
+    from utils import startup
+    startup.preload(main.app)
+    startup.warm_worker()
+warmed = time.perf_counter()
+
+# tokens are checked by a stub (no firebase), the same one benchmarks/load.py uses
+import utils.database as db
+from benchmarks.load import _stub_verifier
+db.verify_id_token = _stub_verifier
+
+client = main.app.test_client()
+response = client.post("/auth/session", json={"idToken": "startup-user"})
+assert response.status_code == 200, response.status_code
+logged_in = time.perf_counter()
+response = client.get("/prizes")
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({
+    "import": (imported - started) * 1000,
+    "warm_up": (warmed - imported) * 1000,
+    "login": (logged_in - warmed) * 1000,
+    "first_page": (done - logged_in) * 1000,
+    "total": (done - started) * 1000,
+}))
+"""
+
+def _run_child(args):
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True,
+        cwd=PROJECT_ROOT, env=os.environ.copy(),
+    )
+
+def parse_importtime(output):
+    """Parse `-X importtime` stderr into {module: (self µs, cumulative µs)}."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def import_costs(runs=5, top=15):
+    """Median import cost of `import main`, by package and by module (ms)."""
+    samples = defaultdict(lambda: ([], []))
+    for _ in range(runs):
+        stderr = _run_child(["-X", "importtime", "-c", "import main"]).stderr
+        for module, (self_us, cumulative_us) in parse_importtime(stderr).items():
+            samples[module][0].append(self_us / 1000)
+            samples[module][1].append(cumulative_us / 1000)
+
+    medians = {
+        module: (statistics.median(self_ms), statistics.median(cumulative_ms))
+        for module, (self_ms, cumulative_ms) in samples.items()
+    }
+    by_package = defaultdict(float)
+    for module, (self_ms, _) in medians.items():
+        by_package[module.split(".")[0]] += self_ms
+    slowest = sorted(medians.items(), key=lambda item: item[1][1], reverse=True)[:top]
+
+    return {
+        "total_ms": round(medians.get("main", (0, 0))[1], 2),
+        "by_package_ms": {
+            package: round(ms, 2)
+            for package, ms in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "slowest_modules": [
+            {"module": module, "self_ms": round(self_ms, 2), "cumulative_ms": round(cumulative_ms, 2)}
+            for module, (self_ms, cumulative_ms) in slowest
+        ],
+    }
+
+def first_request(mode, runs=5):
+    """Phase timings (import, warm_up, login, first_page, total) over fresh processes."""
+    phases = defaultdict(list)
+    for _ in range(runs):
+        timings = json.loads(_run_child(["-c", FIRST_REQUEST_SCRIPT, mode]).stdout.splitlines()[-1])
+        for phase, ms in timings.items():
+            phases[phase].append(ms)
+    return {phase: summarize(samples) for phase, samples in phases.items()}
+
+def run(runs=5, top=15):
+    # the children inherit this env, so they all share one scratch database
+    use_scratch_sqlite()
+    return {
+        "imports": import_costs(runs=runs, top=top),
+        "cold": first_request("cold", runs=runs),
+        "preloaded": first_request("preloaded", runs=runs),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import cost + time-to-first-request report.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=15, help="packages/modules to list")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = run(runs=args.runs, top=args.top)
+    imports = results["imports"]
+    print(f"import main: {imports['total_ms']:.1f} ms")
+    print("self time by package:")
+    for package, ms in imports["by_package_ms"].items():
+        print(f"  {package:<28} {ms:>8.2f} ms")
+    print("slowest modules (cumulative):")
+    for row in imports["slowest_modules"]:
+        print(f"  {row['module']:<40} {row['cumulative_ms']:>8.2f} ms  (self {row['self_ms']:.2f})")
+    for mode in ("cold", "preloaded"):
+        phases = results[mode]
+        print(f"{mode:<10} " + "   ".join(f"{phase} {summary['p50_ms']:.1f} ms" for phase, summary in phases.items()))
+    print(f"results written to {save_results('startup', results, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# gunicorn settings for render (gunicorn main:app -c gunicorn.conf.py)
+#
+# the app is imported once in the master and forked into the workers, so
+# the imports + warm-up below are paid once per deploy instead of once per
+# worker — and never by a user's first request. see utils/startup.py for
+# what's safe to do before the fork and what has to wait until after.
+
+# gthread workers: a request waiting on firestore only parks a cheap thread,
+# so each worker keeps many requests in flight (see utils/database_async.py)
+worker_class = "gthread"
+threads = 16
+
+preload_app = True
+
+def when_ready(server):
+    # master, after main:app is loaded and before any worker forks
+    from main import app
+    from utils import startup
+
+    startup.preload(app)
+
+def post_worker_init(worker):
+    # each worker, right after the fork
+    from utils import startup
+
+    startup.warm_worker()
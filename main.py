@@ -1,34 +1,88 @@
 """Promptl Flask backend — routes for prompts, stories, and auth."""
 
-from flask import Flask, request, session, redirect, url_for, render_template, jsonify
+from flask import Flask, Response, request, session, redirect, url_for, render_template, jsonify
 from datetime import timedelta
+import logging
 import os
-from dotenv import load_dotenv
 
+import asyncio
+import utils.env  # noqa: F401 — loads .env first; some utils read settings at import time
 import utils.prompts as prompts
 import utils.model as model
 import utils.database as db
+import utils.database_async as adb
+import utils.metrics as metrics
+import utils.assets as assets
+import utils.sessions as sessions
+import utils.journal as journal
+import utils.search as search
+import utils.export as export
+import utils.compression as compression
+import utils.ratelimit as ratelimit
+import utils.drafts as drafts
+from utils.live_score import OutOfSync, live_sessions
+from utils.page_cache import cached_response, dont_cache
 
-load_dotenv()
+# leveled logs instead of prints — PROMPTL_LOG_LEVEL=DEBUG shows per-story scoring too
+logging.basicConfig(
+    level=os.getenv("PROMPTL_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # keep users logged in for a week
 
+# request/db/scoring/template timings at /metrics (only with PROMPTL_METRICS=1)
+metrics.init_app(app)
+
+# sessions live server-side; the cookie is just an id (PROMPTL_SESSIONS, see utils/sessions.py)
+sessions.init_app(app)
+
+# asset_url() for templates + fingerprinted, precompressed /dist/ (built by python -m utils.assets)
+assets.init_app(app)
+
+# per-client budgets (429) + per-worker concurrency caps (503) on the expensive routes
+ratelimit.init_app(app)
+
 # ─────────────────────────────────────────────────────────────
 # AUTH HELPER
 # ─────────────────────────────────────────────────────────────
 
-def get_current_user():
+async def get_current_user():
     """Get the currently logged-in user from session, or None."""
     uid = session.get("uid")
     if not uid:
         return None
-    return db.get_user(uid)
+    return await adb.get_user(uid)
+
+def get_session_prompts():
+    """Get the prompts the user is currently writing with, or None.
+
+    The session only holds a small prompt key (see prompts.gen_prompt_key),
+    which we expand back into the full prompt dict here.
+    """
+    key = session.get("prompt_key")
+    if key is not None:
+        return prompts.prompts_from_key(key)
+    # sessions created before prompt keys still carry the full dict
+    return session.get("current_prompts")
 
 def require_login(view_func):
-    """Decorator: redirect to login if user isn't authenticated."""
+    """Decorator: redirect to login if user isn't authenticated.
+
+    Works on both regular and async views (flask needs the wrapper to be
+    async too, or it won't await the view).
+    """
     from functools import wraps
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            if not session.get("uid"):
+                return redirect(url_for("login"))
+            return await view_func(*args, **kwargs)
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(*args, **kwargs):
         if not session.get("uid"):
@@ -46,20 +100,21 @@ def index():
     # we pass `logged_in` to the template so the hero CTA can switch between
     # "sign up" (for new visitors) and "continue to your account" (for returning users)
     logged_in = bool(session.get("uid"))
-    return render_template("landing.html", logged_in=logged_in)
+    # public pages render the same for everyone, so they're cached whole (see utils/page_cache.py)
+    return cached_response(("landing", logged_in), lambda: render_template("landing.html", logged_in=logged_in))
 
 @app.route('/login')
 def login():
     """Show the login page (frontend handles firebase auth)."""
-    return render_template("login.html")
+    return cached_response(("login",), lambda: render_template("login.html"))
 
 @app.route('/signup')
 def signup():
     """Show the signup page."""
-    return render_template("signup.html")
+    return cached_response(("signup",), lambda: render_template("signup.html"))
 
 @app.route('/auth/session', methods=['POST'])
-def create_session():
+async def create_session():
     """Receive a firebase ID token from frontend, verify it, and set session.
     
     Flow: user logs in via firebase JS SDK on the frontend → frontend gets
@@ -67,6 +122,11 @@ def create_session():
     
     From this point on, the user is "logged in" to flask, and we can use
     session['uid'] to identify them on every request.
+
+    The user doc is fetched WHILE the token is being verified (using the
+    uid from the not-yet-verified token), so a returning user's login costs
+    one round trip instead of two. The prefetched doc is only used if the
+    verified uid matches.
     """
     data = request.get_json()
     id_token = data.get("idToken")
@@ -74,19 +134,28 @@ def create_session():
     if not id_token:
         return jsonify({"error": "missing idToken"}), 400
     
-    # verify the token cryptographically with firebase
-    decoded = db.verify_id_token(id_token)
+    # verify the token cryptographically with firebase, and (speculatively)
+    # load the user doc at the same time
+    claimed_uid = adb.peek_token_uid(id_token)
+    verify_task = adb.verify_id_token(id_token)
+    if claimed_uid:
+        decoded, prefetched_user = await asyncio.gather(verify_task, adb.get_user(claimed_uid))
+    else:
+        decoded, prefetched_user = await verify_task, None
     if not decoded:
         return jsonify({"error": "invalid token"}), 401
     
-    # token is valid — extract user info and create/fetch their firestore doc
+    # token is valid — extract user info and create/fetch their user doc
     uid = decoded["uid"]
     email = decoded.get("email", "")
     display_name = decoded.get("name")  # populated for google sign-in
     
-    db.get_or_create_user(uid, email, display_name)
+    if prefetched_user is None or uid != claimed_uid:
+        await adb.get_or_create_user(uid, email, display_name)
     
-    # set flask session — this cookie keeps them logged in across requests
+    # set flask session — this cookie keeps them logged in across requests.
+    # a fresh session id on login, so one planted beforehand is worthless
+    sessions.regenerate(session)
     session.permanent = True
     session["uid"] = uid
     
@@ -105,9 +174,23 @@ def logout():
 @app.route('/home')
 @require_login
 def home():
-    """Home page — generates fresh prompts and shows the writing form."""
-    story_prompts = prompts.gen_all_prompts()
-    session['current_prompts'] = story_prompts
+    """Home page — shows the writing form, with fresh prompts or the autosaved draft."""
+    # an unfinished draft comes back with the prompts it was written for,
+    # so a reload no longer loses the story (see utils/drafts.py)
+    draft = drafts.get_draft(session["uid"])
+    if draft and not (draft["title"].strip() or draft["text"].strip()):
+        draft = None  # they deleted everything — deal fresh prompts
+
+    # store only the prompt key in the (cookie) session — it's a single int
+    # instead of the whole dict, and expands back into the same prompts later
+    prompt_key = draft["prompt_key"] if draft else None
+    story_prompts = prompts.prompts_from_key(prompt_key) if prompt_key is not None else None
+    if story_prompts is None:
+        # no draft, or its key is from before the word lists changed
+        prompt_key = prompts.gen_prompt_key()
+        story_prompts = prompts.prompts_from_key(prompt_key)
+    session['prompt_key'] = prompt_key
+    session.pop('current_prompts', None)
     
     return render_template(
         'index.html',
@@ -116,22 +199,24 @@ def home():
         place=story_prompts['location'],
         object=story_prompts['object'],
         bonus=story_prompts['bonus'],
+        draft=draft,
     )
 
 @app.route('/new-prompt')
 @require_login
 def new_prompt():
-    """Reload home to get fresh prompts."""
+    """Drop the current draft and reload home to get fresh prompts."""
+    drafts.clear_draft(session["uid"])
     return redirect(url_for("home"))
 
 @app.route('/about')
 def about_page():
     """About page (public — no login required)."""
-    return render_template('about.html')
+    return cached_response(("about",), lambda: render_template('about.html'))
 
 @app.route('/save-writing', methods=['POST'])
 @require_login
-def save_writing():
+async def save_writing():
     """Process a submitted story: calculate metrics, save to db, show congrats."""
     written_raw = request.form.get('story', '').strip()
     title = request.form.get('title', '').strip()
@@ -140,43 +225,175 @@ def save_writing():
         return redirect(url_for("home"))
     
     # get the prompts that were active when the user started writing
-    # (we stored them in session when home loaded)
-    story_prompts = session.get('current_prompts')
+    # (we stored their key in session when home loaded)
+    story_prompts = get_session_prompts()
     if not story_prompts:
         # fallback shouldn't normally happen, but just in case
         story_prompts = prompts.gen_all_prompts()
     
-    # calculate word count + points
-    metrics = model.get_story_metrics(written_raw, story_prompts)
-    
-    # save to firestore (also updates user stats + streak)
+    # calculate word count + points — in a thread, while the user doc loads
+    # (add_story uses the cached doc to commit without another read)
     uid = session["uid"]
-    db.add_story(
-        uid=uid,
-        title=title,
-        story_content=written_raw,
-        prompts=story_prompts,
-        word_count=metrics['word_count'],
-        points_earned=metrics['points'],
+    story_metrics, _ = await asyncio.gather(
+        asyncio.to_thread(model.get_story_metrics, written_raw, story_prompts),
+        adb.get_user(uid),
     )
     
-    # clear the prompts so reloading congrats doesn't reuse them
+    if journal.ENABLED:
+        # write-behind: once it's fsynced to the local journal the story is
+        # safe, and a background thread saves it (see utils/journal.py)
+        journal.append_story(uid, title, written_raw, story_prompts,
+                             story_metrics['word_count'], story_metrics['points'])
+    else:
+        # save to the database (also updates user stats + streak)
+        await adb.add_story(
+            uid=uid,
+            title=title,
+            story_content=written_raw,
+            prompts=story_prompts,
+            word_count=story_metrics['word_count'],
+            points_earned=story_metrics['points'],
+        )
+    
+    # clear the prompts (and the draft) so reloading congrats doesn't reuse them
+    drafts.clear_draft(uid)
+    live_sessions.discard((uid, session.get('prompt_key')))
+    session.pop('prompt_key', None)
     session.pop('current_prompts', None)
     
     return render_template(
         "congrats.html",
         title=title,
-        story_len=metrics['word_count'],
-        points=metrics['points'],
-        words=metrics['num_used_prompts'],
+        story_len=story_metrics['word_count'],
+        points=story_metrics['points'],
+        words=story_metrics['num_used_prompts'],
         compliment=prompts.gen_compliment(),
     )
 
+@app.route('/api/draft', methods=['POST'])
+def save_draft():
+    """Autosave the draft on the writing form: {"title": "...", "text": "..."}.
+
+    Only queued here — drafts are coalesced and written in batches a couple
+    of seconds later (see utils/drafts.py).
+    """
+    uid = session.get("uid")
+    if not uid:
+        return jsonify({"error": "not logged in"}), 401
+    prompt_key = session.get("prompt_key")
+    if prompt_key is None:
+        return jsonify({"error": "no prompts in session"}), 400
+
+    data = request.get_json(silent=True) or {}
+    title, text = data.get("title", ""), data.get("text")
+    if not isinstance(title, str) or not isinstance(text, str):
+        return jsonify({"error": "bad draft"}), 400
+    try:
+        drafts.autosave(uid, prompt_key, title, text)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify({"saved": True})
+
+@app.route('/api/story-stats', methods=['POST'])
+def story_stats():
+    """Live stats for a draft: word/char/sentence counts, points so far, etc.
+
+    Takes the draft either as a text/plain body (streamed through the
+    analyzer a chunk at a time, never held whole) or as JSON {"story": ...}.
+    Scored against the prompts in the user's session.
+    """
+    if not session.get("uid"):
+        return jsonify({"error": "not logged in"}), 401
+
+    story_prompts = get_session_prompts() or {}
+    if request.mimetype == "text/plain":
+        stats = model.analyze_stream(request.stream, story_prompts,
+                                     encoding=request.mimetype_params.get("charset", "utf-8"))
+    else:
+        data = request.get_json(silent=True) or {}
+        story = data.get("story")
+        if not isinstance(story, str):
+            return jsonify({"error": "missing story"}), 400
+        stats = model.analyze_story(story, story_prompts)
+
+    return jsonify(stats)
+
+@app.route('/api/live-score', methods=['POST'])
+def live_score():
+    """Score the draft on the writing form as it's typed, one edit at a time.
+
+    The first request (and any resync) sends the whole draft:
+        {"text": "..."}
+    after that, each request sends just an edit against the last version:
+        {"version": 12, "offset": 40, "removed": "teh", "inserted": "the"}
+
+    Answers with the draft's new version + score (see LiveScore.results),
+    or 409 if the edit doesn't line up with our copy — the client should
+    then resend the full text.
+    """
+    uid = session.get("uid")
+    if not uid:
+        return jsonify({"error": "not logged in"}), 401
+    story_prompts = get_session_prompts()
+    if not story_prompts:
+        return jsonify({"error": "no prompts in session"}), 400
+
+    data = request.get_json(silent=True) or {}
+    key = (uid, session.get("prompt_key"))
+    try:
+        if "text" in data:
+            if not isinstance(data["text"], str):
+                return jsonify({"error": "bad text"}), 400
+            draft = live_sessions.start(key, story_prompts, data["text"])
+        else:
+            version, offset = data.get("version"), data.get("offset")
+            removed, inserted = data.get("removed", ""), data.get("inserted", "")
+            if not (isinstance(version, int) and isinstance(offset, int)
+                    and isinstance(removed, str) and isinstance(inserted, str)):
+                return jsonify({"error": "bad edit"}), 400
+            draft = live_sessions.get(key)
+            if draft is None:
+                raise OutOfSync()
+            with draft.lock:
+                draft.apply(version, offset, removed, inserted)
+        with draft.lock:
+            return jsonify(draft.results())
+    except OutOfSync:
+        return jsonify({"error": "out of sync, resend the full text"}), 409
+    except ValueError as e:
+        live_sessions.discard(key)
+        return jsonify({"error": str(e)}), 413
+
+@app.route('/prizes')
+@require_login
+def prizes_page():
+    """Prizes page — leaderboards + site-wide totals."""
+    # each board is an indexed top-N read, the totals are a few counters
+    boards = {board: db.get_leaderboard(board) for board in ("points", "streak", "words")}
+    return render_template("prizes.html", boards=boards, site=db.get_site_stats())
+
 @app.route('/prior-pieces')
 @require_login
 def prior_pieces():
-    """Show a read-only archive of the user's past stories."""
-    raw_stories = db.get_user_stories(session["uid"])
+    """Show a read-only archive of the user's past stories, one page at a time."""
+    uid = session["uid"]
+    # ?after=<token> pages to older stories, ?before=<token> back to newer ones
+    after, before = request.args.get("after"), request.args.get("before")
+
+    # the listing only changes when the user saves a story, which bumps their
+    # version — so (uid, version, page) pins down the HTML. the user doc is
+    # normally in the user cache, so a repeat view never touches the database
+    user = db.get_user(uid)
+    if user is None:
+        return render_prior_pieces(uid, after, before)
+    key = ("prior-pieces", uid, user.get("version", 0), after, before)
+    return cached_response(key, lambda: render_prior_pieces(uid, after, before))
+
+def render_prior_pieces(uid, after, before):
+    """Fetch one archive page and render it."""
+    page = db.get_user_stories_page(uid, after=after, before=before)
+    if page.get("error"):
+        dont_cache()  # don't pin an empty archive until the next save
     
     # transform firestore's camelCase fields into snake_case for templates.
     # this keeps templates clean (no knowledge of db field names) and
@@ -189,24 +406,52 @@ def prior_pieces():
             "points_earned": s.get("pointsEarned", 0),
             "created_at": s.get("createdAt"),
         }
-        for s in raw_stories
+        for s in page["stories"]
     ]
     
-    return render_template("prior-pieces.html", stories=stories)
+    return render_template(
+        "prior-pieces.html",
+        stories=stories,
+        next_page=page["next"],
+        prev_page=page["prev"],
+    )
+
+@app.route('/search')
+@require_login
+def search_stories():
+    """Search the user's own stories (titles, text and prompt words), best match first."""
+    query = request.args.get("q", "").strip()
+    # straight off the local full-text index — no story is loaded to search it
+    results = search.search_stories(session["uid"], query) if query else []
+    return render_template("search.html", query=query, results=results)
+
+@app.route('/export')
+@require_login
+def export_stories():
+    """Download the user's whole archive (?format=ndjson or zip), streamed as it's read."""
+    try:
+        body, mimetype, extension = export.export_stream(session["uid"], request.args.get("format", "zip"))
+    except KeyError:
+        return "unknown export format", 400
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=promptl-stories.{extension}",
+        "Cache-Control": "private, no-store",
+    })
 
 @app.route('/read-story/<story_id>')
 @require_login
-def read_story(story_id):
+async def read_story(story_id):
     """Show a single story (read-only)."""
-    raw_story = db.get_story(session["uid"], story_id)
+    raw_story = await adb.get_story(session["uid"], story_id)
     if not raw_story:
         return redirect(url_for("prior_pieces"))
     
     # transform firestore's camelCase to snake_case for the template
+    # (content is stored compressed — this page is the only one that needs it unpacked)
     story = {
         "id": raw_story.get("id"),
         "title": raw_story.get("title"),
-        "content": raw_story.get("content"),
+        "content": compression.decompress_content(raw_story.get("content")),
         "word_count": raw_story.get("wordCount", 0),
         "points_earned": raw_story.get("pointsEarned", 0),
         "prompts": raw_story.get("prompts", {}),
@@ -217,19 +462,20 @@ def read_story(story_id):
 
 @app.route('/my-account')
 @require_login
-def my_account():
+async def my_account():
     """User's profile page with stats."""
-    user = get_current_user()
+    user = await get_current_user()
     if not user:
         return redirect(url_for("login"))
     
-    return render_template(
+    # cached per user version, like /prior-pieces
+    return cached_response(("my-account", user["uid"], user.get("version", 0)), lambda: render_template(
         "my-account.html",
         username=user.get("displayName", "Friend"),
         streak=user.get("currentStreak", 0),
         points=user.get("totalPoints", 0),
         total_words=user.get("totalWords", 0),
-    )
+    ))
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
\ No newline at end of file
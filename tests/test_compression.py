@@ -0,0 +1,65 @@
+import zlib
+
+import pytest
+
+import utils.compression as compression
+from utils.compression import MAGIC, compress_content, decompress_content, is_compressed, stored_size
+from utils.sqlite_store import SQLiteStore
+
+PROSE = "Alice the baker walked down to the harbor with her lantern. " * 40
+
+def test_round_trip():
+    packed = compress_content(PROSE)
+    assert is_compressed(packed) and packed.startswith(MAGIC)
+    assert stored_size(packed) < stored_size(PROSE)
+    assert decompress_content(packed) == PROSE
+
+def test_non_ascii_round_trips():
+    text = "Zoë écrit une histoire — 🐉 " * 30
+    assert decompress_content(compress_content(text)) == text
+
+def test_short_text_stays_plain():
+    assert compress_content("a short story") == "a short story"
+
+def test_text_that_wont_shrink_stays_plain(monkeypatch):
+    # real text nearly always shrinks — use a codec that can't
+    monkeypatch.setattr(compression, "_encode", (compression.ZLIB, lambda data: data))
+    assert compress_content(PROSE) is PROSE
+
+def test_plain_values_read_back_as_is():
+    assert decompress_content("old story") == "old story"
+    assert decompress_content(None) is None
+    assert not is_compressed(b"not marked")
+
+def test_unknown_codec_raises():
+    with pytest.raises(ValueError, match="codec"):
+        decompress_content(MAGIC + b"?" + zlib.compress(b"text"))
+
+def test_codec_none_stores_plain_text(monkeypatch):
+    monkeypatch.setattr(compression, "_encode", None)
+    assert compress_content(PROSE) is PROSE
+
+def test_stored_size():
+    assert stored_size(None) == 0
+    assert stored_size("é") == 2
+    assert stored_size(b"abc") == 3
+
+def test_migrate_compresses_in_place_and_can_rerun(tmp_path):
+    store = SQLiteStore(str(tmp_path / "promptl.db"))
+    store.get_or_create_user("u1", "u1@example.com")
+    long_id, _ = store.add_story("u1", "long", PROSE, {}, 1, 10)
+    short_id, _ = store.add_story("u1", "short", "tiny", {}, 1, 10)
+
+    dry = compression.migrate(store, dry_run=True)
+    assert dry["compressed"] == 1
+    assert store.get_story("u1", long_id)["content"] == PROSE
+
+    totals = compression.migrate(store)
+    assert totals["stories"] == 2 and totals["compressed"] == 1
+    assert totals["after"] < totals["before"]
+    assert is_compressed(store.get_story("u1", long_id)["content"])
+    assert store.get_story("u1", short_id)["content"] == "tiny"
+
+    assert compression.migrate(store)["compressed"] == 0
+    report = compression.report(store)
+    assert report["compressed"] == 1 and report["saved_bytes"] > 0
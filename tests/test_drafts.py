@@ -0,0 +1,76 @@
+import pytest
+
+import utils.drafts as drafts
+from utils.drafts import DraftStore, apply_delta, make_delta, rebuild
+
+@pytest.mark.parametrize("before, after", [
+    ("", ""),
+    ("", "hello"),
+    ("hello", ""),
+    ("the cat sat", "the cat sat down"),
+    ("the cat sat", "a cat sat"),
+    ("the cat sat", "the dog sat"),
+    ("aaaa", "aaaaaa"),
+    ("x" * 10_000 + "middle" + "y" * 10_000, "x" * 10_000 + "center" + "y" * 10_000),
+])
+def test_delta_round_trip(before, after):
+    delta = make_delta(before, after)
+    assert apply_delta(before, delta) == after
+
+def test_delta_only_holds_the_changed_text():
+    before = "x" * 10_000 + "old" + "y" * 10_000
+    assert make_delta(before, before.replace("old", "new")) == [10_000, 10_000, "new"]
+
+def test_rebuild_any_revision():
+    revisions = ["", "Once", "Once upon", "Once upon a time", "Twice upon a time"]
+    deltas = [make_delta(a, b) for a, b in zip(revisions, revisions[1:])]
+    for upto, text in enumerate(revisions):
+        assert rebuild("", deltas, upto) == text
+    assert rebuild("", deltas) == revisions[-1]
+
+@pytest.fixture
+def store(tmp_path):
+    return DraftStore(str(tmp_path / "drafts.db"))
+
+def _save(store, uid, prompt_key, text, title="Title"):
+    store._pending[uid] = (prompt_key, title, text, drafts.time.time())
+    store.flush()
+
+def test_every_flushed_revision_can_be_rebuilt(store):
+    opening = "It was the best of times, it was the worst of times. " * 4
+    texts = [opening, opening + "It was", opening + "It was a dark and stormy night"]
+    for text in texts:
+        _save(store, "u1", 7, text)
+    latest = store.get("u1")
+    assert latest == {"prompt_key": 7, "title": "Title", "text": texts[-1], "revision": 2}
+    assert [store.get("u1", revision)["text"] for revision in range(3)] == texts
+    assert store.get("u1", 3) is None
+
+def test_new_prompts_start_a_new_base(store):
+    _save(store, "u1", 7, "first draft")
+    _save(store, "u1", 8, "something else")
+    assert store.get("u1")["prompt_key"] == 8
+    assert store.get("u1", 0) is None  # the old prompts' revisions are gone
+
+def test_snapshots_once_the_deltas_outweigh_the_base(store, monkeypatch):
+    monkeypatch.setattr(drafts, "MAX_DELTAS", 3)
+    text = "word " * 100
+    for i in range(5):
+        text += f"more {i} "
+        _save(store, "u1", 7, text)
+    assert store.snapshots >= 2  # the first write, then after MAX_DELTAS deltas
+    assert store.get("u1")["text"] == text
+
+def test_pending_autosave_is_read_before_its_flush(store):
+    store._pending["u1"] = (7, "Title", "not flushed yet", drafts.time.time())
+    assert store.get("u1")["text"] == "not flushed yet"
+
+def test_clearing_leaves_a_tombstone_a_stale_autosave_cant_revive(store):
+    received_at = drafts.time.time()
+    _save(store, "u1", 7, "a draft")
+    store.clear("u1")
+    assert store.get("u1") is None
+    # an autosave another worker received before the clear, flushed after it
+    store._pending["u1"] = (7, "Title", "stale", received_at)
+    store.flush()
+    assert store.get("u1") is None
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+import utils.journal as journal_module
+from utils.journal import DEAD_LETTER, Journal, StoreUnavailable, _read_offset
+
+def _entry(story_id, **overrides):
+    entry = {
+        "id": story_id, "uid": "u1", "title": "A title", "content": "Once upon a time.",
+        "prompts": {"noun": "lantern"}, "wordCount": 4, "pointsEarned": 9,
+        "createdAt": "2025-03-14T12:00:00+00:00",
+    }
+    entry.update(overrides)
+    return entry
+
+class FakeStore:
+    """Stands in for db.save_story: saves ids, or fails while `down`."""
+
+    def __init__(self):
+        self.saved = []
+        self.down = False
+
+    def save_story(self, uid, title, content, prompts, word_count, points, story_id=None, created_at=None):
+        if self.down:
+            raise ConnectionError("datastore unavailable")
+        if not isinstance(word_count, int):
+            raise ValueError("wordCount must be an int")
+        self.saved.append(story_id)
+        return story_id
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeStore()
+    monkeypatch.setattr(journal_module.db, "save_story", fake.save_story)
+    return fake
+
+def _segment(tmp_path, entries, extra=b""):
+    path = str(tmp_path / "1-1.log")
+    with open(path, "wb") as f:
+        for entry in entries:
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        f.write(extra)
+    return path
+
+def test_drains_every_whole_line(tmp_path, store):
+    path = _segment(tmp_path, [_entry("a"), _entry("b")], extra=b'{"id": "torn')
+    offset = Journal(str(tmp_path)).drain(path)
+    assert store.saved == ["a", "b"]
+    assert offset == _read_offset(path) == os.path.getsize(path) - len(b'{"id": "torn')
+
+def test_an_outage_stops_the_drain_at_the_failed_entry(tmp_path, store, monkeypatch):
+    path = _segment(tmp_path, [_entry("a"), _entry("b"), _entry("c")])
+    journal = Journal(str(tmp_path))
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(kwargs["story_id"])
+        if kwargs["story_id"] == "b":
+            raise ConnectionError("datastore unavailable")
+        return FakeStore.save_story(store, *args, **kwargs)
+
+    monkeypatch.setattr(journal_module.db, "save_story", flaky)
+    with pytest.raises(StoreUnavailable):
+        journal.drain(path)
+    assert calls == ["a", "b"]  # nothing past the failure was tried
+    with open(path, "rb") as f:
+        first_line = f.readline()
+    assert _read_offset(path) == len(first_line)
+    assert not os.path.exists(tmp_path / DEAD_LETTER)
+
+    # the store is back: the next pass picks up from the failed entry
+    monkeypatch.setattr(journal_module.db, "save_story", store.save_story)
+    journal.drain(path)
+    assert store.saved == ["a", "b", "c"]
+    assert journal.stats()["retries"] == 1 and journal.stats()["dead"] == 0
+
+def test_a_malformed_entry_is_dead_lettered_without_holding_up_the_rest(tmp_path, store):
+    path = _segment(tmp_path, [_entry("a"), _entry("b", wordCount="four")], extra=b"not json\n")
+    with open(path, "ab") as f:
+        f.write((json.dumps(_entry("c")) + "\n").encode("utf-8"))
+    journal = Journal(str(tmp_path))
+    assert journal.drain(path) == os.path.getsize(path)
+    assert store.saved == ["a", "c"]
+    with open(tmp_path / DEAD_LETTER, "rb") as f:
+        dead = f.read().splitlines()
+    assert len(dead) == 2 and dead[1] == b"not json"
+    assert journal.stats()["dead"] == 2
+
+def test_orphan_recovery_leaves_the_segment_while_the_store_is_down(tmp_path, store):
+    path = _segment(tmp_path, [_entry("a")])
+    journal = Journal(str(tmp_path))
+    store.down = True
+    assert journal.recover_orphans() is False
+    assert os.path.exists(path)
+    store.down = False
+    assert journal.recover_orphans() is True
+    assert store.saved == ["a"] and not os.path.exists(path)
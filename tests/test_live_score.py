@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+import utils.live_score as live_score
+from utils.live_score import LiveScore, LiveScoreSessions, OutOfSync, TextBuffer
+from utils.model import calculate_points
+
+PROMPTS = {"name": "Alice", "job": "baker", "object": "lantern", "location": "harbor", "bonus": "an"}
+WORDS = ["Alice", "baker", "lantern", "harbor", "an", "the", "walked", " ", "\n", ".", "lant", "ern", "HAR", "bor"]
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # small chunks + scan steps, so short test texts cross plenty of boundaries
+    monkeypatch.setattr(live_score, "BUFFER_CHUNK_SIZE", 7)
+    monkeypatch.setattr(live_score, "_SCAN_STEP", 3)
+
+def test_text_buffer_edits_match_string_edits():
+    rng = random.Random(5)
+    text = "once upon a time there was a lantern by the harbor"
+    buffer = TextBuffer(text)
+    for _ in range(500):
+        start = rng.randint(0, len(text))
+        end = rng.randint(start, min(len(text), start + 10))
+        inserted = "".join(rng.choice("ab \n") for _ in range(rng.randint(0, 9)))
+        text = text[:start] + inserted + text[end:]
+        buffer.replace(start, end, inserted)
+        assert buffer.text() == text and len(buffer) == len(text)
+        a, b = sorted((rng.randint(0, len(text)), rng.randint(0, len(text))))
+        assert buffer.slice(a, b) == text[a:b]
+
+def _expected(text):
+    scored = calculate_points(PROMPTS, text.strip())
+    return {
+        "word_count": len(text.split()),
+        "char_count": len(text.strip()),
+        "points": scored["points"],
+        "num_used_prompts": scored["num_used_prompts"],
+        "used_prompts": sorted(scored["matches"]),
+    }
+
+def test_edit_by_edit_score_matches_rescoring_the_whole_text():
+    rng = random.Random(11)
+    text = "  Alice walked to the harbor with a lantern.  " * 3
+    draft = LiveScore(PROMPTS, text)
+    for _ in range(1000):
+        offset = rng.randint(0, len(text))
+        end = rng.randint(offset, min(len(text), offset + 8))
+        inserted = "".join(rng.choice(WORDS) for _ in range(rng.randint(0, 3)))
+        draft.apply(draft.version, offset, text[offset:end], inserted)
+        text = text[:offset] + inserted + text[end:]
+        results = draft.results()
+        assert {key: results[key] for key in _expected(text)} == _expected(text)
+    assert draft.buffer.text() == text
+
+def test_versions_must_line_up():
+    draft = LiveScore(PROMPTS, "Alice the baker")
+    version = draft.version
+    draft.apply(version, 0, "", "Hi ")
+    assert draft.version == version + 1
+    with pytest.raises(OutOfSync):
+        draft.apply(version, 0, "", "again")  # made against the old version
+    with pytest.raises(OutOfSync):
+        draft.apply(draft.version, 0, "Bye", "")  # doesn't match the text
+    with pytest.raises(OutOfSync):
+        draft.apply(draft.version, 100, "", "x")  # past the end
+
+def test_drafts_are_capped_in_length(monkeypatch):
+    monkeypatch.setattr(live_score, "MAX_DRAFT_LENGTH", 10)
+    draft = LiveScore(PROMPTS, "0123456789")
+    with pytest.raises(ValueError):
+        draft.apply(draft.version, 10, "", "!")
+    with pytest.raises(ValueError):
+        LiveScore(PROMPTS, "x" * 11)
+
+def test_sessions_evict_the_least_recently_used():
+    sessions = LiveScoreSessions(max_size=2)
+    sessions.start("a", PROMPTS, "")
+    sessions.start("b", PROMPTS, "")
+    sessions.get("a")
+    sessions.start("c", PROMPTS, "")
+    assert sessions.get("b") is None
+    assert sessions.get("a") is not None and sessions.get("c") is not None
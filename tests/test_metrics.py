@@ -0,0 +1,42 @@
+import pytest
+from flask import Flask
+
+import utils.metrics as metrics
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    app = Flask(__name__)
+    metrics.init_app(app)
+    return app.test_client()
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "test", labels=("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/")
+    text = "\n".join(histogram.samples())
+    assert 'test_seconds_bucket{route="/",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{route="/",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{route="/",le="+Inf"} 3' in text
+    assert 'test_seconds_count{route="/"} 3' in text
+
+def test_without_a_token_only_local_scrapes_are_served(client, monkeypatch):
+    monkeypatch.setattr(metrics, "TOKEN", "")
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 404
+
+def test_with_a_token_the_scraper_has_to_send_it(client, monkeypatch):
+    monkeypatch.setattr(metrics, "TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 404
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"},
+                          environ_base={"REMOTE_ADDR": "203.0.113.9"})
+    assert response.status_code == 200
+    assert b"promptl_request_duration_seconds" in response.data
+
+def test_a_second_app_doesnt_duplicate_metrics(client, monkeypatch):
+    registered = len(metrics._registry)
+    metrics.init_app(Flask(__name__))
+    assert len(metrics._registry) == registered
+    names = [metric.name for metric in metrics._registry]
+    assert len(names) == len(set(names))
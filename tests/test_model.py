@@ -0,0 +1,97 @@
+import io
+import random
+
+import pytest
+
+import utils.model as model
+from utils.model import (
+    BONUS_PROMPT_POINTS, LONG_STORY_POINTS, MIN_SCORED_LENGTH, PROMPT_POINTS,
+    PromptMatcher, StoryAnalyzer, analyze_story, analyze_stream, calculate_points, compile_prompts, score_story,
+)
+
+PROMPTS = {"name": "ALICE", "job": "Baker", "object": "lantern", "location": "Harbor", "bonus": "lantern"}
+
+def test_prompts_are_lowercased_and_shared_words_deduplicated():
+    matcher = PromptMatcher(PROMPTS)
+    assert matcher.categories["lantern"] == ["object", "bonus"]
+    assert matcher.max_length == len("lantern")
+
+def test_first_hits_are_case_insensitive_offsets():
+    story = "Alice the BAKER lit a Lantern; alice again."
+    assert PromptMatcher(PROMPTS).first_hits(story.lower()) == {
+        "name": 0, "job": 10, "object": 22, "bonus": 22,
+    }
+
+def test_find_reports_every_overlapping_hit():
+    matcher = PromptMatcher({"name": "ana", "job": "x"})
+    assert matcher.find("Banana") == {"name": [1, 3]}
+
+def test_compiled_matchers_are_cached_per_prompt_set():
+    assert compile_prompts(dict(PROMPTS)) is compile_prompts(dict(PROMPTS))
+
+@pytest.mark.parametrize("length, used, expected", [
+    (MIN_SCORED_LENGTH - 1, ["name", "bonus"], (0, 0)),
+    (MIN_SCORED_LENGTH, ["name"], (PROMPT_POINTS, 1)),
+    (MIN_SCORED_LENGTH, ["name", "bonus"], (PROMPT_POINTS + BONUS_PROMPT_POINTS, 2)),
+    (100, [], (LONG_STORY_POINTS, 0)),
+])
+def test_score_story(length, used, expected):
+    assert score_story(length, used) == expected
+
+def test_calculate_points():
+    story = "Alice was a baker who carried a lantern down to the harbor every single night. " * 2
+    results = calculate_points(PROMPTS, story)
+    assert results["num_used_prompts"] == 5
+    assert results["points"] == 4 * PROMPT_POINTS + BONUS_PROMPT_POINTS + LONG_STORY_POINTS
+    assert results["matches"]["location"] == story.lower().index("harbor")
+
+def test_short_stories_match_nothing():
+    assert calculate_points(PROMPTS, "Alice the baker.")["matches"] == {}
+
+# ─────────────────────────────────────────────────────────────
+# STREAMING ANALYSIS
+# ─────────────────────────────────────────────────────────────
+
+STORY = (
+    "Alice, the harbor's only baker, lit her lantern.  \"Who's there?\" she asked…\n"
+    "Nobody answered!\tShe waited — then walked to the HARBOR (alone). The end"
+)
+
+def _fed_in_pieces(story, rng):
+    analyzer = StoryAnalyzer(PROMPTS)
+    position = 0
+    while position < len(story):
+        size = rng.randint(1, 12)
+        analyzer.feed(story[position:position + size])
+        position += size
+    return analyzer.finish().results()
+
+def test_matches_split_and_calculate_points():
+    results = analyze_story(STORY, PROMPTS)
+    scored = calculate_points(PROMPTS, STORY)
+    assert results["word_count"] == len(STORY.split())
+    assert results["char_count"] == len(STORY)
+    assert results["matches"] == scored["matches"]
+    assert (results["points"], results["num_used_prompts"]) == (scored["points"], scored["num_used_prompts"])
+
+def test_stats():
+    results = analyze_story(STORY, PROMPTS)
+    # "lantern." / there?" / asked… / answered! / (alone). + the unterminated "The end"
+    assert results["sentence_count"] == 6
+    # case and surrounding punctuation ignored ("harbor's" is its own word)
+    assert results["unique_words"] == 21
+
+def test_chunk_boundaries_dont_change_anything():
+    expected = analyze_story(STORY, PROMPTS)
+    rng = random.Random(3)
+    for _ in range(200):
+        assert _fed_in_pieces(STORY, rng) == expected
+
+def test_streamed_bytes_split_mid_character(monkeypatch):
+    monkeypatch.setattr(model, "ANALYZE_CHUNK_SIZE", 5)
+    stream = io.BytesIO(STORY.encode("utf-8"))
+    assert analyze_stream(stream, PROMPTS) == analyze_story(STORY, PROMPTS)
+
+def test_empty_story():
+    results = analyze_story("", PROMPTS)
+    assert (results["word_count"], results["sentence_count"], results["avg_word_length"]) == (0, 0, 0.0)
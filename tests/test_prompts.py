@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+import utils.prompts as prompts
+from utils.prompts import PROMPT_CATEGORIES, PromptBank, prompt_file_names
+
+def _write_lists(directory, sizes):
+    for file_name, size in zip(prompt_file_names, sizes):
+        (directory / file_name).write_text("\n".join(f"{file_name[:-4]}{i}" for i in range(size)) + "\n, ,\n")
+
+@pytest.fixture
+def bank(tmp_path):
+    _write_lists(tmp_path, [3, 4, 5, 6, 7])
+    return PromptBank(str(tmp_path))
+
+def test_blank_entries_are_dropped(bank):
+    assert bank.words("bonus.txt") == ("BONUS0", "BONUS1", "BONUS2")
+    assert bank.combinations == 3 * 4 * 5 * 6 * 7
+
+def test_every_key_round_trips_to_its_prompts(bank):
+    rng = random.Random(7)
+    sets = bank.random_sets(200, rng)
+    for i, prompt_set in enumerate(sets):
+        assert bank.prompts_for_key(sets.key(i)) == prompt_set
+        assert set(prompt_set) == set(PROMPT_CATEGORIES)
+
+def test_keys_from_other_word_lists_are_rejected(bank, tmp_path):
+    key = bank.random_key(random.Random(1))
+    assert bank.prompts_for_key(key)
+    other = tmp_path / "other"
+    other.mkdir()
+    _write_lists(other, [3, 4, 5, 6, 8])
+    for bad_key in (key, -1, str(key)):
+        with pytest.raises(ValueError):
+            PromptBank(str(other)).prompts_for_key(bad_key)
+
+def test_keys_past_the_last_combination_are_rejected(bank):
+    last = ((bank.combinations - 1) << 16) | bank.tag
+    assert bank.prompts_for_key(last)
+    for bad_key in (last + (1 << 16), ((bank.combinations * 5) << 16) | bank.tag):
+        with pytest.raises(ValueError):
+            bank.prompts_for_key(bad_key)
+
+def test_word_lists_too_big_for_a_key_are_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(prompts, "MAX_COMBINATIONS", 3 * 4 * 5 * 6 * 7 - 1)
+    _write_lists(tmp_path, [3, 4, 5, 6, 7])
+    with pytest.raises(ValueError, match="too many"):
+        PromptBank(str(tmp_path))
+
+def test_batches_are_uniform_and_replayable(bank):
+    sets = bank.random_sets(20000, random.Random(3))
+    indices = [key >> 16 for key in sets.keys]
+    assert max(indices) < bank.combinations
+    assert len(set(indices)) == bank.combinations  # 2520 sets, each drawn ~8 times
+    assert list(bank.random_sets(50, random.Random(3)).keys) == list(sets.keys[:50])
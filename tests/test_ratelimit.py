@@ -0,0 +1,109 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, Response
+
+import utils.ratelimit as ratelimit
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets(request, tmp_path):
+    if request.param == "memory":
+        return ratelimit.MemoryBucketStore()
+    return ratelimit.SQLiteBucketStore(str(tmp_path / "ratelimit.db"))
+
+def test_burst_then_limited(buckets, clock):
+    assert [buckets.take("k", 3, 1.0)[0] for _ in range(4)] == [True, True, True, False]
+
+def test_refills_at_the_rate(buckets, clock):
+    for _ in range(2):
+        buckets.take("k", 2, 0.5)
+    assert buckets.take("k", 2, 0.5) == (False, 2)  # one token every 2s
+    clock[0] += 1
+    assert buckets.take("k", 2, 0.5) == (False, 1)
+    clock[0] += 1
+    assert buckets.take("k", 2, 0.5) == (True, 0)
+    assert buckets.take("k", 2, 0.5)[0] is False
+
+def test_refill_stops_at_capacity(buckets, clock):
+    buckets.take("k", 2, 1.0)
+    clock[0] += 3600
+    assert [buckets.take("k", 2, 1.0)[0] for _ in range(3)] == [True, True, False]
+
+def test_keys_have_their_own_buckets(buckets, clock):
+    assert buckets.take("a", 1, 0.1)[0] is True
+    assert buckets.take("a", 1, 0.1)[0] is False
+    assert buckets.take("b", 1, 0.1)[0] is True
+
+def test_retry_after():
+    assert ratelimit._retry_after(0.0, 0.1) == 10
+    assert ratelimit._retry_after(0.99, 0.1) == 1
+    assert ratelimit._retry_after(0.0, 0) == ratelimit.IDLE_BUCKET_SECONDS
+
+# ─────────────────────────────────────────────────────────────
+# CONCURRENCY CAPS
+# ─────────────────────────────────────────────────────────────
+
+def _streaming_app(release):
+    app = Flask(__name__)
+
+    @app.route("/export")
+    def export_stories():
+        def body():
+            yield b"first chunk"
+            release.wait(5)
+            yield b"the rest"
+        return Response(body())
+
+    ratelimit.init_app(app, store=ratelimit.MemoryBucketStore())
+    return app
+
+def test_a_streaming_export_holds_its_slot_until_the_body_is_sent(monkeypatch):
+    monkeypatch.setitem(ratelimit.CONCURRENCY_LIMITS, "export", 2)
+    monkeypatch.setitem(ratelimit.BUDGETS, "export_stories", ("export", 100, 100))
+    monkeypatch.setattr(ratelimit, "SHED_LOAD", True)
+    release = threading.Event()
+    client = _streaming_app(release).test_client()
+
+    streaming = [client.get("/export", buffered=False) for _ in range(2)]
+    assert [response.status_code for response in streaming] == [200, 200]
+    assert ratelimit.ratelimit_stats()["in_flight"]["export"] == 2
+    with client.get("/export", buffered=False) as response:
+        assert response.status_code == 503
+
+    release.set()
+    for response in streaming:
+        assert response.get_data() == b"first chunkthe rest"
+        response.close()
+    assert ratelimit.ratelimit_stats()["in_flight"]["export"] == 0
+    with client.get("/export") as response:  # a wsgi server closes every response
+        assert response.status_code == 200
+    assert ratelimit.ratelimit_stats()["in_flight"]["export"] == 0
+
+def test_a_view_that_raises_gives_its_slot_back(monkeypatch):
+    monkeypatch.setitem(ratelimit.CONCURRENCY_LIMITS, "writes", 1)
+    monkeypatch.setattr(ratelimit, "SHED_LOAD", True)
+    app = Flask(__name__)
+
+    @app.route("/save", methods=["POST"])
+    def save_writing():
+        raise RuntimeError("boom")
+
+    ratelimit.init_app(app, store=ratelimit.MemoryBucketStore())
+    client = app.test_client()
+    for _ in range(2):  # a 500, not a 503 the second time: the slot was freed
+        with client.post("/save") as response:
+            assert response.status_code == 500
+    assert ratelimit.ratelimit_stats()["in_flight"]["writes"] == 0
+
+def test_every_post_endpoint_has_a_budget():
+    import main
+
+    posted = {rule.endpoint for rule in main.app.url_map.iter_rules() if "POST" in rule.methods}
+    assert posted and posted <= set(ratelimit.BUDGETS)
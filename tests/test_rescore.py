@@ -0,0 +1,33 @@
+import utils.compression as compression
+import utils.database as database
+import utils.model as model
+import utils.rescore as rescore
+from utils.sqlite_store import SQLiteStore
+
+PROMPTS = {"name": "Alice", "job": "baker", "object": "lantern", "location": "harbor", "bonus": "an"}
+
+def test_unscorable_stories_are_skipped_not_zeroed():
+    zstd = compression.MAGIC + compression.ZSTD + b"\x28\xb5\x2f\xfd"
+    results = rescore._rescore_chunk([(PROMPTS, "Alice the baker"), (None, "text"), (PROMPTS, None), (PROMPTS, zstd)])
+    assert results[0] == (model.score_points(PROMPTS, "Alice the baker")[0], 3)
+    if compression.zstandard is None:
+        assert all(isinstance(result, str) for result in results[1:])
+    else:
+        assert all(isinstance(result, str) for result in results[1:3])
+
+def test_rescore_keeps_what_it_couldnt_score(tmp_path, monkeypatch):
+    store = SQLiteStore(str(tmp_path / "promptl.db"))
+    store.get_or_create_user("u1", "u1@example.com")
+    good, _ = store.add_story("u1", "good", "Alice the baker", PROMPTS, 99, 99)
+    bad, _ = store.add_story("u1", "bad", "Alice", PROMPTS, 7, 40)
+    store.apply_updates([("u1", bad, {"prompts": ["not", "a", "dict"]})])
+    monkeypatch.setattr(database, "_store", store)
+
+    summary = rescore.rescore_all(workers=1, checkpoint_path=str(tmp_path / "checkpoint.json"))
+
+    assert summary["stories"] == 2 and summary["skipped"] == 1
+    points = model.score_points(PROMPTS, "Alice the baker")[0]
+    assert (store.get_story("u1", good)["pointsEarned"], store.get_story("u1", good)["wordCount"]) == (points, 3)
+    assert (store.get_story("u1", bad)["pointsEarned"], store.get_story("u1", bad)["wordCount"]) == (40, 7)
+    user = store.get_user("u1")
+    assert (user["totalPoints"], user["totalWords"]) == (points + 40, 3 + 7)
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from utils.search import SearchIndex, _owner_token, match_expression
+
+def _index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    created_at = datetime(2025, 3, 14, tzinfo=timezone.utc)
+    index.add("alice", "s1", "A trip to the seaside", "We walked over the hills and down to the seaside at dusk.",
+              {"noun": "lantern", "verb": "wander"}, created_at)
+    index.add("alice", "s2", "Bob", "Bob baked bread every morning.", {"noun": "oven"}, created_at)
+    index.add("bob", "s3", "Seaside", "Someone else's seaside story.", {}, created_at)
+    return index
+
+def test_only_the_searchers_stories_match(tmp_path):
+    index = _index(tmp_path)
+    assert [result["id"] for result in index.search("alice", "seaside")] == ["s1"]
+    assert [result["id"] for result in index.search("bob", "seaside")] == ["s3"]
+
+def test_snippet_comes_from_the_story_not_the_owner_token(tmp_path):
+    index = _index(tmp_path)
+    for query, word in [("seaside", "seaside"), ("hills", "hills"), ("trip", None), ("bob", "Bob")]:
+        [result] = index.search("alice", query)
+        snippet = str(result["snippet"])
+        assert not snippet.startswith("<mark>u")
+        if word is not None:
+            assert f"<mark>{word}</mark>" in snippet
+
+def test_snippet_falls_back_to_the_prompt_words(tmp_path):
+    index = _index(tmp_path)
+    [result] = index.search("alice", "lantern")
+    assert "<mark>lantern</mark>" in str(result["snippet"])
+
+def test_last_word_matches_as_a_prefix(tmp_path):
+    index = _index(tmp_path)
+    assert [result["id"] for result in index.search("alice", "walked hil")] == ["s1"]
+
+def test_snippet_is_escaped(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.add("alice", "s1", "Tags", "a <script>alert(1)</script> lantern", {})
+    [result] = index.search("alice", "lantern")
+    assert "<script>" not in str(result["snippet"])
+    assert "&lt;script&gt;" in str(result["snippet"])
+
+def test_indexing_twice_is_a_no_op(tmp_path):
+    index = _index(tmp_path)
+    row = ("alice", "s1", "A trip to the seaside", "seaside", {}, None)
+    assert index.add_many([row]) == 0
+    assert len(index.search("alice", "seaside")) == 1
+
+def test_query_syntax_is_quoted():
+    assert match_expression("alice", "   ") is None
+    expression = match_expression("alice", 'owner:x OR "NEAR(')
+    assert expression.endswith('{title content prompts} : ("owner" AND "x" AND "or" AND "near"*)')
+
+def test_owner_token_isnt_searchable(tmp_path):
+    index = _index(tmp_path)
+    token = _owner_token("alice")
+    for query in [token, token[:6], "u", f"seaside {token}"]:
+        assert index.search("alice", query) == []
+
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, session
+
+import utils.sessions as sessions
+from utils.sessions import MemorySessionStore, ServerSessionInterface, SQLiteSessionStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+@pytest.fixture
+def app(store):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.route("/login")
+    def login():
+        sessions.regenerate(session)
+        session["uid"] = "u1"
+        return ""
+
+    @app.route("/whoami")
+    def whoami():
+        return session.get("uid", "")
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return ""
+
+    return app
+
+def _sid(client):
+    cookie = client.get_cookie("session")
+    return cookie and cookie.value
+
+def test_cookie_holds_only_an_id(app, store):
+    client = app.test_client()
+    client.get("/login")
+    sid = _sid(client)
+    assert "u1" not in sid
+    assert store.load(sid) is not None
+    assert client.get("/whoami").text == "u1"
+
+def test_reads_only_push_the_expiry_out_once_in_a_while(app, store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions, "time", SimpleNamespace(time=lambda: now[0]))
+    client = app.test_client()
+    client.get("/login")
+    expires_at = store.load(_sid(client))[0]
+
+    now[0] += sessions.SESSION_TOUCH_INTERVAL / 2
+    response = client.get("/whoami")
+    assert "Set-Cookie" not in response.headers
+    assert "Cookie" in response.headers["Vary"]
+    assert store.load(_sid(client))[0] == expires_at
+
+    now[0] += sessions.SESSION_TOUCH_INTERVAL
+    assert "Set-Cookie" in client.get("/whoami").headers
+    assert store.load(_sid(client))[0] > expires_at
+
+def test_login_moves_the_session_to_a_fresh_id(app, store):
+    client = app.test_client()
+    client.get("/login")
+    planted = _sid(client)
+    client.get("/login")
+    assert _sid(client) != planted
+    assert store.load(planted) is None
+
+def test_logout_deletes_it_server_side(app, store):
+    client = app.test_client()
+    client.get("/login")
+    sid = _sid(client)
+    client.get("/logout")
+    assert store.load(sid) is None and _sid(client) is None
+    assert client.get("/whoami").text == ""
+
+def test_unknown_ids_get_an_empty_session(app):
+    client = app.test_client()
+    client.set_cookie("session", "made-up")
+    assert client.get("/whoami").text == ""
+
+def test_expired_sessions_dont_load(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions, "time", SimpleNamespace(time=lambda: now[0]))
+    store.save("sid", "{}", 1010.0)
+    assert store.load("sid") == (1010.0, "{}")
+    now[0] = 1010.0
+    assert store.load("sid") is None
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = MemorySessionStore(maxsize=2)
+    store.save("a", "{}", float("inf"))
+    store.save("b", "{}", float("inf"))
+    store.load("a")
+    store.save("c", "{}", float("inf"))
+    assert store.load("b") is None
+    assert store.load("a") is not None and store.load("c") is not None
+
+def test_backend_is_picked_by_name(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROMPTL_SESSION_DB", str(tmp_path / "s.db"))
+    assert sessions.create_session_interface("cookie") is None
+    assert isinstance(sessions.create_session_interface("memory").store, MemorySessionStore)
+    assert isinstance(sessions.create_session_interface("sqlite").store, SQLiteSessionStore)
+    with pytest.raises(RuntimeError):
+        sessions.create_session_interface("redis")
@@ -0,0 +1,81 @@
+import inspect
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from utils.sqlite_store import SQLiteStore
+from utils.storage import StoryStore, backend_class, decode_cursor, encode_cursor, next_streak
+
+def test_a_backend_missing_a_method_fails_when_created():
+    class Incomplete(StoryStore):
+        def get_user(self, uid):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        Incomplete()
+
+@pytest.mark.parametrize("backend", ["sqlite", "firestore"])
+def test_every_backend_implements_the_interface(backend):
+    try:
+        store_class = backend_class(backend)
+    except ImportError as e:
+        pytest.skip(f"{backend} backend can't be imported here: {e}")
+    assert issubclass(store_class, StoryStore)
+    assert not store_class.__abstractmethods__
+
+def test_async_store_only_has_async_versions_of_the_interface():
+    pytest.importorskip("firebase_admin")
+    from utils.firestore_async_store import AsyncFirestoreStore
+
+    methods = [name for name in vars(AsyncFirestoreStore) if not name.startswith("_")]
+    for name in methods:
+        assert name in StoryStore.__abstractmethods__ or hasattr(StoryStore, name)
+        assert inspect.iscoroutinefunction(getattr(AsyncFirestoreStore, name))
+
+@pytest.mark.parametrize("last, streak, expected", [
+    (None, None, 1),
+    (datetime(2025, 3, 14, 23, 59, tzinfo=timezone.utc), 4, 4),
+    (date(2025, 3, 14), None, 1),
+    (datetime(2025, 3, 13, 0, 0, tzinfo=timezone.utc), 4, 5),
+    (datetime(2025, 3, 12, 23, 59, tzinfo=timezone.utc), 4, 1),
+])
+def test_next_streak(last, streak, expected):
+    assert next_streak(last, streak, date(2025, 3, 14)) == expected
+
+def test_page_cursors_round_trip():
+    story = {"id": "abc.def", "createdAt": datetime(2025, 3, 14, 9, 26, 53, 589793, tzinfo=timezone.utc)}
+    token = encode_cursor(story)
+    assert decode_cursor(token) == (story["createdAt"], "abc.def")
+
+@pytest.mark.parametrize("token", [
+    "", "123", "123.", "abc.def", ".abc", "99999999999999999999999.x", "-99999999999999999999999.x",
+])
+def test_bad_page_tokens_raise(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+def test_paging_visits_every_story_once_both_ways(tmp_path):
+    store = SQLiteStore(str(tmp_path / "promptl.db"))
+    store.get_or_create_user("u1", "u1@example.com")
+    written = datetime(2025, 3, 14, tzinfo=timezone.utc)
+    for i in range(7):
+        # pairs share a createdAt, so the id has to break the tie
+        store.add_story("u1", f"story {i}", "text", {}, 1, 10, story_id=f"s{i}",
+                        created_at=written + timedelta(seconds=i // 2))
+    newest_first = [f"s{i}" for i in reversed(range(7))]  # (createdAt, id) descending
+
+    seen, after, has_more = [], None, True
+    while has_more:
+        page, has_more = store.get_user_stories_page("u1", 3, after=after)
+        seen += [s["id"] for s in page]
+        after = decode_cursor(encode_cursor(page[-1]))
+    assert seen == newest_first
+
+    # and back up from the last page
+    back, has_more = [s["id"] for s in page], True
+    before = decode_cursor(encode_cursor(page[0]))
+    while has_more:
+        page, has_more = store.get_user_stories_page("u1", 3, before=before)
+        back = [s["id"] for s in page] + back
+        before = decode_cursor(encode_cursor(page[0]))
+    assert back == seen
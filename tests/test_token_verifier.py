@@ -0,0 +1,100 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import utils.token_verifier as token_verifier
+from utils.token_verifier import MIN_REFRESH_INTERVAL, CertCache, TokenVerifier, _cache_lifetime
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(token_verifier, "time", SimpleNamespace(time=lambda: now[0], perf_counter=lambda: now[0]))
+    return now
+
+class FakeCerts(CertCache):
+    """A CertCache whose fetch hands out the next cert map from a list."""
+
+    def __init__(self, *responses, lifetime=3600):
+        super().__init__(url=None)
+        self.responses = list(responses)
+        self.lifetime = lifetime
+        self.fetches = 0
+
+    def _fetch(self):
+        self.fetches += 1
+        return self.responses.pop(0), self.lifetime
+
+def test_cache_lifetime():
+    assert _cache_lifetime({"Cache-Control": "public, max-age=19732, must-revalidate"}) == 19732
+    assert _cache_lifetime({"Cache-Control": "max-age=600", "Age": "100"}) == 500
+    assert _cache_lifetime({"Cache-Control": "max-age=600", "Age": "900"}) == 0
+    assert _cache_lifetime({}) == token_verifier.DEFAULT_CERT_TTL
+
+def test_certs_are_cached_for_their_lifetime(clock):
+    certs = FakeCerts({"k1": "pem1"}, {"k2": "pem2"})
+    assert certs.get("k1") == {"k1": "pem1"}
+    clock[0] += 3599
+    assert certs.get("k1") == {"k1": "pem1"}
+    assert certs.fetches == 1
+    clock[0] += 1
+    assert certs.get() == {"k2": "pem2"}
+    assert certs.fetches == 2
+
+def test_an_unknown_key_refetches_at_most_once_a_minute(clock):
+    certs = FakeCerts({"k1": "pem1"}, {"k1": "pem1"}, {"k1": "pem1", "k2": "pem2"})
+    certs.get()
+    clock[0] += MIN_REFRESH_INTERVAL
+    assert "k2" not in certs.get("k2")  # refetched, still not there
+    clock[0] += 1
+    assert "k2" not in certs.get("k2")  # too soon to try again
+    assert certs.fetches == 2
+    clock[0] += MIN_REFRESH_INTERVAL
+    assert certs.get("k2")["k2"] == "pem2"
+
+def test_stale_certs_are_served_while_another_thread_refetches():
+    started, release = threading.Event(), threading.Event()
+
+    class SlowCerts(FakeCerts):
+        def _fetch(self):
+            if self.fetches:
+                started.set()
+                release.wait(5)
+            return super()._fetch()
+
+    certs = SlowCerts({"k1": "old"}, {"k1": "new"}, lifetime=0)
+    certs.get()
+    refetch = threading.Thread(target=certs.get)
+    refetch.start()
+    assert started.wait(5)
+    assert certs.get("k1") == {"k1": "old"}  # doesn't wait on the fetch in flight
+    release.set()
+    refetch.join(5)
+    assert certs.fetches == 2
+
+def test_a_failed_refetch_keeps_the_old_certs(clock):
+    certs = FakeCerts({"k1": "pem1"})
+    certs.get()
+    clock[0] += 3600
+    assert certs.get("k1") == {"k1": "pem1"}  # the fetch raised (nothing left to hand out)
+
+def test_a_failed_first_fetch_raises():
+    with pytest.raises(IndexError):
+        FakeCerts().get()
+
+def test_verified_tokens_are_memoized_until_they_expire(clock, monkeypatch):
+    verifier = TokenVerifier(project_id="promptl", cert_cache=FakeCerts())
+    calls = []
+
+    def verify_uncached(token):
+        calls.append(token)
+        return {"uid": "u1", "sub": "u1", "exp": clock[0] + 60}
+
+    monkeypatch.setattr(verifier, "_verify_uncached", verify_uncached)
+    assert verifier.verify("token")["uid"] == "u1"
+    assert verifier.verify("token")["uid"] == "u1"
+    assert calls == ["token"]
+    clock[0] += 61
+    verifier.verify("token")
+    assert calls == ["token", "token"]
+    assert (verifier.hits, verifier.misses) == (1, 2)
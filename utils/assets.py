@@ -0,0 +1,216 @@
+"""Static asset pipeline — fingerprinted, precompressed files served forever.
+
+Build step (run on deploy, see render.yaml):
+
+    python -m utils.assets [--clean]
+
+copies everything under static/ into static/dist/ with a content hash in
+the name (styles.css → styles.1a2b3c4d5e.css), and next to each file:
+
+  - .gz / .br  gzip (always) and brotli (if `brotli` is installed) for
+               text types — only kept when they're actually smaller
+  - .webp      a lossless webp of each png (if Pillow is installed); the
+               png itself is re-saved with Pillow's optimizer when that's
+               smaller
+
+static/dist/manifest.json maps each original path to its hashed name and
+lists which variants exist. Templates link assets with
+{{ asset_url('styles.css') }}; /dist/<hashed name> then serves the best
+variant the browser accepts (Accept-Encoding / Accept, with Vary set) and
+`Cache-Control: immutable` for a year. A changed file gets a new name, so
+repeat visits never re-download — or even revalidate — anything.
+
+Without a build (local dev), asset_url() falls back to plain /static/ URLs.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_NAME = "manifest.json"
+
+HASH_LENGTH = 10
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# content-encoding → file suffix, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+# ─────────────────────────────────────────────────────────────
+# BUILD
+# ─────────────────────────────────────────────────────────────
+
+def _hashed_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+def _compressed(content):
+    """{suffix: bytes} for every encoding that beats the original."""
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants[".br"] = brotli.compress(content, quality=11)
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content)}
+
+def _image_variants(content):
+    """(smallest png, webp or None) for a png, or (content, None) without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return content, None
+
+    image = Image.open(io.BytesIO(content))
+    image.load()
+
+    optimized = io.BytesIO()
+    image.save(optimized, "PNG", optimize=True)
+    png = min(content, optimized.getvalue(), key=len)
+
+    webp = io.BytesIO()
+    image.save(webp, "WEBP", lossless=True, method=6)
+    return png, webp.getvalue() if webp.tell() < len(png) else None
+
+def _source_files():
+    for folder, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(folder) == DIST_DIR:
+            dirs[:] = []
+            continue
+        dirs[:] = [d for d in dirs if os.path.join(folder, d) != DIST_DIR]
+        for name in sorted(files):
+            full_path = os.path.join(folder, name)
+            yield os.path.relpath(full_path, STATIC_DIR).replace(os.sep, "/"), full_path
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+def build(clean=False):
+    """Fingerprint + precompress static/ into static/dist/ and write the manifest.
+
+    Returns:
+        dict: The manifest ({"files": {path: hashed path}, "variants": {hashed path: [suffixes]}}).
+    """
+    if clean and os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+
+    manifest = {"files": {}, "variants": {}}
+    original_bytes = built_bytes = 0
+    for path, full_path in _source_files():
+        with open(full_path, "rb") as f:
+            content = f.read()
+        hashed = _hashed_name(path, content)
+        ext = os.path.splitext(path)[1].lower()
+
+        variants = {}
+        if ext == ".png":
+            content, webp = _image_variants(content)
+            if webp is not None:
+                variants[".webp"] = webp
+        elif ext in COMPRESSIBLE:
+            variants = _compressed(content)
+
+        _write(os.path.join(DIST_DIR, hashed), content)
+        for suffix, data in variants.items():
+            _write(os.path.join(DIST_DIR, hashed + suffix), data)
+
+        manifest["files"][path] = hashed
+        if variants:
+            manifest["variants"][hashed] = sorted(variants)
+        original_bytes += os.path.getsize(full_path)
+        built_bytes += min([len(content)] + [len(data) for data in variants.values()])
+
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logger.info("built %d assets: %d → %d bytes over the wire (best variant)",
+                len(manifest["files"]), original_bytes, built_bytes)
+    return manifest
+
+# ─────────────────────────────────────────────────────────────
+# SERVING
+# ─────────────────────────────────────────────────────────────
+
+_manifest = None  # module-level cache, loaded on first use
+
+def load_manifest():
+    """The built manifest, or an empty one if `python -m utils.assets` hasn't run."""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(DIST_DIR, MANIFEST_NAME)) as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            _manifest = {"files": {}, "variants": {}}
+    return _manifest
+
+def _accepts_webp(request):
+    # only an explicit image/webp counts — */* clients may not decode it
+    return any(value == "image/webp" and quality > 0 for value, quality in request.accept_mimetypes)
+
+def _pick_variant(request, hashed):
+    """(suffix, content-encoding or None) of the best variant this request accepts."""
+    variants = load_manifest()["variants"].get(hashed, ())
+    if ".webp" in variants and _accepts_webp(request):
+        return ".webp", None
+    for encoding, suffix in ENCODINGS:
+        if suffix in variants and request.accept_encodings[encoding]:
+            return suffix, encoding
+    return "", None
+
+def init_app(app):
+    """Add the asset_url() template helper and the /dist/ route."""
+    from flask import request, send_from_directory, url_for
+
+    def asset_url(path):
+        hashed = load_manifest()["files"].get(path)
+        if hashed is None:
+            return url_for("static", filename=path)
+        return url_for("serve_asset", filename=hashed)
+
+    app.jinja_env.globals["asset_url"] = asset_url
+
+    @app.route("/dist/<path:filename>")
+    def serve_asset(filename):
+        # no manifest check: files from the previous build stay servable for
+        # pages rendered before a deploy (send_from_directory 404s the rest)
+        suffix, encoding = _pick_variant(request, filename)
+        mimetype = "image/webp" if suffix == ".webp" else mimetypes.guess_type(filename)[0]
+
+        response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+
+        # caches must keep one copy per variant the choice depended on
+        variants = load_manifest()["variants"].get(filename, ())
+        if ".webp" in variants:
+            response.vary.add("Accept")
+        if any(suffix in variants for _, suffix in ENCODINGS):
+            response.vary.add("Accept-Encoding")
+        return response
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fingerprint + precompress static/ into static/dist/.")
+    parser.add_argument("--clean", action="store_true", help="delete static/dist/ first")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    manifest = build(clean=args.clean)
+    print(f"{len(manifest['files'])} assets → {os.path.relpath(DIST_DIR)}")
+
+if __name__ == "__main__":
+    main()
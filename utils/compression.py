@@ -0,0 +1,207 @@
+"""Compressed story content — stories are stored compressed, read back as text.
+
+db.save_story (and its async twin) compress a story's `content` before
+it's stored, so every read and every write moves a fraction of the bytes
+and long stories stay far from firestore's 1 MiB document limit. Stories
+are mostly plain prose, which zlib shrinks to well under half.
+
+A compressed value is bytes starting with a format marker:
+
+    b"\\x00pz" + codec byte + compressed utf-8
+    codec: b"z" zlib, b"s" zstd (PROMPTL_CONTENT_CODEC=zstd, needs `zstandard`)
+
+Anything else — a str — is an old uncompressed story and reads back as
+is, so the two can live side by side. Short stories (under
+MIN_COMPRESS_BYTES) and anything that doesn't actually shrink stay plain
+text. Content is only decompressed where it's used: the story page,
+rescoring, export and the search index build — listings never fetch it.
+
+Existing stories are compressed in place (streamed, batched writes,
+safe to re-run) and the savings measured with:
+
+    python -m utils.compression --migrate [--dry-run]
+    python -m utils.compression --report
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import time
+import zlib
+
+import utils.env  # noqa: F401 — PROMPTL_CONTENT_CODEC is read right below
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"\x00pz"
+ZLIB, ZSTD = b"z", b"s"
+CODEC = os.getenv("PROMPTL_CONTENT_CODEC", "zlib").lower()  # zlib | zstd | none
+MIN_COMPRESS_BYTES = 256
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+MAX_BATCH_WRITES = 400    # updates per batch (firestore caps a batch at 500)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def _encoder():
+    """(codec byte, compress function) for the configured codec, or None."""
+    if CODEC == "none":
+        return None
+    if CODEC == "zstd":
+        if zstandard is not None:
+            return ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+        logger.warning("PROMPTL_CONTENT_CODEC=zstd but zstandard isn't installed, using zlib")
+    return ZLIB, lambda data: zlib.compress(data, ZLIB_LEVEL)
+
+_encode = _encoder()
+
+def is_compressed(value):
+    return isinstance(value, (bytes, bytearray)) and value[:len(MAGIC)] == MAGIC
+
+def compress_content(text):
+    """The value to store for a story's text: marked, compressed bytes, or
+    the text itself when it's short or wouldn't shrink."""
+    if _encode is None or not isinstance(text, str):
+        return text
+    data = text.encode("utf-8")
+    if len(data) < MIN_COMPRESS_BYTES:
+        return text
+    codec, compress = _encode
+    packed = MAGIC + codec + compress(data)
+    return packed if len(packed) < len(data) else text
+
+def decompress_content(value):
+    """A stored story's text, whichever way it was stored.
+
+    Raises:
+        ValueError: for compressed content in a codec we can't read here.
+    """
+    if not is_compressed(value):
+        return value
+    codec, payload = value[len(MAGIC):len(MAGIC) + 1], value[len(MAGIC) + 1:]
+    if codec == ZLIB:
+        data = zlib.decompress(payload)
+    elif codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("story content is zstd-compressed, but zstandard isn't installed")
+        # streaming decompressor — zstd frames don't always record their size
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+    else:
+        raise ValueError(f"unknown story content codec: {codec!r}")
+    return data.decode("utf-8")
+
+def stored_size(value):
+    """Bytes a stored content value takes."""
+    if value is None:
+        return 0
+    return len(value) if isinstance(value, (bytes, bytearray)) else len(value.encode("utf-8"))
+
+# ─────────────────────────────────────────────────────────────
+# MIGRATION + REPORT
+# ─────────────────────────────────────────────────────────────
+
+def _iter_contents(store):
+    """Stream (uid, story id, stored content) for every story in the archive."""
+    for user in store.iter_users(fields=[]):
+        for story in store.iter_stories(user["uid"], fields=["content"]):
+            yield user["uid"], story["id"], story.get("content")
+
+def migrate(store, dry_run=False):
+    """Compress every story still stored as plain text.
+
+    Already-compressed stories are skipped, so an interrupted run can just
+    be started again.
+
+    Returns:
+        dict: 'stories' seen, 'compressed' now, bytes 'before'/'after' for those.
+    """
+    totals = {"stories": 0, "compressed": 0, "before": 0, "after": 0}
+    pending = []
+
+    def flush():
+        if pending and not dry_run:
+            store.apply_updates(pending)
+        pending.clear()
+
+    for uid, story_id, content in _iter_contents(store):
+        totals["stories"] += 1
+        if not isinstance(content, str):
+            continue
+        packed = compress_content(content)
+        if packed is content:
+            continue  # short, or wouldn't shrink
+        totals["compressed"] += 1
+        totals["before"] += stored_size(content)
+        totals["after"] += stored_size(packed)
+        pending.append((uid, story_id, {"content": packed}))
+        if len(pending) >= MAX_BATCH_WRITES:
+            flush()
+            logger.info("%d stories, %d compressed so far", totals["stories"], totals["compressed"])
+    flush()
+    return totals
+
+def report(store):
+    """How much space compression saves, and what it costs on the read path.
+
+    Returns:
+        dict: Story counts, stored vs plain bytes, and decompression time
+              per story (p50/p99/max, in µs) over every compressed story.
+    """
+    totals = {"stories": 0, "compressed": 0, "stored_bytes": 0, "plain_bytes": 0}
+    timings = []
+    for _, _, content in _iter_contents(store):
+        totals["stories"] += 1
+        totals["stored_bytes"] += stored_size(content)
+        if is_compressed(content):
+            started = time.perf_counter()
+            text = decompress_content(content)
+            timings.append((time.perf_counter() - started) * 1e6)
+            totals["compressed"] += 1
+            totals["plain_bytes"] += stored_size(text)
+        else:
+            totals["plain_bytes"] += stored_size(content)
+
+    totals["saved_bytes"] = totals["plain_bytes"] - totals["stored_bytes"]
+    totals["saved_pct"] = round(100 * totals["saved_bytes"] / totals["plain_bytes"], 1) if totals["plain_bytes"] else 0.0
+    if timings:
+        timings.sort()
+        totals["decompress_us"] = {
+            "p50": round(statistics.median(timings), 1),
+            "p99": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 1),
+            "max": round(timings[-1], 1),
+        }
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress stored story content / report the savings.")
+    parser.add_argument("--migrate", action="store_true", help="compress every story still stored as plain text")
+    parser.add_argument("--dry-run", action="store_true", help="with --migrate: measure, but don't write")
+    parser.add_argument("--report", action="store_true", help="bytes saved + decompression cost per story")
+    args = parser.parse_args(argv)
+    if not (args.migrate or args.report):
+        parser.error("nothing to do (pass --migrate and/or --report)")
+
+    import utils.database as db
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = db.get_store()
+    if args.migrate:
+        totals = migrate(store, dry_run=args.dry_run)
+        saved = totals["before"] - totals["after"]
+        print(f"{'would compress' if args.dry_run else 'compressed'} {totals['compressed']} of "
+              f"{totals['stories']} stories: {totals['before']} → {totals['after']} bytes ({saved} saved)")
+    if args.report:
+        totals = report(store)
+        print(f"{totals['compressed']} of {totals['stories']} stories compressed: "
+              f"{totals['plain_bytes']} bytes of text stored in {totals['stored_bytes']} "
+              f"({totals['saved_bytes']} saved, {totals['saved_pct']}%)")
+        if "decompress_us" in totals:
+            timing = totals["decompress_us"]
+            print(f"decompressing on read: p50 {timing['p50']} µs, p99 {timing['p99']} µs, max {timing['max']} µs per story")
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,132 @@
-"""Database layer for Promptl - handles all Firestore interactions."""
+"""Database layer for Promptl - the user/story/auth functions the routes call.
 
+Storage itself lives behind a pluggable backend (see utils/storage.py):
+firestore by default, or a local sqlite file with PROMPTL_STORAGE=sqlite.
+Nothing here talks to firebase at import time, so the app (and benchmarks)
+can be imported without firebase credentials.
+"""
+
+import logging
 import os
-import json
-from datetime import datetime, timezone, timedelta
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore, auth as firebase_auth
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import utils.env  # noqa: F401 — loads .env before anything reads it
+from utils import compression, metrics, search, token_verifier
+from utils.storage import LEADERBOARDS, SITE_COUNTERS, create_store, decode_cursor, encode_cursor, streak_cutoff
+
+logger = logging.getLogger(__name__)
+
+# user profile cache settings (per worker process). size 0 turns it off.
+USER_CACHE_SIZE = int(os.getenv("PROMPTL_USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("PROMPTL_USER_CACHE_TTL", "60"))  # seconds
+
+# stories per /prior-pieces page
+STORIES_PAGE_SIZE = 20
+
+# stories fetched per round trip when streaming a whole archive (/export)
+EXPORT_CHUNK_SIZE = 100
+
+# users shown per leaderboard
+LEADERBOARD_SIZE = 10
+
+# ─────────────────────────────────────────────────────────────
+# STORAGE BACKEND
+# ─────────────────────────────────────────────────────────────
+# singleton pattern again: build the configured backend once, reuse it.
+
+_store = None  # module-level cache for the storage backend
 
-# load env vars from .env file (only matters locally; render injects them directly)
-load_dotenv()
+def get_store():
+    """Get the configured storage backend, creating it on first use."""
+    global _store
+    if _store is None:
+        # with PROMPTL_METRICS on, every backend call is timed + counted
+        _store = metrics.instrument_store(create_store())
+    return _store
 
 # ─────────────────────────────────────────────────────────────
-# FIREBASE INITIALIZATION
+# USER CACHE
 # ─────────────────────────────────────────────────────────────
-# we use a singleton pattern: initialize firebase once, reuse the connection.
-# this matches how you set up lockd in's backend.
-
-_db = None  # module-level cache for the firestore client
-
-def _initialize_firebase():
-    """Initialize the firebase admin SDK (only runs once per process)."""
-    if not firebase_admin._apps:
-        cred_json = os.getenv("FIREBASE_CREDENTIALS")
-        if not cred_json:
-            raise RuntimeError("FIREBASE_CREDENTIALS env var not set!")
-        
-        cred_dict = json.loads(cred_json)
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
-
-def get_db():
-    """Get the firestore client, initializing firebase if needed."""
-    global _db
-    if _db is None:
-        _initialize_firebase()
-        _db = firestore.client()
-    return _db
-
-# 🆕 initialize firebase eagerly at module import time.
-# this means firebase admin SDK is ready as soon as `import utils.database`
-# runs in main.py, so there's no risk of auth functions being called
-# before init.
-_initialize_firebase()
+# user docs only change when a story is saved, but /my-account and
+# /auth/session read them on every visit. keeping a small per-worker cache
+# means those reads are usually served from memory.
+#
+# add_story writes the updated doc straight into the cache, so a user always
+# sees their own new totals on the worker that saved the story. other
+# workers catch up when their copy expires (USER_CACHE_TTL).
+
+class UserCache:
+    """A bounded, thread-safe TTL + LRU cache of user docs."""
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # uid -> (expires_at, user dict)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, uid):
+        """Return a copy of the cached user doc, or None (counts as a hit/miss)."""
+        user = self.peek(uid)
+        with self._lock:
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return user
+
+    def peek(self, uid):
+        """Like get(), but without touching the hit/miss counters."""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[uid]
+                return None
+            self._entries.move_to_end(uid)  # most recently used goes last
+            # hand out copies so callers can't mutate what's cached
+            return dict(user)
+
+    def put(self, uid, user):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[uid] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(uid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)  # drop the least recently used
+                self.evictions += 1
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._entries.pop(uid, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+user_cache = UserCache()
+
+def user_cache_stats():
+    """Hit/miss/eviction counters for this worker's user cache."""
+    return user_cache.stats()
 
 # ─────────────────────────────────────────────────────────────
 # AUTH HELPERS
@@ -49,29 +134,25 @@ _initialize_firebase()
 
 def verify_id_token(id_token: str):
     """Verify a firebase ID token sent from the frontend.
-    
+
     The frontend logs the user in via firebase JS SDK, gets an ID token,
     then sends it to our flask backend. We verify it here to confirm
     the user is who they claim to be.
-    
+
     Args:
         id_token (str): The ID token string from the client.
-    
+
     Returns:
         dict: Decoded token payload with 'uid', 'email', etc., or None if invalid.
     """
     try:
-        # 🆕 ensure firebase is initialized before calling auth functions.
-        # this matters because verify_id_token() can be called before any
-        # firestore operation, so get_db() may not have run yet.
-        _initialize_firebase()
-        
-        # firebase_auth.verify_id_token() does cryptographic verification —
-        # it checks the signature, expiration, and issuer. trust this fn.
-        decoded = firebase_auth.verify_id_token(id_token)
+        # signature, expiration, audience and issuer are all checked; google's
+        # signing certs and already-verified tokens are cached locally (see
+        # utils/token_verifier.py), so a repeat login never hits the network.
+        decoded = token_verifier.verify_id_token(id_token)
         return decoded
     except Exception as e:
-        print(f"[auth] token verification failed: {e}")
+        logger.warning("token verification failed: %s", e)
         return None
 
 # ─────────────────────────────────────────────────────────────
@@ -80,51 +161,32 @@ def verify_id_token(id_token: str):
 
 def get_or_create_user(uid: str, email: str, display_name: str = None):
     """Fetch a user document, creating it if this is their first login.
-    
-    Firebase auth handles authentication, but we still need a firestore
-    doc for each user to track points, streak, etc.
-    
+
+    Firebase auth handles authentication, but we still need a stored
+    user record for each user to track points, streak, etc.
+
     Args:
         uid (str): Firebase auth user ID.
         email (str): User's email address.
         display_name (str, optional): Display name (from google sign-in).
-    
+
     Returns:
         dict: The user's document data (with their uid included).
     """
-    db = get_db()
-    user_ref = db.collection("users").document(uid)
-    user_doc = user_ref.get()
-    
-    if user_doc.exists:
-        # user already exists — just return their data
-        data = user_doc.to_dict()
-        data["uid"] = uid
-        return data
-    
-    # first time login — create their doc with default values
-    new_user = {
-        "email": email,
-        "displayName": display_name or email.split("@")[0],
-        "createdAt": datetime.now(timezone.utc),
-        "totalPoints": 0,
-        "totalWords": 0,
-        "currentStreak": 0,
-        "lastStoryDate": None,  # will be set when they write their first story
-    }
-    user_ref.set(new_user)
-    new_user["uid"] = uid
-    return new_user
+    user = user_cache.get(uid)
+    if user is None:
+        user = get_store().get_or_create_user(uid, email, display_name)
+        user_cache.put(uid, user)
+    return user
 
 def get_user(uid: str):
-    """Fetch a user document by uid. Returns None if not found."""
-    db = get_db()
-    user_doc = db.collection("users").document(uid).get()
-    if user_doc.exists:
-        data = user_doc.to_dict()
-        data["uid"] = uid
-        return data
-    return None
+    """Fetch a user document by uid (cached per worker). Returns None if not found."""
+    user = user_cache.get(uid)
+    if user is None:
+        user = get_store().get_user(uid)
+        if user is not None:
+            user_cache.put(uid, user)
+    return user
 
 # ─────────────────────────────────────────────────────────────
 # STORY OPERATIONS
@@ -132,15 +194,20 @@ def get_user(uid: str):
 
 def add_story(uid: str, title: str, story_content: str, prompts: dict,
               word_count: int, points_earned: int):
-    """Save a new story to firestore + update the user's stats and streak.
-    
-    Stories are stored as a subcollection under the user, so the path is:
+    """Save a new story + update the user's stats and streak.
+
+    With firestore, stories are stored as a subcollection under the user,
+    so the path is:
         users/{uid}/stories/{auto-generated story id}
-    
-    This function does TWO things atomically-ish:
+
+    This function does TWO things, in one atomic write:
       1. Adds the story document
       2. Updates the parent user doc's totals (points, words) + streak
-    
+
+    The content is stored compressed (utils/compression.py). The cached
+    user doc is replaced with the updated one afterwards (or dropped if the
+    save failed), and the story is added to the search index (utils/search.py).
+
     Args:
         uid (str): The author's firebase uid.
         title (str): Story title.
@@ -148,122 +215,179 @@ def add_story(uid: str, title: str, story_content: str, prompts: dict,
         prompts (dict): The prompts that were used.
         word_count (int): Number of words in the story.
         points_earned (int): Points earned for this story.
-    
+
     Returns:
         str: The new story's ID, or None on failure.
     """
     try:
-        db = get_db()
-        user_ref = db.collection("users").document(uid)
-        
-        # build the story document
-        story_doc = {
-            "title": title,
-            "content": story_content,
-            "prompts": prompts,
-            "wordCount": word_count,
-            "pointsEarned": points_earned,
-            "createdAt": datetime.now(timezone.utc),
-        }
-        
-        # add() generates a unique ID automatically — preferable to set() here
-        # because we want firestore to handle ID generation.
-        _, story_ref = user_ref.collection("stories").add(story_doc)
-        
-        # now update the user's running totals + streak
-        _update_user_stats_after_story(uid, word_count, points_earned)
-        
-        return story_ref.id
+        return save_story(uid, title, story_content, prompts, word_count, points_earned)
     except Exception as e:
-        print(f"[db] error saving story: {e}")
+        logger.error("error saving story for %s: %s", uid, e)
         return None
 
-def _update_user_stats_after_story(uid: str, word_count: int, points: int):
-    """Update user totals + streak after a story is saved.
-    
-    Streak logic:
-      - If they've never written: streak = 1
-      - If last story was today: streak unchanged (multiple stories same day = same streak)
-      - If last story was yesterday: streak += 1
-      - If last story was 2+ days ago: streak resets to 1
-    
-    Note: this uses UTC dates. for a production app you'd want to use the
-    user's local timezone, but UTC is fine for now.
+def save_story(uid: str, title: str, story_content: str, prompts: dict,
+               word_count: int, points_earned: int, story_id: str = None, created_at=None):
+    """add_story, but raising on failure — for callers that retry (utils/journal.py).
+
+    Args:
+        story_id (str, optional): Save under this id; if it's already saved,
+                                  nothing is written (see StoryStore.add_story).
+        created_at (datetime, optional): When the story was written (default now).
+
+    Returns:
+        str: The story's ID.
     """
-    db = get_db()
-    user_ref = db.collection("users").document(uid)
-    user = user_ref.get().to_dict()
-    
-    today = datetime.now(timezone.utc).date()
-    last_date = user.get("lastStoryDate")
-    
-    # firestore returns timestamps as datetime objects — extract just the date part
-    if last_date is not None:
-        last_date = last_date.date() if hasattr(last_date, "date") else last_date
-    
-    # figure out the new streak value
-    if last_date is None:
-        new_streak = 1  # first story ever
-    elif last_date == today:
-        new_streak = user.get("currentStreak", 1)  # already wrote today, no change
-    elif last_date == today - timedelta(days=1):
-        new_streak = user.get("currentStreak", 0) + 1  # consecutive day! 🔥
+    try:
+        story_id, user = get_store().add_story(
+            uid, title, compression.compress_content(story_content), prompts, word_count, points_earned,
+            user_hint=user_cache.peek(uid), story_id=story_id, created_at=created_at,
+        )
+    except Exception:
+        user_cache.invalidate(uid)
+        raise
+
+    if user is not None:
+        user_cache.put(uid, user)
     else:
-        new_streak = 1  # streak broken, restart at 1
-    
-    # firestore.Increment is atomic — safer than read-modify-write for counters
-    # (it prevents race conditions if two writes happen at the same time)
-    user_ref.update({
-        "totalPoints": firestore.Increment(points),
-        "totalWords": firestore.Increment(word_count),
-        "currentStreak": new_streak,
-        "lastStoryDate": datetime.now(timezone.utc),
-    })
+        user_cache.invalidate(uid)
+    search.index_story(uid, story_id, title, story_content, prompts, created_at)
+    return story_id
 
 def get_user_stories(uid: str):
     """Fetch all stories for a user, newest first.
-    
+
     Returns:
-        list: List of story dicts (with 'id' field added). Empty list on error.
+        list: List of story dicts (with 'id' field added, content as text). Empty list on error.
     """
     try:
-        db = get_db()
-        stories_ref = (
-            db.collection("users")
-            .document(uid)
-            .collection("stories")
-            .order_by("createdAt", direction=firestore.Query.DESCENDING)
-        )
-        stories = []
-        for doc in stories_ref.stream():
-            data = doc.to_dict()
-            data["id"] = doc.id  # include the doc ID so we can link to it
-            stories.append(data)
+        stories = get_store().get_user_stories(uid)
+        for story in stories:
+            story["content"] = compression.decompress_content(story.get("content"))
         return stories
     except Exception as e:
-        print(f"[db] error fetching stories for {uid}: {e}")
+        logger.error("error fetching stories for %s: %s", uid, e)
         return []
 
+def get_user_stories_page(uid: str, page_size: int = STORIES_PAGE_SIZE,
+                          after: str = None, before: str = None):
+    """Fetch one page of a user's story listing, newest first.
+
+    Only the listing fields (title, wordCount, pointsEarned, createdAt) are
+    fetched — never the story content — and pages use cursors instead of
+    offsets, so a page costs the same however big the archive gets.
+
+    Args:
+        uid (str): The author's uid.
+        page_size (int): Stories per page.
+        after (str, optional): Page token — show the stories older than it.
+        before (str, optional): Page token — show the stories newer than it.
+
+    Returns:
+        dict: 'stories' (list of story dicts with 'id'), plus 'next' and
+              'prev' page tokens (None when there's no such page). An empty
+              page with 'error' set means the read failed.
+    """
+    empty_page = {"stories": [], "next": None, "prev": None}
+    try:
+        after_cursor = decode_cursor(after) if after else None
+        before_cursor = decode_cursor(before) if before else None
+    except ValueError:
+        after_cursor = before_cursor = None  # mangled token — just start over
+
+    try:
+        stories, has_more = get_store().get_user_stories_page(
+            uid, page_size, after=after_cursor, before=before_cursor
+        )
+    except Exception as e:
+        logger.error("error fetching stories for %s: %s", uid, e)
+        return dict(empty_page, error=True)
+
+    if not stories:
+        return empty_page
+
+    if before_cursor is not None:
+        # paging backwards: "has_more" means there are even newer stories
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = after_cursor is not None, has_more
+
+    return {
+        "stories": stories,
+        "next": encode_cursor(stories[-1]) if has_older else None,
+        "prev": encode_cursor(stories[0]) if has_newer else None,
+    }
+
+def iter_user_stories(uid: str, fields: list, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Stream every one of a user's stories, newest first, a chunk at a time.
+
+    Walks the archive with the same cursors as /prior-pieces, so only one
+    chunk of stories is ever held in memory however big the archive is.
+    Unlike the other helpers here this raises on a failed read — a caller
+    that's halfway through sending the archive can't pretend it's complete.
+
+    Args:
+        uid (str): The author's uid.
+        fields (list): Story fields to fetch ('createdAt' is always added).
+        chunk_size (int): Stories per database read.
+
+    Yields:
+        dict: Story dicts (with 'id'). 'content', if fetched, is as stored
+              (see utils/compression.py).
+    """
+    fields = list(dict.fromkeys([*fields, "createdAt"]))
+    cursor = None
+    while True:
+        stories, has_more = get_store().get_user_stories_page(uid, chunk_size, after=cursor, fields=fields)
+        yield from stories
+        if not has_more or not stories:
+            return
+        cursor = (stories[-1]["createdAt"], stories[-1]["id"])
+
 def get_story(uid: str, story_id: str):
     """Fetch a single story by ID (only if it belongs to the given user).
-    
-    Scoping the lookup under the user's subcollection means we automatically
-    can't accidentally return another user's story. ✨
+
+    Scoping the lookup to the user means we automatically can't
+    accidentally return another user's story. ✨
+
+    'content' comes back as stored — run it through
+    compression.decompress_content() where it's actually shown.
     """
     try:
-        db = get_db()
-        doc = (
-            db.collection("users")
-            .document(uid)
-            .collection("stories")
-            .document(story_id)
-            .get()
-        )
-        if doc.exists:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            return data
+        return get_store().get_story(uid, story_id)
+    except Exception as e:
+        logger.error("error fetching story %s: %s", story_id, e)
         return None
+
+# ─────────────────────────────────────────────────────────────
+# LEADERBOARDS + SITE STATS
+# ─────────────────────────────────────────────────────────────
+
+def get_leaderboard(board: str, limit: int = LEADERBOARD_SIZE):
+    """Fetch the top users on one leaderboard.
+
+    Rankings come straight off an index on the user totals, which add_story
+    already keeps up to date — no scanning. The streak board only counts
+    streaks that are still alive (a story today or yesterday).
+
+    Args:
+        board (str): 'points', 'words' or 'streak' (see storage.LEADERBOARDS).
+        limit (int): How many users to show.
+
+    Returns:
+        list: User dicts (uid, displayName + totals), best first. Empty on error.
+    """
+    field = LEADERBOARDS[board]
+    active_since = streak_cutoff(datetime.now(timezone.utc).date()) if board == "streak" else None
+    try:
+        return get_store().get_leaderboard(field, limit, active_since=active_since)
+    except Exception as e:
+        logger.error("error fetching %s leaderboard: %s", board, e)
+        return []
+
+def get_site_stats():
+    """Site-wide totals: users, stories, points and words. Zeros on error."""
+    try:
+        return get_store().get_site_stats()
     except Exception as e:
-        print(f"[db] error fetching story {story_id}: {e}")
-        return None
\ No newline at end of file
+        logger.error("error fetching site stats: %s", e)
+        return dict.fromkeys(SITE_COUNTERS, 0)
@@ -0,0 +1,159 @@
+"""Asyncio variant of the database layer, for the async routes in main.py.
+
+Same functions (and the same per-worker user cache) as utils/database.py,
+but as coroutines. All firestore I/O runs on ONE long-lived event loop per
+worker, in a background thread: flask gives every async view its own
+short-lived loop, and the async firestore client's connections can't hop
+between loops. Views just await these functions; the round trips of every
+in-flight request share that one loop and its connections.
+
+With the sqlite backend (no async driver) the same functions run the sync
+store's methods on the loop's thread pool.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import threading
+
+import utils.database as db
+from utils import compression, metrics, search
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────────────────────────
+# I/O EVENT LOOP
+# ─────────────────────────────────────────────────────────────
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    """Get this process's I/O loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="promptl-db-io", daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+async def _on_io_loop(coro):
+    """Run a coroutine on the I/O loop and await its result from any loop."""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return await asyncio.wrap_future(future)
+
+# ─────────────────────────────────────────────────────────────
+# STORAGE BACKEND
+# ─────────────────────────────────────────────────────────────
+
+class _ThreadedStore:
+    """Runs a sync store's methods in a thread, for backends with no async client."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, name):
+        method = getattr(self._store, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+_async_store = None
+
+def get_async_store():
+    """Get the async flavour of the configured storage backend."""
+    global _async_store
+    if _async_store is None:
+        store = db.get_store()
+        # a native async client is timed here; the threaded fallback wraps the
+        # (already timed) sync store
+        _async_store = metrics.instrument_store(store.async_store()) or _ThreadedStore(store)
+    return _async_store
+
+def warm_up():
+    """Start the I/O loop and open the async client ahead of the first request.
+
+    Starts a thread, so only call it in a worker (after any fork).
+    """
+    asyncio.run_coroutine_threadsafe(get_async_store().warm_up(), _get_loop()).result()
+
+# ─────────────────────────────────────────────────────────────
+# AUTH HELPERS
+# ─────────────────────────────────────────────────────────────
+
+async def verify_id_token(id_token: str):
+    """Async db.verify_id_token (the firebase SDK call runs in a thread)."""
+    return await asyncio.to_thread(db.verify_id_token, id_token)
+
+def peek_token_uid(id_token: str):
+    """Read the uid out of an ID token WITHOUT verifying it.
+
+    Only good for prefetching (e.g. loading the user doc while the token is
+    being verified) — never trust it for anything else.
+    """
+    try:
+        payload = id_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        uid = claims.get("user_id") or claims.get("sub")
+        return uid if isinstance(uid, str) and uid else None
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+# ─────────────────────────────────────────────────────────────
+# USER OPERATIONS
+# ─────────────────────────────────────────────────────────────
+
+async def get_or_create_user(uid: str, email: str, display_name: str = None):
+    """Async db.get_or_create_user (shares the same user cache)."""
+    user = db.user_cache.get(uid)
+    if user is None:
+        user = await _on_io_loop(get_async_store().get_or_create_user(uid, email, display_name))
+        db.user_cache.put(uid, user)
+    return user
+
+async def get_user(uid: str):
+    """Async db.get_user (shares the same user cache)."""
+    user = db.user_cache.get(uid)
+    if user is None:
+        user = await _on_io_loop(get_async_store().get_user(uid))
+        if user is not None:
+            db.user_cache.put(uid, user)
+    return user
+
+# ─────────────────────────────────────────────────────────────
+# STORY OPERATIONS
+# ─────────────────────────────────────────────────────────────
+
+async def add_story(uid: str, title: str, story_content: str, prompts: dict,
+                    word_count: int, points_earned: int):
+    """Async db.add_story. Returns the new story's ID, or None on failure."""
+    try:
+        story_id, user = await _on_io_loop(get_async_store().add_story(
+            uid, title, compression.compress_content(story_content), prompts, word_count, points_earned,
+            user_hint=db.user_cache.peek(uid),
+        ))
+    except Exception as e:
+        db.user_cache.invalidate(uid)
+        logger.error("error saving story for %s: %s", uid, e)
+        return None
+
+    if user is not None:
+        db.user_cache.put(uid, user)
+    else:
+        db.user_cache.invalidate(uid)
+    search.index_story(uid, story_id, title, story_content, prompts)
+    return story_id
+
+async def get_story(uid: str, story_id: str):
+    """Async db.get_story (content as stored). Returns None if missing (or on error)."""
+    try:
+        return await _on_io_loop(get_async_store().get_story(uid, story_id))
+    except Exception as e:
+        logger.error("error fetching story %s: %s", story_id, e)
+        return None
@@ -0,0 +1,340 @@
+"""Server-side draft autosave for the writing form.
+
+The writing page sends the draft (title + text) every few seconds while
+someone types, and once more when the page goes away. The draft is tied
+to the session's prompt key, so /home can bring back the words *and* the
+prompts they were writing with after a reload, instead of dealing new
+ones.
+
+Autosaves are cheap by design:
+
+  - coalesced: a worker keeps only the newest autosave per user in memory,
+    and a background thread writes whatever's pending every FLUSH_INTERVAL
+    seconds — however often a user's browser sent it, that's one row write
+  - batched: each flush writes every pending draft in one sqlite transaction
+  - delta-compressed: a draft is stored as a base snapshot plus a list of
+    deltas, one per flushed revision. A delta is (unchanged prefix length,
+    unchanged suffix length, the text in between) — a few bytes for a few
+    typed words. Once the deltas outweigh the base (or there are
+    MAX_DELTAS of them) the current text becomes the new base
+
+so an autosave costs a dict assignment on the request path, and a
+fraction of a local sqlite row write per flush — never a database round
+trip. Every revision since the last snapshot can still be rebuilt
+(get_draft(uid, revision=...)).
+
+Drafts live in a local sqlite file shared by every worker on the machine
+(PROMPTL_DRAFTS_DB, default drafts.db). Up to FLUSH_INTERVAL seconds of
+typing can be lost if a worker dies, which is fine for a draft. A draft
+is cleared when its story is published or the user asks for new prompts.
+Clearing leaves a tombstone, so an older autosave still pending on
+another worker can't bring the draft back.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DRAFTS_DB = "drafts.db"
+FLUSH_INTERVAL = 2.0          # seconds between batched writes
+MAX_DELTAS = 100              # revisions kept on top of a base before re-snapshotting
+MAX_DRAFT_LENGTH = 200_000    # chars, same cap as live scoring
+MAX_TITLE_LENGTH = 200
+DRAFT_TTL = 30 * 24 * 3600    # seconds — untouched drafts (and tombstones) get purged
+PURGE_EVERY = 500             # flushes between purges
+PREFIX_STEP = 4096            # chars compared at a time when diffing revisions
+
+SCHEMA = """
+-- promptKey NULL = cleared (a tombstone, kept so stale autosaves can't revive it)
+CREATE TABLE IF NOT EXISTS drafts (
+    uid       TEXT PRIMARY KEY,
+    promptKey INTEGER,
+    title     TEXT NOT NULL DEFAULT '',
+    base      TEXT NOT NULL DEFAULT '',
+    deltas    TEXT NOT NULL DEFAULT '[]',
+    revision  INTEGER NOT NULL DEFAULT 0,
+    updatedAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS drafts_updated ON drafts (updatedAt);
+"""
+
+# ─────────────────────────────────────────────────────────────
+# DELTAS
+# ─────────────────────────────────────────────────────────────
+
+def _common_prefix(a, b, limit):
+    """Length of the common prefix of a and b (at most `limit`).
+
+    Compares slices (memcmp speed) instead of looping per char — drafts
+    can be 200k chars and only differ by a few words.
+    """
+    start = 0
+    while start < limit and a[start:start + PREFIX_STEP] == b[start:start + PREFIX_STEP]:
+        start += PREFIX_STEP
+    # the first difference is inside the next PREFIX_STEP chars: binary search it
+    low, high = min(start, limit), min(start + PREFIX_STEP, limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[start:middle] == b[start:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def make_delta(before, after):
+    """The [prefix, suffix, inserted] delta that turns `before` into `after`."""
+    limit = min(len(before), len(after))
+    prefix = _common_prefix(before, after, limit)
+    suffix = _common_prefix(before[::-1], after[::-1], limit - prefix)
+    return [prefix, suffix, after[prefix:len(after) - suffix]]
+
+def apply_delta(text, delta):
+    prefix, suffix, inserted = delta
+    return text[:prefix] + inserted + text[len(text) - suffix:]
+
+def rebuild(base, deltas, upto=None):
+    """The text after applying the first `upto` deltas (all by default) to base."""
+    text = base
+    for delta in deltas[:upto]:
+        text = apply_delta(text, delta)
+    return text
+
+def _delta_size(delta):
+    return len(delta[2]) + 8  # the two lengths, roughly, as json
+
+# ─────────────────────────────────────────────────────────────
+# STORE
+# ─────────────────────────────────────────────────────────────
+
+class DraftStore:
+    """Drafts in a local sqlite file, plus this worker's pending autosaves.
+
+    Connections are per thread and opened on first use — never in the
+    gunicorn master before the fork. The flush thread is started on the
+    first autosave in each process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()   # guards _pending + the counters
+        self._pending = {}              # uid -> (prompt_key, title, text, received_at)
+        self._thread = None
+        self._pid = None
+        self._flushes = 0
+        self.received = 0
+        self.coalesced = 0
+        self.written = 0
+        self.snapshots = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ── request path ──
+
+    def autosave(self, uid, prompt_key, title, text):
+        """Queue a draft to be written on the next flush (replacing any queued one)."""
+        with self._lock:
+            if uid in self._pending:
+                self.coalesced += 1
+            self._pending[uid] = (prompt_key, title, text, time.time())
+            self.received += 1
+        self._start()
+
+    def get(self, uid, revision=None):
+        """A user's draft, or None if they don't have one.
+
+        Args:
+            revision (int, optional): Rebuild this earlier revision instead
+                of the latest (only ones since the last snapshot are kept).
+
+        Returns:
+            dict: 'prompt_key', 'title', 'text' and 'revision'.
+        """
+        if revision is None:
+            with self._lock:
+                pending = self._pending.get(uid)
+            if pending is not None:
+                prompt_key, title, text, _ = pending
+                return {"prompt_key": prompt_key, "title": title, "text": text, "revision": None}
+
+        row = self._conn().execute(
+            "SELECT promptKey, title, base, deltas, revision FROM drafts WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        prompt_key, title, base, deltas, latest = row
+        deltas = json.loads(deltas)
+        if revision is None:
+            revision = latest
+        first = latest - len(deltas)  # the base's revision
+        if not first <= revision <= latest:
+            return None
+        text = rebuild(base, deltas, revision - first)
+        return {"prompt_key": prompt_key, "title": title, "text": text, "revision": revision}
+
+    def clear(self, uid):
+        """Drop a user's draft, here and (via a tombstone) for every other worker."""
+        with self._lock:
+            self._pending.pop(uid, None)
+        self._conn().execute(
+            "INSERT INTO drafts (uid, promptKey, updatedAt) VALUES (?, NULL, ?)"
+            " ON CONFLICT (uid) DO UPDATE SET promptKey = NULL, title = '', base = '', deltas = '[]',"
+            " updatedAt = excluded.updatedAt",
+            (uid, time.time()),
+        )
+
+    # ── flushing ──
+
+    def _start(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="promptl-drafts", daemon=True)
+                self._thread.start()
+                # a worker that's shutting down cleanly writes what's left
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("draft flush failed, will retry")
+
+    def flush(self):
+        """Write every pending autosave, in one transaction.
+
+        Returns:
+            int: How many drafts were written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        conn = self._conn()
+        written = snapshots = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for uid, (prompt_key, title, text, received_at) in pending.items():
+                written_now, snapshot = self._write(conn, uid, prompt_key, title, text, received_at)
+                written += written_now
+                snapshots += snapshot
+        except BaseException:
+            conn.execute("ROLLBACK")
+            # put them back (unless a newer autosave came in meanwhile)
+            with self._lock:
+                for uid, entry in pending.items():
+                    self._pending.setdefault(uid, entry)
+            raise
+        conn.execute("COMMIT")
+
+        self._flushes += 1
+        if self._flushes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM drafts WHERE updatedAt < ?", (time.time() - DRAFT_TTL,))
+        with self._lock:
+            self.written += written
+            self.snapshots += snapshots
+        return written
+
+    def _write(self, conn, uid, prompt_key, title, text, received_at):
+        """Store one draft as a delta on top of the stored one. Returns (written, snapshotted)."""
+        row = conn.execute(
+            "SELECT promptKey, base, deltas, revision, updatedAt FROM drafts WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is not None and row[4] >= received_at:
+            return 0, 0  # another worker already wrote something newer (or it was cleared)
+
+        if row is None or row[0] is None or row[0] != prompt_key:
+            # first draft for these prompts — the text is the base
+            conn.execute(
+                "INSERT INTO drafts (uid, promptKey, title, base, deltas, revision, updatedAt)"
+                " VALUES (?, ?, ?, ?, '[]', ?, ?)"
+                " ON CONFLICT (uid) DO UPDATE SET promptKey = excluded.promptKey, title = excluded.title,"
+                " base = excluded.base, deltas = '[]', revision = excluded.revision, updatedAt = excluded.updatedAt",
+                (uid, prompt_key, title, text, (row[3] + 1) if row else 0, received_at),
+            )
+            return 1, 1
+
+        _, base, deltas, revision, _ = row
+        deltas = json.loads(deltas)
+        current = rebuild(base, deltas)
+        delta = make_delta(current, text)
+        deltas.append(delta)
+        snapshot = len(deltas) > MAX_DELTAS or sum(_delta_size(d) for d in deltas) > len(base)
+        if snapshot:
+            base, deltas = text, []
+        conn.execute(
+            "UPDATE drafts SET title = ?, base = ?, deltas = ?, revision = ?, updatedAt = ? WHERE uid = ?",
+            (title, base, json.dumps(deltas, ensure_ascii=False, separators=(",", ":")),
+             revision + 1, received_at, uid),
+        )
+        return 1, int(snapshot)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "received": self.received,
+                "coalesced": self.coalesced,
+                "written": self.written,
+                "snapshots": self.snapshots,
+                "pending": len(self._pending),
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Get this process's draft store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DraftStore(os.getenv("PROMPTL_DRAFTS_DB", DEFAULT_DRAFTS_DB))
+    return _store
+
+def autosave(uid, prompt_key, title, text):
+    """Queue an autosave of the draft being written with `prompt_key`.
+
+    Raises:
+        ValueError: if the draft is too long to keep.
+    """
+    if len(text) > MAX_DRAFT_LENGTH:
+        raise ValueError("draft too long to autosave")
+    get_store().autosave(uid, prompt_key, title[:MAX_TITLE_LENGTH], text)
+
+def get_draft(uid, revision=None):
+    """The user's saved draft ('prompt_key', 'title', 'text', 'revision'), or None. Never raises."""
+    try:
+        return get_store().get(uid, revision)
+    except Exception as e:
+        logger.error("error loading draft for %s: %s", uid, e)
+        return None
+
+def clear_draft(uid):
+    """Forget the user's draft (it was published, or they want new prompts). Never raises."""
+    try:
+        get_store().clear(uid)
+    except Exception as e:
+        logger.error("error clearing draft for %s: %s", uid, e)
+
+def draft_stats():
+    """Received/coalesced/written/snapshot counters for this worker's autosaves."""
+    return get_store().stats()
@@ -0,0 +1,11 @@
+"""Loads the .env file — import this before anything that reads env vars.
+
+Modules like utils.metrics read their settings at import time, so the
+.env file has to be loaded before they're imported, not after. Importing
+this module does it exactly once per process (only matters locally;
+render injects the env vars directly).
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,109 @@
+"""Download-everything export of a user's archive.
+
+Both formats are generators that /export hands straight to flask, so the
+response goes out as it's produced: the archive is read a chunk of
+stories at a time (db.iter_user_stories) and each chunk is sent before
+the next is fetched. A worker's memory stays flat and bytes keep flowing,
+however many stories there are.
+
+    ndjson   one JSON object per line per story, newest first
+    zip      one .txt file per story (title, date, prompt words, text).
+             written with data descriptors, so it never has to seek back
+             and rewrite a header
+"""
+
+import json
+import re
+import zipfile
+from datetime import datetime
+
+import utils.compression as compression
+import utils.database as db
+
+EXPORT_FIELDS = ["title", "content", "prompts", "wordCount", "pointsEarned", "createdAt"]
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "zip": ("application/zip", "zip"),
+}
+
+def _stories(uid):
+    """The user's stories, newest first, with their content unpacked."""
+    for story in db.iter_user_stories(uid, EXPORT_FIELDS):
+        story["content"] = compression.decompress_content(story.get("content"))
+        yield story
+
+def _story_record(story):
+    """A story as a plain JSON-able dict."""
+    record = {"id": story["id"]}
+    for field in EXPORT_FIELDS:
+        value = story.get(field)
+        record[field] = value.isoformat() if isinstance(value, datetime) else value
+    return record
+
+def ndjson_lines(uid):
+    """Yield the archive as NDJSON, one encoded line per story."""
+    for story in _stories(uid):
+        yield (json.dumps(_story_record(story), ensure_ascii=False) + "\n").encode("utf-8")
+
+def _filename(story):
+    # e.g. 2025-03-14-the-dragon-who-baked-bread-abc123.txt — the id part
+    # keeps two stories with the same title (and day) apart
+    slug = re.sub(r"[^a-z0-9]+", "-", (story.get("title") or "").lower()).strip("-")[:60] or "untitled"
+    created_at = story.get("createdAt")
+    day = created_at.strftime("%Y-%m-%d") if created_at else "undated"
+    return f"{day}-{slug}-{story['id'][:6]}.txt"
+
+def _story_text(story):
+    lines = [story.get("title") or "Untitled"]
+    created_at = story.get("createdAt")
+    if created_at:
+        lines.append(created_at.strftime("%B %d, %Y").replace(" 0", " "))
+    words = [str(word) for word in (story.get("prompts") or {}).values() if word]
+    if words:
+        lines.append("Words used: " + ", ".join(words))
+    lines += [f"{story.get('wordCount', 0)} words, {story.get('pointsEarned', 0)} points", "", story.get("content") or ""]
+    return "\n".join(lines) + "\n"
+
+class _Chunks:
+    """A write-only file that hands back whatever was written since last time.
+
+    No tell()/seek(), so zipfile streams (data descriptors) instead of
+    seeking back to patch each file's header.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def zip_chunks(uid):
+    """Yield the archive as a zip of text files, one story at a time."""
+    out = _Chunks()
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for story in _stories(uid):
+            created_at = story.get("createdAt")
+            info = zipfile.ZipInfo(_filename(story), date_time=(created_at or datetime(1980, 1, 1)).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, _story_text(story))
+            yield out.take()
+    yield out.take()  # the central directory, written on close
+
+def export_stream(uid, fmt):
+    """(body generator, mimetype, file extension) for an export format.
+
+    Raises:
+        KeyError: for an unknown format.
+    """
+    mimetype, extension = FORMATS[fmt]
+    body = ndjson_lines(uid) if fmt == "ndjson" else zip_chunks(uid)
+    return body, mimetype, extension
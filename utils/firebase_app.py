@@ -0,0 +1,55 @@
+"""Firebase admin SDK setup — shared by firestore storage and token verification."""
+
+import os
+import json
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+# ─────────────────────────────────────────────────────────────
+# FIREBASE INITIALIZATION
+# ─────────────────────────────────────────────────────────────
+# we use a singleton pattern: initialize firebase once, reuse the connection.
+# this matches how you set up lockd in's backend.
+
+_db = None  # module-level cache for the firestore client
+_async_db = None  # same, for the asyncio firestore client (see utils/database_async.py)
+
+def initialize_firebase():
+    """Initialize the firebase admin SDK (only runs once per process)."""
+    if not firebase_admin._apps:
+        cred_json = os.getenv("FIREBASE_CREDENTIALS")
+        using_emulator = os.getenv("FIRESTORE_EMULATOR_HOST") or os.getenv("FIREBASE_AUTH_EMULATOR_HOST")
+        if not cred_json and using_emulator:
+            # the local firebase emulators don't check credentials — they only
+            # need a project id (the google clients pick up the hosts themselves)
+            project_id = os.getenv("GOOGLE_CLOUD_PROJECT", "promptl-local")
+            firebase_admin.initialize_app(options={"projectId": project_id})
+            return
+        if not cred_json:
+            raise RuntimeError("FIREBASE_CREDENTIALS env var not set!")
+
+        cred_dict = json.loads(cred_json)
+        cred = credentials.Certificate(cred_dict)
+        firebase_admin.initialize_app(cred)
+
+def get_db():
+    """Get the firestore client, initializing firebase if needed."""
+    global _db
+    if _db is None:
+        initialize_firebase()
+        _db = firestore.client()
+    return _db
+
+def get_async_db():
+    """Get the asyncio firestore client, initializing firebase if needed.
+
+    The client's connections belong to the event loop that first uses it,
+    so only call this from utils/database_async.py's I/O loop.
+    """
+    global _async_db
+    if _async_db is None:
+        from firebase_admin import firestore_async
+
+        initialize_firebase()
+        _async_db = firestore_async.client()
+    return _async_db
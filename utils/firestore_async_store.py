@@ -0,0 +1,84 @@
+"""Asyncio flavour of the firestore backend, for utils/database_async.py.
+
+Same documents, same single-commit story save as FirestoreStore — just
+awaiting the async client, so many requests' round trips can be in flight
+on one event loop at once. Only the operations the async routes need are
+here.
+"""
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+
+from utils.firebase_app import get_async_db
+from utils.firestore_store import (
+    MAX_SAVE_ATTEMPTS,
+    UPDATE_TIME_FIELD,
+    _bump_counters,
+    _new_story_doc,
+    _new_user_doc,
+    _story_batch,
+    _story_dict,
+    _user_dict,
+)
+
+class AsyncFirestoreStore:
+    """Async counterpart of FirestoreStore (must run on the database_async I/O loop)."""
+
+    def _users(self):
+        return get_async_db().collection("users")
+
+    async def warm_up(self):
+        get_async_db()
+
+    async def get_or_create_user(self, uid, email, display_name=None):
+        user_ref = self._users().document(uid)
+        user_doc = await user_ref.get()
+        if user_doc.exists:
+            return _user_dict(user_doc)
+
+        new_user = _new_user_doc(email, display_name)
+        db = get_async_db()
+        batch = db.batch()
+        batch.set(user_ref, new_user)
+        _bump_counters(db, batch, users=1)
+        user_result, _ = await batch.commit()
+        new_user["uid"] = uid
+        new_user[UPDATE_TIME_FIELD] = user_result.update_time
+        return new_user
+
+    async def get_user(self, uid):
+        user_doc = await self._users().document(uid).get()
+        if user_doc.exists:
+            return _user_dict(user_doc)
+        return None
+
+    async def add_story(self, uid, title, story_content, prompts, word_count, points_earned, user_hint=None,
+                        story_id=None, created_at=None):
+        # see FirestoreStore.add_story — one commit, precondition on the user doc
+        user_ref = self._users().document(uid)
+        story_ref = user_ref.collection("stories").document(story_id)
+        story_doc = _new_story_doc(title, story_content, prompts, word_count, points_earned, created_at)
+        user = user_hint if user_hint and user_hint.get(UPDATE_TIME_FIELD) else None
+
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            if user is None:
+                user = _user_dict(await user_ref.get())
+
+            batch, updated_user = _story_batch(get_async_db(), user_ref, user, story_ref, story_doc)
+            try:
+                _, user_result, _ = await batch.commit()
+            except FailedPrecondition:
+                user = None  # lost a race with another save — re-read + retry
+                continue
+            except AlreadyExists:
+                return story_ref.id, None  # a retry of a save that already went through
+
+            updated_user[UPDATE_TIME_FIELD] = user_result.update_time
+            return story_ref.id, updated_user
+
+        raise RuntimeError(f"story save for {uid} kept conflicting, gave up after {MAX_SAVE_ATTEMPTS} attempts")
+
+    async def get_story(self, uid, story_id):
+        doc = await self._users().document(uid).collection("stories").document(story_id).get()
+        if doc.exists:
+            return _story_dict(doc)
+        return None
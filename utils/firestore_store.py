@@ -0,0 +1,359 @@
+"""Firestore storage backend (the production default)."""
+
+import random
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from utils.firebase_app import get_db
+from utils.storage import LEADERBOARD_FIELDS, LEADERBOARDS, LISTING_FIELDS, SITE_COUNTERS, StoryStore, next_streak
+
+# firestore caps a batched write at 500 operations
+MAX_BATCH_WRITES = 500
+
+# how many times a story save is retried when a concurrent save wins the race
+MAX_SAVE_ATTEMPTS = 5
+
+# user dicts carry the doc's update time under this key, so a cached copy can
+# be used as an add_story precondition without re-reading the doc
+UPDATE_TIME_FIELD = "_updateTime"
+
+# the site-wide counters are spread over this many docs — a single doc only
+# takes about one write per second, and every story save bumps a counter
+COUNTER_SHARDS = 10
+
+# the UTC day of a user's last story ("2025-03-14"), kept next to
+# lastStoryDate. the streak board filters on it by equality, which — unlike
+# a range filter on lastStoryDate — can be combined with ranking by
+# currentStreak (composite index in firestore.indexes.json)
+STORY_DAY_FIELD = "lastStoryDay"
+
+def _story_day(created_at):
+    return created_at.astimezone(timezone.utc).date().isoformat() if created_at else None
+
+def _days_since(since):
+    """Every UTC day from `since` to today, as STORY_DAY_FIELD values."""
+    day, today = since.astimezone(timezone.utc).date(), datetime.now(timezone.utc).date()
+    days = []
+    while day <= today:
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+def _user_dict(user_doc):
+    data = user_doc.to_dict()
+    data["uid"] = user_doc.id
+    data[UPDATE_TIME_FIELD] = user_doc.update_time
+    return data
+
+def _story_dict(story_doc):
+    data = story_doc.to_dict()
+    data["id"] = story_doc.id  # include the doc ID so we can link to it
+    return data
+
+def _new_user_doc(email, display_name):
+    """Default values for a user's first login."""
+    return {
+        "email": email,
+        "displayName": display_name or email.split("@")[0],
+        "createdAt": datetime.now(timezone.utc),
+        "totalPoints": 0,
+        "totalWords": 0,
+        "currentStreak": 0,
+        "lastStoryDate": None,  # will be set when they write their first story
+        STORY_DAY_FIELD: None,
+        "version": 0,           # bumped by every save (keys the page cache)
+    }
+
+def _new_story_doc(title, story_content, prompts, word_count, points_earned, created_at=None):
+    return {
+        "title": title,
+        "content": story_content,
+        "prompts": prompts,
+        "wordCount": word_count,
+        "pointsEarned": points_earned,
+        "createdAt": created_at or datetime.now(timezone.utc),
+    }
+
+def _counter_shards(db):
+    return db.collection("stats").document("site").collection("shards")
+
+def _bump_counters(db, batch, **amounts):
+    """Add site counter increments (on a random shard) to a batch."""
+    shard = _counter_shards(db).document(str(random.randrange(COUNTER_SHARDS)))
+    batch.set(shard, {name: firestore.Increment(amount) for name, amount in amounts.items()}, merge=True)
+
+def _stats_update(user, story_doc):
+    """Work out the user update for a story save.
+
+    Returns:
+        tuple: (fields to write, the user doc as it will be after the save)
+    """
+    now = story_doc["createdAt"]
+    new_streak = next_streak(user.get("lastStoryDate"), user.get("currentStreak"), now.date())
+
+    # firestore.Increment is atomic — safer than read-modify-write for counters
+    # (it prevents race conditions if two writes happen at the same time)
+    fields = {
+        "totalPoints": firestore.Increment(story_doc["pointsEarned"]),
+        "totalWords": firestore.Increment(story_doc["wordCount"]),
+        "currentStreak": new_streak,
+        "lastStoryDate": now,
+        STORY_DAY_FIELD: _story_day(now),
+        "version": firestore.Increment(1),
+    }
+
+    # the commit precondition guarantees nothing changed since `user`, so the
+    # new doc is exactly what we read plus what we're writing
+    updated_user = dict(
+        user,
+        totalPoints=(user.get("totalPoints") or 0) + story_doc["pointsEarned"],
+        totalWords=(user.get("totalWords") or 0) + story_doc["wordCount"],
+        currentStreak=new_streak,
+        lastStoryDate=now,
+        lastStoryDay=_story_day(now),
+        version=(user.get("version") or 0) + 1,
+    )
+    return fields, updated_user
+
+def _story_batch(db, user_ref, user, story_ref, story_doc):
+    """Build the ONE atomic batch a story save commits (sync and async alike).
+
+    The story create, the user's totals/streak and the site counters all go
+    in together. The streak depends on the user doc we read, so the user
+    update carries a precondition on that doc's update time: if a
+    concurrent save changed the doc in between, the whole batch is rejected
+    (instead of both saves computing the same streak) and add_story retries.
+
+    Returns:
+        tuple: (batch, the user doc as it will be after the commit). Once
+               committed, set its UPDATE_TIME_FIELD from the commit's second
+               write result (the user update).
+    """
+    fields, updated_user = _stats_update(user, story_doc)
+    batch = db.batch()
+    batch.create(story_ref, story_doc)
+    batch.update(user_ref, fields, option=db.write_option(last_update_time=user[UPDATE_TIME_FIELD]))
+    _bump_counters(db, batch, stories=1, points=story_doc["pointsEarned"], words=story_doc["wordCount"])
+    return batch, updated_user
+
+class FirestoreStore(StoryStore):
+    """Stores users + stories in firestore.
+
+    Layout:
+        users/{uid}                      → profile + running totals
+        users/{uid}/stories/{storyId}    → one doc per story
+        stats/site/shards/{0..9}         → site-wide counters (summed on read)
+    """
+
+    def _users(self):
+        return get_db().collection("users")
+
+    def async_store(self):
+        from utils.firestore_async_store import AsyncFirestoreStore
+        return AsyncFirestoreStore()
+
+    def warm_up(self):
+        get_db()
+
+    # ─────────────────────────────────────────────────────────
+    # USER OPERATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def get_or_create_user(self, uid, email, display_name=None):
+        user_ref = self._users().document(uid)
+        user_doc = user_ref.get()
+
+        if user_doc.exists:
+            # user already exists — just return their data
+            return _user_dict(user_doc)
+
+        # first time login — create their doc with default values (and count them)
+        new_user = _new_user_doc(email, display_name)
+        db = get_db()
+        batch = db.batch()
+        batch.set(user_ref, new_user)
+        _bump_counters(db, batch, users=1)
+        user_result, _ = batch.commit()
+        new_user["uid"] = uid
+        new_user[UPDATE_TIME_FIELD] = user_result.update_time
+        return new_user
+
+    def get_user(self, uid):
+        user_doc = self._users().document(uid).get()
+        if user_doc.exists:
+            return _user_dict(user_doc)
+        return None
+
+    # ─────────────────────────────────────────────────────────
+    # STORY OPERATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def add_story(self, uid, title, story_content, prompts, word_count, points_earned, user_hint=None,
+                  story_id=None, created_at=None):
+        user_ref = self._users().document(uid)
+
+        # document() with no id generates the same kind of unique id add()
+        # does, but client-side — so the story can go into the same batch
+        # as the user update instead of being its own round trip.
+        story_ref = user_ref.collection("stories").document(story_id)
+        story_doc = _new_story_doc(title, story_content, prompts, word_count, points_earned, created_at)
+
+        # a cached user doc (with its update time) lets the first attempt skip
+        # the read entirely — the commit's precondition still proves it's current
+        user = user_hint if user_hint and user_hint.get(UPDATE_TIME_FIELD) else None
+
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            if user is None:
+                user = _user_dict(user_ref.get())
+            try:
+                return story_ref.id, self._commit_story(user_ref, user, story_ref, story_doc)
+            except FailedPrecondition:
+                # someone else updated the user doc (e.g. another save) between
+                # our read and our commit — nothing was written, so re-read + retry
+                user = None
+            except AlreadyExists:
+                # the story's create() failed, so the whole batch did: this is
+                # a retry of a save that already went through
+                return story_ref.id, None
+
+        raise RuntimeError(f"story save for {uid} kept conflicting, gave up after {MAX_SAVE_ATTEMPTS} attempts")
+
+    def _commit_story(self, user_ref, user, story_ref, story_doc):
+        """Write the story + the user's totals/streak in ONE atomic commit
+        (see _story_batch).
+
+        Returns:
+            dict: The user doc as it is after the commit.
+        """
+        batch, updated_user = _story_batch(get_db(), user_ref, user, story_ref, story_doc)
+        _, user_result, _ = batch.commit()
+
+        updated_user[UPDATE_TIME_FIELD] = user_result.update_time
+        return updated_user
+
+    def get_user_stories(self, uid):
+        stories_ref = (
+            self._users()
+            .document(uid)
+            .collection("stories")
+            .order_by("createdAt", direction=firestore.Query.DESCENDING)
+        )
+        return [_story_dict(doc) for doc in stories_ref.stream()]
+
+    def get_story(self, uid, story_id):
+        # scoping the lookup under the user's subcollection means we
+        # automatically can't accidentally return another user's story. ✨
+        doc = (
+            self._users()
+            .document(uid)
+            .collection("stories")
+            .document(story_id)
+            .get()
+        )
+        if doc.exists:
+            return _story_dict(doc)
+        return None
+
+    def get_user_stories_page(self, uid, page_size, after=None, before=None, fields=None):
+        stories_ref = self._users().document(uid).collection("stories")
+        query = (
+            stories_ref
+            .order_by("createdAt", direction=firestore.Query.DESCENDING)
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+            .select(fields or LISTING_FIELDS)  # projection: don't ship `content` over the wire
+        )
+
+        # fetch one extra story to find out whether there's another page
+        if before is not None:
+            created_at, story_id = before
+            query = query.end_before({"createdAt": created_at, "__name__": stories_ref.document(story_id)})
+            docs = query.limit_to_last(page_size + 1).get()  # limit_to_last can't stream
+            has_more = len(docs) > page_size
+            docs = docs[-page_size:]
+        else:
+            if after is not None:
+                created_at, story_id = after
+                query = query.start_after({"createdAt": created_at, "__name__": stories_ref.document(story_id)})
+            docs = list(query.limit(page_size + 1).stream())
+            has_more = len(docs) > page_size
+            docs = docs[:page_size]
+
+        return [_story_dict(doc) for doc in docs], has_more
+
+    # ─────────────────────────────────────────────────────────
+    # LEADERBOARDS + SITE STATS
+    # ─────────────────────────────────────────────────────────
+
+    def get_leaderboard(self, field, limit, active_since=None):
+        if field not in LEADERBOARDS.values():
+            raise ValueError(f"unknown leaderboard field: {field!r}")
+        # firestore's automatic single-field index serves this ordering
+        query = (
+            self._users()
+            .order_by(field, direction=firestore.Query.DESCENDING)
+            .select(LEADERBOARD_FIELDS)
+        )
+        if active_since is not None:
+            # only users who wrote on one of the days since — still `limit`
+            # reads, served by the (lastStoryDay, field) composite index
+            query = query.where(filter=FieldFilter(STORY_DAY_FIELD, "in", _days_since(active_since)))
+        return [dict(doc.to_dict(), uid=doc.id) for doc in query.limit(limit).stream()]
+
+    def get_site_stats(self):
+        stats = dict.fromkeys(SITE_COUNTERS, 0)
+        for shard in _counter_shards(get_db()).stream():
+            for name, value in (shard.to_dict() or {}).items():
+                if name in stats:
+                    stats[name] += value
+        return stats
+
+    def set_site_stats(self, stats):
+        db = get_db()
+        shards = _counter_shards(db)
+        batch = db.batch()
+        # the totals go in shard 0, every other shard starts again from zero
+        for n in range(COUNTER_SHARDS):
+            values = stats if n == 0 else {}
+            batch.set(shards.document(str(n)), {name: values.get(name, 0) for name in SITE_COUNTERS})
+        batch.commit()
+
+    # ─────────────────────────────────────────────────────────
+    # BULK OPERATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def iter_users(self, fields=None, start_after=None):
+        query = self._users().order_by("__name__")
+        if fields is not None:
+            # select([]) streams just the doc ids
+            query = query.select(fields)
+        if start_after is not None:
+            query = query.start_after({"__name__": self._users().document(start_after)})
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            data["uid"] = doc.id
+            yield data
+
+    def iter_stories(self, uid, fields=None):
+        query = self._users().document(uid).collection("stories")
+        if fields is not None:
+            query = query.select(fields)
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            data["id"] = doc.id
+            yield data
+
+    def apply_updates(self, updates):
+        db = get_db()
+        users = self._users()
+        for start in range(0, len(updates), MAX_BATCH_WRITES):
+            batch = db.batch()
+            for uid, story_id, fields in updates[start:start + MAX_BATCH_WRITES]:
+                ref = users.document(uid)
+                if story_id is not None:
+                    ref = ref.collection("stories").document(story_id)
+                elif "lastStoryDate" in fields:
+                    fields = dict(fields, **{STORY_DAY_FIELD: _story_day(fields["lastStoryDate"])})
+                batch.update(ref, fields)
+            batch.commit()
@@ -0,0 +1,363 @@
+"""Write-behind journal for story saves.
+
+Turned on with PROMPTL_JOURNAL=1. /save-writing then doesn't wait on the
+database at all: it appends the story to a local journal file, fsyncs it,
+and renders the congrats page. A background thread in each worker drains
+the journal into the store, in order. Once the fsync returns, the story
+survives a crash, a restart, or a database outage.
+
+When the store can't be reached, the drain stops at the entry that
+failed — its checkpoint stays just before it — and the segment is tried
+again from there after a backoff, for as long as the outage lasts. Only
+an entry that can never be saved (malformed, or rejected by the store)
+is set aside in dead.log, so it can't hold up the ones behind it.
+
+Every entry carries its story id, and StoryStore.add_story writes nothing
+for an id that's already saved, so replaying an entry twice (after a
+crash between saving it and recording that) can't double-count points.
+
+Layout (PROMPTL_JOURNAL_DIR, default journal/):
+
+    <pid>-<ns>.log       one segment per worker process: JSON lines, held
+                         under an flock by the worker appending to it
+    <pid>-<ns>.log.done  how many bytes of the segment are saved
+    dead.log             entries that can't be saved (malformed / rejected)
+
+A segment whose owner died (its flock is free) is picked up by the next
+worker that starts, and deleted once it's drained. Drained segments are
+rotated once they pass ROTATE_BYTES. Anything in dead.log can be retried
+with:
+
+    python -m utils.journal --dead
+
+(without --dead it drains any orphaned segments and exits).
+
+note: until its entry drains (normally milliseconds later), a saved story
+isn't in /prior-pieces or the user's totals yet.
+"""
+
+import argparse
+import fcntl
+import glob
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+import utils.env  # noqa: F401 — PROMPTL_JOURNAL is read right below
+import utils.database as db
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("PROMPTL_JOURNAL", "").lower() in ("1", "true", "yes", "on")
+JOURNAL_DIR = os.getenv("PROMPTL_JOURNAL_DIR", "journal")
+
+DRAIN_BATCH = 50            # entries read + checkpointed at a time
+DRAIN_INTERVAL = 5.0        # seconds between drain passes when nothing wakes us
+RETRY_BASE_DELAY = 0.5      # seconds before retrying after a failed pass, doubling...
+RETRY_MAX_DELAY = 60.0      # ...up to this, for as long as the store is down
+ROTATE_BYTES = 4 * 1024 * 1024
+
+DEAD_LETTER = "dead.log"
+
+# errors that retrying won't fix: a malformed entry (bad json, missing or
+# mistyped fields) or one the store rejects outright. anything else is
+# treated as the store being unavailable, and retried
+PERMANENT_ERRORS = (KeyError, TypeError, ValueError)
+try:
+    from google.api_core.exceptions import InvalidArgument
+    PERMANENT_ERRORS += (InvalidArgument,)
+except ImportError:
+    pass
+
+class StoreUnavailable(Exception):
+    """Saving an entry failed in a way that's worth retrying; the drain stopped there."""
+
+def _fsync_dir(path):
+    """Make a file's creation/removal in `path` durable."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _read_offset(path):
+    try:
+        with open(path + ".done") as f:
+            return int(f.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+def _write_offset(path, offset):
+    # a lost checkpoint only means some entries get replayed, which is harmless
+    with open(path + ".done", "w") as f:
+        f.write(str(offset))
+
+def _remove_segment(path):
+    for name in (path, path + ".done"):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+class Journal:
+    """This process's journal segment plus the thread that drains it."""
+
+    def __init__(self, directory=JOURNAL_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()  # guards the segment file + counters
+        self._wake = threading.Event()
+        self._file = None
+        self._path = None
+        self._pid = None               # the segment and thread belong to this pid
+        self._thread = None
+        self.appended = 0
+        self.saved = 0
+        self.retries = 0
+        self.dead = 0
+
+    # ── appending ──
+
+    def _open_segment(self):
+        """Start a new segment for this process (call with self._lock held)."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}-{time.time_ns()}.log")
+        f = open(path, "ab")
+        # held for as long as we live, so other workers know it isn't orphaned
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        _fsync_dir(self.directory)
+        self._file, self._path, self._pid = f, path, os.getpid()
+
+    def append(self, entry):
+        """Durably record one entry — it's on disk when this returns."""
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None or self._pid != os.getpid():
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.appended += 1
+        self.start()
+        self._wake.set()
+
+    def append_story(self, uid, title, story_content, prompts, word_count, points_earned):
+        """Journal a story save. Returns the id the story will be saved under."""
+        story_id = secrets.token_urlsafe(15)
+        self.append({
+            "id": story_id,
+            "uid": uid,
+            "title": title,
+            "content": story_content,
+            "prompts": prompts,
+            "wordCount": word_count,
+            "pointsEarned": points_earned,
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+        })
+        return story_id
+
+    # ── draining ──
+
+    def start(self):
+        """Start this process's drain thread, if it isn't running (call after any fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="promptl-journal", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        orphans_left = not self.recover_orphans()
+        failures = 0
+        while True:
+            self._wake.wait(timeout=DRAIN_INTERVAL)
+            self._wake.clear()
+            with self._lock:
+                path = self._path if self._pid == os.getpid() else None
+            try:
+                if path is not None:
+                    self._drain_own(path)
+                if orphans_left:
+                    orphans_left = not self.recover_orphans()
+                failures = 0
+            except StoreUnavailable as e:
+                failures += 1
+                delay = min(RETRY_BASE_DELAY * 2 ** (failures - 1), RETRY_MAX_DELAY)
+                logger.warning("journal drain stopped (%s), retrying in %.1fs", e, delay)
+                # new appends would wake us straight away — wait out the backoff first
+                time.sleep(delay)
+                self._wake.set()
+            except Exception:
+                logger.exception("journal drain of %s failed, will retry", path)
+
+    def _drain_own(self, path):
+        offset = self.drain(path)
+        if offset < ROTATE_BYTES:
+            return
+        # fully drained and big — start a fresh segment, unless something
+        # was appended since we looked
+        with self._lock:
+            if self._path != path or os.path.getsize(path) != offset:
+                return
+            self._file.close()
+            self._file = None
+            self._open_segment()
+        _remove_segment(path)
+
+    def drain(self, path):
+        """Save every complete entry of a segment past its checkpoint.
+
+        Returns:
+            int: The checkpoint afterwards (bytes of the segment that are saved).
+
+        Raises:
+            StoreUnavailable: if an entry couldn't be saved for now. The
+                checkpoint is left just before it.
+        """
+        offset = _read_offset(path)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # only whole lines — the last one may still be being written (or was
+        # torn by a crash before its fsync, in which case nobody was told it saved)
+        data = data[:data.rfind(b"\n") + 1]
+        lines = data.splitlines(keepends=True)
+
+        for start in range(0, len(lines), DRAIN_BATCH):
+            saved = 0
+            try:
+                for line in lines[start:start + DRAIN_BATCH]:
+                    self._save(line)
+                    saved += len(line)
+            finally:
+                # checkpoint up to (not including) an entry that failed
+                if saved:
+                    offset += saved
+                    _write_offset(path, offset)
+        return offset
+
+    def _save(self, line):
+        """Save one journal line. One that can never be saved goes to dead.log.
+
+        Raises:
+            StoreUnavailable: if it failed and is worth retrying later.
+        """
+        try:
+            entry = json.loads(line)
+            db.save_story(
+                entry["uid"], entry["title"], entry["content"], entry["prompts"],
+                entry["wordCount"], entry["pointsEarned"],
+                story_id=entry["id"], created_at=datetime.fromisoformat(entry["createdAt"]),
+            )
+        except PERMANENT_ERRORS as e:
+            logger.error("can't save journal entry (%s), moved to %s: %.200r", e, DEAD_LETTER, line)
+            with self._lock:
+                self.dead += 1
+            self._dead_letter(line)
+            return
+        except Exception as e:
+            with self._lock:
+                self.retries += 1
+            raise StoreUnavailable(f"saving a story failed: {e}") from e
+        with self._lock:
+            self.saved += 1
+
+    def _dead_letter(self, line):
+        with open(os.path.join(self.directory, DEAD_LETTER), "ab") as f:
+            f.write(line if line.endswith(b"\n") else line + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def recover_orphans(self):
+        """Drain + delete every segment whose owner is gone.
+
+        Returns:
+            bool: False if the store went away partway (what's left is
+                  picked up by a later call).
+        """
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.log"))):
+            if path == self._path or os.path.basename(path) == DEAD_LETTER:
+                continue
+            with open(path, "rb") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # a live worker's segment (or another worker is recovering it)
+                logger.info("recovering orphaned segment %s", path)
+                try:
+                    self.drain(path)
+                except StoreUnavailable as e:
+                    logger.warning("recovering %s stopped (%s), will retry", path, e)
+                    return False
+                _remove_segment(path)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "appended": self.appended,
+                "saved": self.saved,
+                "retries": self.retries,
+                "dead": self.dead,
+            }
+
+journal = Journal()
+
+def append_story(uid, title, story_content, prompts, word_count, points_earned):
+    """Journal a story save (fsynced before it returns). Returns its story id."""
+    return journal.append_story(uid, title, story_content, prompts, word_count, points_earned)
+
+def start():
+    """Start this worker's drain thread (also recovers orphaned segments)."""
+    journal.start()
+
+def journal_stats():
+    """Appended/saved/retry/dead-letter counters for this worker's journal."""
+    return journal.stats()
+
+def retry_dead_letters():
+    """Move dead.log aside and try its entries again (failures land in a new dead.log).
+
+    Returns:
+        int: How many entries were retried.
+
+    Raises:
+        StoreUnavailable: if the store can't be reached — the entries not
+            tried yet go back to dead.log.
+    """
+    path = os.path.join(journal.directory, DEAD_LETTER)
+    if not os.path.exists(path):
+        return 0
+    retrying = path + f".retry-{time.time_ns()}"
+    os.replace(path, retrying)
+    with open(retrying, "rb") as f:
+        lines = [line for line in f if line.strip()]
+    retried = 0
+    try:
+        for line in lines:
+            journal._save(line)
+            retried += 1
+    finally:
+        for line in lines[retried:]:
+            journal._dead_letter(line)
+        os.remove(retrying)
+    return retried
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drain orphaned story journal segments.")
+    parser.add_argument("--dead", action="store_true", help=f"also retry the entries in {DEAD_LETTER}")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not journal.recover_orphans():
+        raise SystemExit("the store isn't reachable — nothing was lost, run this again later")
+    if args.dead:
+        print(f"retried {retry_dead_letters()} dead-lettered stories")
+    print(journal.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Leaderboard rebuild — recompute user totals, streaks and site counters from the stories.
+
+Normally nothing needs rebuilding: every add_story bumps the user's totals
+(which the leaderboards are read from, via indexes) and the site counters in
+the same commit. Run this if they've drifted — after a manual data fix, after
+utils/rescore.py, or on a database that predates the site counters:
+
+    python -m utils.leaderboard [--dry-run]
+
+It's one streaming pass: users in uid order, each user's stories streamed
+with just the fields it sums (never the story content). Users whose stored
+totals/streak already match aren't written; everything else goes out in
+batched writes, and the site counters are overwritten at the end.
+
+note: like rescore, run it while saves are paused — a story saved mid-run
+can be missing from the rebuilt numbers.
+"""
+
+import argparse
+import json
+import time
+from datetime import timedelta
+
+from utils.rescore import MAX_BATCH_WRITES, REPORT_EVERY
+
+USER_FIELDS = ["totalPoints", "totalWords", "currentStreak", "lastStoryDate"]
+STORY_FIELDS = ["pointsEarned", "wordCount", "createdAt"]
+
+def streak_from_dates(dates):
+    """The streak a user would have from the (UTC) days they wrote on.
+
+    Matches what storage.next_streak builds up one save at a time: the run
+    of consecutive days ending on their most recent story day.
+    """
+    if not dates:
+        return 0
+    day = max(dates)
+    streak = 0
+    while day in dates:
+        streak += 1
+        day -= timedelta(days=1)
+    return streak
+
+def _user_totals(store, uid):
+    """Sum one user's stories (streamed) into the fields a user doc keeps."""
+    points = words = stories = 0
+    days = set()
+    last_story = None
+    for story in store.iter_stories(uid, fields=STORY_FIELDS):
+        points += story.get("pointsEarned") or 0
+        words += story.get("wordCount") or 0
+        stories += 1
+        created_at = story.get("createdAt")
+        if created_at is not None:
+            days.add(created_at.date())
+            if last_story is None or created_at > last_story:
+                last_story = created_at
+    fields = {
+        "totalPoints": points,
+        "totalWords": words,
+        "currentStreak": streak_from_dates(days),
+        "lastStoryDate": last_story,
+    }
+    return fields, stories
+
+def rebuild_leaderboard(dry_run=False):
+    """Recompute every user's totals + streak and the site counters.
+
+    Args:
+        dry_run (bool): Compute + report, but don't write anything.
+
+    Returns:
+        dict: Run summary — users, stories, writes, seconds, and the site stats.
+    """
+    import utils.database as database
+
+    store = database.get_store()
+    site = {"users": 0, "stories": 0, "points": 0, "words": 0}
+    pending, writes = [], 0
+    started = last_report = time.perf_counter()
+
+    def flush():
+        nonlocal pending, writes
+        if pending and not dry_run:
+            store.apply_updates(pending)
+        writes += len(pending)
+        pending = []
+
+    for user in store.iter_users(fields=USER_FIELDS):
+        fields, story_count = _user_totals(store, user["uid"])
+        site["users"] += 1
+        site["stories"] += story_count
+        site["points"] += fields["totalPoints"]
+        site["words"] += fields["totalWords"]
+
+        if any(user.get(name) != value for name, value in fields.items()):
+            pending.append((user["uid"], None, fields))
+            if len(pending) >= MAX_BATCH_WRITES:
+                flush()
+
+        now = time.perf_counter()
+        if now - last_report >= REPORT_EVERY:
+            print(f"[leaderboard] {site['users']:,} users, {site['stories']:,} stories")
+            last_report = now
+
+    flush()
+    if not dry_run:
+        store.set_site_stats(site)
+        # cached user docs may hold the old totals
+        database.user_cache.clear()
+
+    elapsed = time.perf_counter() - started
+    summary = dict(site, writes=writes, seconds=round(elapsed, 3), dry_run=dry_run)
+    print(f"[leaderboard] done — {site['users']:,} users, {site['stories']:,} stories "
+          f"in {elapsed:.1f}s, {writes:,} user writes")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild user totals, streaks and site counters from the stories.")
+    parser.add_argument("--dry-run", action="store_true", help="compute and report without writing")
+    args = parser.parse_args(argv)
+
+    summary = rebuild_leaderboard(dry_run=args.dry_run)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
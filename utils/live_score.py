@@ -0,0 +1,260 @@
+"""Live scoring for the writing form — updated per edit, not per story.
+
+The writing page sends each edit as a delta (offset, removed text, inserted
+text) instead of the whole story. For every draft we keep the text in a
+chunked buffer along with its running totals (word count, how many times
+each prompt appears), and an edit only re-examines a small window around
+itself:
+
+  - words: the window is widened to whitespace on both sides, so counting
+    words in it before and after the edit gives the exact change
+  - prompts: the window is widened by (longest prompt - 1) chars, which
+    covers every occurrence the edit could create or break
+
+so an update costs O(size of the edit), not O(size of the story).
+
+Drafts live in this worker's memory (see LiveScoreSessions). Every update
+carries the version it was made against; if it doesn't match ours (another
+worker had the draft, it was evicted, or a request got lost) we answer with
+a conflict and the client resends its full text.
+"""
+
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from utils.model import compile_prompts, score_story
+
+BUFFER_CHUNK_SIZE = 4096       # chars per buffer chunk
+MAX_DRAFT_LENGTH = 200_000     # chars — longer drafts just stop live-scoring
+LIVE_SESSIONS = 2000           # drafts kept per worker
+LIVE_SESSION_TTL = 30 * 60     # seconds a draft can sit idle
+
+_TRAILING_WORD = re.compile(r"\S*\Z")
+_LEADING_WORD = re.compile(r"\S*")
+_TRAILING_SPACE = re.compile(r"\s*\Z")
+_LEADING_SPACE = re.compile(r"\s*")
+
+# how far the scans for word/whitespace boundaries look at a time
+_SCAN_STEP = 64
+
+class OutOfSync(Exception):
+    """The edit doesn't apply to the draft we have (client should resend it all)."""
+
+# ─────────────────────────────────────────────────────────────
+# TEXT BUFFER
+# ─────────────────────────────────────────────────────────────
+
+class TextBuffer:
+    """A string kept as a list of chunks, so edits don't copy the whole text."""
+
+    def __init__(self, text=""):
+        self._chunks = _split_chunks(text)
+        self.length = len(text)
+
+    def __len__(self):
+        return self.length
+
+    def _locate(self, pos):
+        """(chunk index, offset in that chunk) for a position in the text."""
+        for index, chunk in enumerate(self._chunks):
+            if pos <= len(chunk):
+                return index, pos
+            pos -= len(chunk)
+        return len(self._chunks), 0
+
+    def slice(self, start, end):
+        """The text between two positions."""
+        if start >= end:
+            return ""
+        index, offset = self._locate(start)
+        pieces, needed = [], end - start
+        while needed > 0 and index < len(self._chunks):
+            piece = self._chunks[index][offset:offset + needed]
+            pieces.append(piece)
+            needed -= len(piece)
+            index, offset = index + 1, 0
+        return "".join(pieces)
+
+    def replace(self, start, end, text):
+        """Replace the text between two positions."""
+        first, first_offset = self._locate(start)
+        last, last_offset = self._locate(end)
+        head = self._chunks[first][:first_offset] if first < len(self._chunks) else ""
+        tail = self._chunks[last][last_offset:] if last < len(self._chunks) else ""
+        self._chunks[first:last + 1] = _split_chunks(head + text + tail)
+        self.length += len(text) - (end - start)
+
+    def text(self):
+        return "".join(self._chunks)
+
+    # ── boundary scans (in steps, so a long word only costs its own length) ──
+
+    def run_start(self, pos, pattern):
+        """Where the run of chars matching `pattern` that ends at pos begins."""
+        while pos > 0:
+            start = max(0, pos - _SCAN_STEP)
+            block = self.slice(start, pos)
+            run = pattern.search(block).start()
+            if run > 0 or start == 0:
+                return start + run
+            pos = start
+        return 0
+
+    def run_end(self, pos, pattern):
+        """Where the run of chars matching `pattern` that starts at pos ends."""
+        while pos < self.length:
+            end = min(self.length, pos + _SCAN_STEP)
+            block = self.slice(pos, end)
+            run = pattern.match(block).end()
+            if run < len(block) or end == self.length:
+                return pos + run
+            pos = end
+        return self.length
+
+def _split_chunks(text):
+    return [text[i:i + BUFFER_CHUNK_SIZE] for i in range(0, len(text), BUFFER_CHUNK_SIZE)]
+
+def _count_overlapping(text, pattern):
+    count, offset = 0, text.find(pattern)
+    while offset != -1:
+        count += 1
+        offset = text.find(pattern, offset + 1)
+    return count
+
+# ─────────────────────────────────────────────────────────────
+# LIVE SCORE
+# ─────────────────────────────────────────────────────────────
+
+class LiveScore:
+    """One draft's text + running score, updated edit by edit."""
+
+    def __init__(self, prompts, text=""):
+        self.prompts = prompts
+        self._matcher = compile_prompts(prompts)
+        self.lock = threading.Lock()
+        self.touched = time.monotonic()
+        self.reset(text)
+
+    def reset(self, text):
+        """Start over from a full copy of the draft."""
+        if len(text) > MAX_DRAFT_LENGTH:
+            raise ValueError("draft too long to live-score")
+        self.buffer = TextBuffer(text)
+        # a random starting version, so a client holding a version from some
+        # other (since evicted) draft can't accidentally line up with this one
+        self.version = secrets.randbits(31)
+        self.word_count = len(text.split())
+        lowered = text.lower()
+        self._hits = {pattern: _count_overlapping(lowered, pattern)
+                      for pattern in self._matcher.categories if pattern}
+
+    def apply(self, version, offset, removed, inserted):
+        """Apply one edit made against `version` of the draft.
+
+        Args:
+            version (int): The version the client's edit is based on.
+            offset (int): Where the edit starts (in characters).
+            removed (str): The text the edit removed at offset.
+            inserted (str): The text the edit inserted there.
+
+        Raises:
+            OutOfSync: if the edit doesn't match the draft we have.
+            ValueError: if the draft would get too long.
+        """
+        buffer = self.buffer
+        end = offset + len(removed)
+        if version != self.version or not 0 <= offset <= end <= len(buffer):
+            raise OutOfSync()
+        if len(buffer) - len(removed) + len(inserted) > MAX_DRAFT_LENGTH:
+            raise ValueError("draft too long to live-score")
+
+        # the window this edit can affect: out to whitespace for word counts,
+        # and (longest prompt - 1) chars each way for prompt matches
+        reach = max(self._matcher.max_length - 1, 0)
+        start = min(buffer.run_start(offset, _TRAILING_WORD), max(0, offset - reach))
+        stop = max(buffer.run_end(end, _LEADING_WORD), min(len(buffer), end + reach))
+        before = buffer.slice(start, stop)
+        if before[offset - start:end - start] != removed:
+            raise OutOfSync()
+        after = before[:offset - start] + inserted + before[end - start:]
+
+        self.word_count += len(after.split()) - len(before.split())
+        before, after = before.lower(), after.lower()
+        for pattern in self._hits:
+            self._hits[pattern] += _count_overlapping(after, pattern) - _count_overlapping(before, pattern)
+
+        buffer.replace(offset, end, inserted)
+        self.version += 1
+
+    def results(self):
+        """The draft's score, the same way calculate_points would score it.
+
+        Returns:
+            dict: 'version', 'word_count', 'char_count', 'points',
+                  'num_used_prompts', 'used_prompts' (prompt types hit so far).
+        """
+        buffer = self.buffer
+        # /save-writing strips the story before scoring it, so do the same
+        leading = buffer.run_end(0, _LEADING_SPACE)
+        trailing = len(buffer) - buffer.run_start(len(buffer), _TRAILING_SPACE) if leading < len(buffer) else 0
+        char_count = len(buffer) - leading - trailing
+
+        used = [prompt_type
+                for pattern, prompt_types in self._matcher.categories.items()
+                if not pattern or self._hits[pattern]
+                for prompt_type in prompt_types]
+        points, used_prompts_count = score_story(char_count, used)
+        return {
+            "version": self.version,
+            "word_count": self.word_count,
+            "char_count": char_count,
+            "points": points,
+            "num_used_prompts": used_prompts_count,
+            "used_prompts": sorted(used),
+        }
+
+# ─────────────────────────────────────────────────────────────
+# PER-WORKER DRAFTS
+# ─────────────────────────────────────────────────────────────
+
+class LiveScoreSessions:
+    """This worker's live drafts, by key (LRU, idle ones expire)."""
+
+    def __init__(self, max_size=LIVE_SESSIONS, ttl=LIVE_SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._drafts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The live draft for a key, or None."""
+        now = time.monotonic()
+        with self._lock:
+            draft = self._drafts.get(key)
+            if draft is None:
+                return None
+            if now - draft.touched > self.ttl:
+                del self._drafts[key]
+                return None
+            draft.touched = now
+            self._drafts.move_to_end(key)
+            return draft
+
+    def start(self, key, prompts, text):
+        """Start (or restart) a key's draft from its full text."""
+        draft = LiveScore(prompts, text)
+        with self._lock:
+            self._drafts[key] = draft
+            self._drafts.move_to_end(key)
+            while len(self._drafts) > self.max_size:
+                self._drafts.popitem(last=False)
+        return draft
+
+    def discard(self, key):
+        with self._lock:
+            self._drafts.pop(key, None)
+
+live_sessions = LiveScoreSessions()
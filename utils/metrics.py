@@ -0,0 +1,360 @@
+"""Request/database/scoring/template timings, in Prometheus text format.
+
+Turned on with PROMPTL_METRICS=1. The app then serves everything at
+/metrics for prometheus to scrape. When it's off, every timer below is a
+shared no-op context manager, so the hot paths pay one attribute check.
+
+/metrics isn't public: scrapers send `Authorization: Bearer <token>` with
+the token from PROMPTL_METRICS_TOKEN. Without a token set it only answers
+requests from the machine itself (127.0.0.1 / ::1); anyone else gets a 404.
+
+Metrics are per worker process (gunicorn runs several), so prometheus
+should scrape each worker, or you read them as a sample of one.
+
+What's recorded:
+  - promptl_request_duration_seconds{route,method,status}  every request
+  - promptl_request_db_calls{route}       storage round trips per request
+  - promptl_db_call_duration_seconds{op}  each utils.database store call
+  - promptl_scoring_duration_seconds      story analysis + scoring
+  - promptl_template_render_seconds{template}
+plus the user cache / page cache / story journal / draft autosave /
+token verifier / rate limiter counters, read when /metrics is hit.
+"""
+
+import bisect
+import contextvars
+import hmac
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import utils.env  # noqa: F401 — PROMPTL_METRICS is read right below
+
+ENABLED = os.getenv("PROMPTL_METRICS", "").lower() in ("1", "true", "yes", "on")
+TOKEN = os.getenv("PROMPTL_METRICS_TOKEN", "")
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+# seconds — from a cache hit up to a slow firestore round trip
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 12, 20, 50)
+
+_NOOP = nullcontext()
+
+# ─────────────────────────────────────────────────────────────
+# METRIC TYPES
+# ─────────────────────────────────────────────────────────────
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Histogram:
+    """A prometheus histogram, one set of buckets per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, *label_values):
+        """Context manager that observes how long its block took (no-op when disabled)."""
+        if not ENABLED:
+            return _NOOP
+        return self._timer(label_values)
+
+    @contextmanager
+    def _timer(self, label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = _format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, label_values, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            bucket_labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket_labels} {values[-1]}"
+            yield f"{self.name}_sum{labels} {values[-2]}"
+            yield f"{self.name}_count{labels} {values[-1]}"
+
+class Counter:
+    """A prometheus counter, per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+class Collected:
+    """Values read from somewhere else (e.g. cache stats) at scrape time."""
+
+    def __init__(self, name, help_text, kind, read):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self._read = read  # () -> number
+
+    def samples(self):
+        yield f"{self.name} {self._read()}"
+
+class CollectedByLabel(Collected):
+    """Like Collected, but read() returns {label value: number}."""
+
+    def __init__(self, name, help_text, kind, label, read):
+        super().__init__(name, help_text, kind, read)
+        self.label = label
+
+    def samples(self):
+        for value, number in sorted(self._read().items()):
+            yield f"{self.name}{_format_labels((self.label,), (value,))} {number}"
+
+# ─────────────────────────────────────────────────────────────
+# REGISTRY
+# ─────────────────────────────────────────────────────────────
+
+_registry = []
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+def render():
+    """Every registered metric, in prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_DURATION = register(Histogram(
+    "promptl_request_duration_seconds", "Time spent handling a request.", ("route", "method", "status")))
+REQUEST_DB_CALLS = register(Histogram(
+    "promptl_request_db_calls", "Storage round trips made while handling a request.", ("route",),
+    buckets=COUNT_BUCKETS))
+DB_CALL_DURATION = register(Histogram(
+    "promptl_db_call_duration_seconds", "Time spent in one storage backend call.", ("op",)))
+DB_CALL_ERRORS = register(Counter(
+    "promptl_db_call_errors_total", "Storage backend calls that raised.", ("op",)))
+SCORING_DURATION = register(Histogram(
+    "promptl_scoring_duration_seconds", "Time spent analyzing + scoring a story."))
+TEMPLATE_RENDER = register(Histogram(
+    "promptl_template_render_seconds", "Time spent rendering a template.", ("template",)))
+
+# ─────────────────────────────────────────────────────────────
+# DATABASE CALLS
+# ─────────────────────────────────────────────────────────────
+
+# storage calls made by the current request (a one-item list, so code running
+# in a copied context — like flask's async views — still adds to the same one)
+_request_db_calls = contextvars.ContextVar("promptl_request_db_calls", default=None)
+
+def db_call(op):
+    """Context manager around one storage backend call: times + counts it.
+
+    Only actual round trips should be wrapped — cache hits never get here.
+    """
+    if not ENABLED:
+        return _NOOP
+    return _db_timer(op)
+
+@contextmanager
+def _db_timer(op):
+    calls = _request_db_calls.get()
+    if calls is not None:
+        calls[0] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        DB_CALL_ERRORS.inc(op)
+        raise
+    finally:
+        DB_CALL_DURATION.observe(time.perf_counter() - started, op)
+
+class _TimedStore:
+    """Wraps a storage backend so every call goes through db_call()."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        # bulk streams (maintenance jobs) and non-calls pass straight through
+        if not callable(attr) or name.startswith("iter_") or name in ("async_store", "warm_up"):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            async def timed_async(*args, **kwargs):
+                with db_call(name):
+                    return await attr(*args, **kwargs)
+            return timed_async
+
+        def timed(*args, **kwargs):
+            with db_call(name):
+                return attr(*args, **kwargs)
+        return timed
+
+def instrument_store(store):
+    """Time + count a storage backend's calls (returns it untouched when disabled)."""
+    if not ENABLED or store is None:
+        return store
+    return _TimedStore(store)
+
+_collectors_registered = False
+
+def _register_collectors():
+    """Export the counters other modules already keep (read at scrape time).
+
+    Only the first call registers anything — init_app can run more than
+    once (a second app in tests), and the registry is module-wide.
+    """
+    global _collectors_registered
+    if _collectors_registered:
+        return
+    _collectors_registered = True
+    import utils.database as db
+    from utils.drafts import draft_stats
+    from utils.journal import journal_stats
+    from utils.page_cache import page_cache_stats
+    from utils.ratelimit import ratelimit_stats
+    from utils.token_verifier import token_metrics
+
+    for key in ("hits", "misses", "evictions"):
+        register(Collected(f"promptl_user_cache_{key}_total", f"User cache {key}.", "counter",
+                           lambda key=key: db.user_cache_stats()[key]))
+    register(Collected("promptl_user_cache_size", "User docs in the cache.", "gauge",
+                       lambda: db.user_cache_stats()["size"]))
+    for key in ("hits", "misses", "evictions"):
+        register(Collected(f"promptl_page_cache_{key}_total", f"Page cache {key}.", "counter",
+                           lambda key=key: page_cache_stats()[key]))
+    register(Collected("promptl_page_cache_bytes", "Rendered page bytes in the cache.", "gauge",
+                       lambda: page_cache_stats()["bytes"]))
+    for key in ("appended", "saved", "retries", "dead"):
+        register(Collected(f"promptl_journal_{key}_total", f"Story journal entries {key}.", "counter",
+                           lambda key=key: journal_stats()[key]))
+    for key in ("received", "coalesced", "written", "snapshots"):
+        register(Collected(f"promptl_draft_autosaves_{key}_total", f"Draft autosaves {key}.", "counter",
+                           lambda key=key: draft_stats()[key]))
+    register(Collected("promptl_draft_autosaves_pending", "Draft autosaves waiting for the next flush.", "gauge",
+                       lambda: draft_stats()["pending"]))
+    for key in ("hits", "misses", "failures"):
+        register(Collected(f"promptl_token_verify_{key}_total", f"ID token verification {key}.", "counter",
+                           lambda key=key: token_metrics()[key]))
+    for key, help_text in (("allowed", "Rate-limited route requests let through."),
+                           ("limited", "Requests turned away with a 429 (budget spent)."),
+                           ("shed", "Requests turned away with a 503 (too many in flight).")):
+        register(CollectedByLabel(f"promptl_ratelimit_{key}_total", help_text, "counter", "route",
+                                  lambda key=key: ratelimit_stats()[key]))
+    register(CollectedByLabel("promptl_requests_in_flight", "Requests running per concurrency group.", "gauge",
+                              "group", lambda: ratelimit_stats()["in_flight"]))
+
+# ─────────────────────────────────────────────────────────────
+# FLASK WIRING
+# ─────────────────────────────────────────────────────────────
+
+def init_app(app):
+    """Hook request + template timing into a flask app and add /metrics.
+
+    Does nothing unless PROMPTL_METRICS is on.
+    """
+    if not ENABLED:
+        return
+
+    from flask import Response, abort, g, request
+    from flask import before_render_template, template_rendered
+
+    @app.before_request
+    def _start_request():
+        g._metrics_started = time.perf_counter()
+        g._metrics_db_calls = [0]
+        _request_db_calls.set(g._metrics_db_calls)
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_DURATION.observe(time.perf_counter() - started, route, request.method, response.status_code)
+            REQUEST_DB_CALLS.observe(g._metrics_db_calls[0], route)
+            _request_db_calls.set(None)
+        return response
+
+    # template timing: flask signals fire right before and after rendering
+    render_starts = threading.local()
+
+    def _template_starting(sender, template, context, **extra):
+        render_starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+
+    def _template_done(sender, template, context, **extra):
+        stack = getattr(render_starts, "stack", None)
+        if stack:
+            TEMPLATE_RENDER.observe(time.perf_counter() - stack.pop(), template.name)
+
+    before_render_template.connect(_template_starting, app, weak=False)
+    template_rendered.connect(_template_done, app, weak=False)
+
+    _register_collectors()
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if not _scrape_allowed():
+            abort(404)  # as if it weren't there
+        return Response(render(), content_type=CONTENT_TYPE, headers={"Cache-Control": "no-store"})
+
+def _scrape_allowed():
+    """The scraper's bearer token matches PROMPTL_METRICS_TOKEN (or, with no
+    token set, the request comes from this machine)."""
+    from flask import request
+
+    if not TOKEN:
+        return request.remote_addr in LOCAL_ADDRESSES
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), TOKEN.encode())
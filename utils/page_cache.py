@@ -0,0 +1,153 @@
+"""Rendered-page cache — skip the template (and the database) for repeat views.
+
+Two kinds of pages are cached, both as the final HTML bytes:
+
+  - public pages (/, /about, /login, /signup) render the same output for
+    everyone, so they're cached by endpoint (plus whether the visitor is
+    logged in, which /'s call to action depends on)
+  - per-user pages (/prior-pieces, /my-account) only change when the user
+    saves a story. Every save bumps a `version` field on the user doc, so
+    they're cached by (uid, version, page): a save makes the old entries
+    unreachable, and they age out of the LRU on their own
+
+The user doc itself comes from db.user_cache, so a repeat view of a
+per-user page is two dict lookups — no database call, no rendering.
+
+Every cached response carries an ETag (a hash of the body), and a browser
+that sends it back with If-None-Match gets an empty 304 instead.
+
+The cache is per worker process and bounded by total bytes
+(PROMPTL_PAGE_CACHE_BYTES, 0 turns it off). Entries also expire after
+PROMPTL_PAGE_CACHE_TTL seconds, which bounds how stale a page can get
+when something other than add_story changes a user (utils/rescore.py,
+utils/leaderboard.py) — or a save on another worker, until this worker's
+copy of the user doc expires.
+"""
+
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PAGE_CACHE_BYTES = int(os.getenv("PROMPTL_PAGE_CACHE_BYTES", str(16 * 1024 * 1024)))
+PAGE_CACHE_TTL = float(os.getenv("PROMPTL_PAGE_CACHE_TTL", "600"))  # seconds
+
+# set by dont_cache() while a page renders
+_skip_caching = contextvars.ContextVar("page_cache_skip", default=False)
+
+def _with_etag(body):
+    """(body as bytes, its etag)."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return body, hashlib.sha1(body).hexdigest()
+
+class PageCache:
+    """A thread-safe TTL + LRU cache of rendered pages, bounded by total bytes."""
+
+    def __init__(self, max_bytes=PAGE_CACHE_BYTES, ttl=PAGE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, body, etag)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached (body, etag), or None (counts as a hit/miss)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)  # most recently used goes last
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, body):
+        """Cache a rendered page. Returns its (body bytes, etag)."""
+        body, etag = _with_etag(body)
+        # pages bigger than a quarter of the cache would just flush it
+        if len(body) > self.max_bytes // 4:
+            return body, etag
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, etag)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))  # the least recently used
+                self.evictions += 1
+        return body, etag
+
+    def get_or_render(self, key, render):
+        """The cached (body, etag) for key, calling render() to fill a miss.
+
+        A render that calls dont_cache() is served but not stored.
+        """
+        cached = self.get(key)
+        if cached is None:
+            token = _skip_caching.set(False)
+            try:
+                body = render()
+                skip = _skip_caching.get()
+            finally:
+                _skip_caching.reset(token)
+            cached = _with_etag(body) if skip else self.put(key, body)
+        return cached
+
+    def _drop(self, key):
+        _, body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+page_cache = PageCache()
+
+def dont_cache():
+    """Call while rendering a cached page to serve it this once without
+    storing it — e.g. when it's showing a failed database read."""
+    _skip_caching.set(True)
+
+def page_cache_stats():
+    """Hit/miss/eviction counters and size for this worker's page cache."""
+    return page_cache.stats()
+
+def cached_response(key, render):
+    """Serve a page from the cache (rendering it on a miss), with ETag/304.
+
+    Args:
+        key (tuple): Everything the page's HTML depends on.
+        render (callable): Returns the page's HTML; only called on a miss.
+    """
+    from flask import make_response, request, session
+
+    body, etag = page_cache.get_or_render(key, render)
+    response = make_response(body)
+    response.set_etag(etag)
+    # no-cache = the browser keeps it but asks first (and gets a 304 if
+    # unchanged). logged-in responses carry their session cookie, so shared
+    # caches must not keep those
+    visibility = "private" if session.get("uid") else "public"
+    response.headers["Cache-Control"] = f"{visibility}, no-cache"
+    return response.make_conditional(request)
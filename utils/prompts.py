@@ -1,4 +1,9 @@
+import os
 import random
+import sys
+import threading
+import zlib
+from array import array
 
 # set the file names for the prompts
 BONUS_FILE = "bonus.txt"
@@ -10,54 +15,260 @@ PLACES_FILE = "places.txt"
 # set the prompt file names as an array
 prompt_file_names = [BONUS_FILE, JOBS_FILE, NAMES_FILE, OBJECTS_FILE, PLACES_FILE]
 
+# which word list feeds which prompt category (the keys main.py + templates use)
+PROMPT_CATEGORIES = {
+    "name": NAMES_FILE,
+    "job": JOBS_FILE,
+    "object": OBJECTS_FILE,
+    "location": PLACES_FILE,
+    "bonus": BONUS_FILE,
+}
+
+# prompt keys are (mixed-radix index << 16) | tag. they're packed into
+# unsigned 64-bit arrays, and kept in sqlite (drafts), whose INTEGER is a
+# signed 64-bit int — so the index has to fit in 47 bits
+MAX_COMBINATIONS = 2 ** 47
+
+# word lists live in text/ at the project root
+TEXT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "text")
+
+# ─────────────────────────────────────────────────────────────
+# PROMPT BANK
+# ─────────────────────────────────────────────────────────────
+
+def _load_words(path):
+    """Read a word list file and normalize it into a tuple of uppercase prompts.
+
+    Files can separate entries with newlines or commas. Empty and
+    whitespace-only entries are dropped so they can never be picked.
+    """
+    with open(path, "r") as f:
+        data = f.read()
+
+    words = (entry.strip() for entry in data.replace("\n", ",").split(","))
+    return tuple(word.upper() for word in words if word)
+
+class PromptBank:
+    """In-memory cache of every prompt word list.
+
+    The files under text/ are read + parsed once (per worker) instead of on
+    every /home hit. Call reload() to pick up edited word lists without
+    restarting the workers.
+
+    Every possible prompt set also has a small integer "prompt key": the five
+    word indices packed in mixed radix, plus a 16-bit tag of the word lists
+    they index into. Storing the key (instead of the full dict) is enough to
+    rebuild the exact same prompts later.
+    """
+
+    def __init__(self, text_dir=TEXT_DIR):
+        self.text_dir = text_dir
+        self._lock = threading.Lock()
+        self._state = None
+        self.reload()
+
+    def reload(self):
+        """Re-read every word list from disk and swap them in atomically."""
+        lists = {
+            file_name: _load_words(os.path.join(self.text_dir, file_name))
+            for file_name in prompt_file_names
+        }
+        for file_name, words in lists.items():
+            if not words:
+                raise ValueError(f"prompt file {file_name} has no usable entries")
+
+        # the word lists in category order — this is what prompt keys index into
+        columns = tuple(lists[file_name] for file_name in PROMPT_CATEGORIES.values())
+        combinations = 1
+        for words in columns:
+            combinations *= len(words)
+        if combinations > MAX_COMBINATIONS:
+            raise ValueError(
+                f"the word lists make {combinations:,} prompt sets, too many for a "
+                f"64-bit prompt key (at most {MAX_COMBINATIONS:,})"
+            )
+
+        # fingerprint the lists so keys minted before a reload can be detected
+        tag = zlib.crc32("\x1e".join("\x1f".join(words) for words in columns).encode()) & 0xFFFF
+
+        # a single assignment swaps everything at once, so a request running
+        # alongside a reload sees either all old lists or all new ones
+        with self._lock:
+            self._state = (lists, columns, combinations, tag)
+
+    @property
+    def combinations(self):
+        """How many distinct prompt sets the current word lists can produce."""
+        return self._state[2]
+
+    @property
+    def tag(self):
+        """16-bit fingerprint of the current word lists (low bits of every key)."""
+        return self._state[3]
+
+    def words(self, file_name):
+        """Return the (uppercase) tuple of prompts for a word list file."""
+        return self._state[0][file_name]
+
+    def choice(self, file_name, rng=random):
+        """Pick one random prompt from a word list file."""
+        return rng.choice(self._state[0][file_name])
+
+    def all_prompts(self, rng=random):
+        """Pick one prompt for every category."""
+        lists = self._state[0]
+        return {
+            category: rng.choice(lists[file_name])
+            for category, file_name in PROMPT_CATEGORIES.items()
+        }
+
+    def random_key(self, rng=random):
+        """Pick a random prompt set and return its prompt key."""
+        _, _, combinations, tag = self._state
+        return (rng.randrange(combinations) << 16) | tag
+
+    def random_sets(self, n, rng=random):
+        """Draw n prompt sets and return them as a PromptSets batch.
+
+        The random bits for the whole batch come from one randbytes() call
+        rather than a randrange() per set: each 64-bit word is masked down to
+        just enough bits to index every combination, and the (under half)
+        that land past the end are drawn again.
+        """
+        _, columns, combinations, tag = self._state
+        mask = (1 << max(combinations - 1, 1).bit_length()) - 1
+        keys = array("Q")
+        while len(keys) < n:
+            raw = array("Q", rng.randbytes(8 * (n - len(keys))))
+            if sys.byteorder == "big":
+                raw.byteswap()  # same seed → same batch on any machine
+            keys.extend([(i << 16) | tag for i in [word & mask for word in raw] if i < combinations])
+        return PromptSets(keys, columns)
+
+    def prompts_for_key(self, key):
+        """Rebuild the prompt dict for a prompt key.
+
+        Raises:
+            ValueError: if the key is malformed or was minted for different word lists.
+        """
+        _, columns, combinations, tag = self._state
+        if not isinstance(key, int) or key < 0 or key & 0xFFFF != tag:
+            raise ValueError(f"prompt key {key!r} does not match the current word lists")
+        if key >> 16 >= combinations:
+            # _unpack would wrap it around to some other prompt set
+            raise ValueError(f"prompt key {key!r} is past the end of the current word lists")
+        return _unpack(key >> 16, columns)
+
+def _unpack(index, columns):
+    """Turn a mixed-radix combination index back into a prompt dict."""
+    story_prompts = {}
+    for category, words in zip(PROMPT_CATEGORIES, columns):
+        index, i = divmod(index, len(words))
+        story_prompts[category] = words[i]
+    return story_prompts
+
+class PromptSets:
+    """A compact batch of prompt sets, stored as one array of prompt keys.
+
+    Indexing returns the prompt dict for that set; key(i) returns the small
+    integer that can be stored (e.g. in the session) and turned back into
+    the same dict with prompts_from_key().
+    """
+
+    def __init__(self, keys, columns):
+        self.keys = keys
+        self._columns = columns
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, i):
+        return _unpack(self.keys[i] >> 16, self._columns)
+
+    def __iter__(self):
+        for key in self.keys:
+            yield _unpack(key >> 16, self._columns)
+
+    def key(self, i):
+        """Return the prompt key of the i-th set."""
+        return self.keys[i]
+
+# one bank per process — gunicorn workers each load their own copy on import
+_bank = PromptBank()
+
+def get_prompt_bank():
+    """Get the shared prompt bank for this process."""
+    return _bank
+
+def reload_prompts():
+    """Reload the word lists from text/ (e.g. after editing them on the server)."""
+    _bank.reload()
+
 # generate a single prompt using a specific file
 def gen_prompt(file_name):
     """Generate a random prompt from a specified text file.
-    
+
     Args:
         file_name (str): Name of the text file containing prompts.
-    
+
     Returns:
         str: A randomly selected prompt in uppercase.
     """
-    with open("text/" + file_name, "r") as f:
-        data = f.read()
-        data2 = data.replace("\n", ",").split(',')
-        
-    prompt = random.choice(data2)
-    return prompt.upper()
+    return _bank.choice(file_name)
 
 # generate all the prompts using all the files
 def gen_all_prompts():
     """Generate all writing prompts from their respective files.
-    
+
     Generates one prompt each for name, job, object, location, and bonus categories
-    by randomly selecting from their corresponding text files.
-    
+    by randomly selecting from their corresponding (preloaded) word lists.
+
     Returns:
         dict: Dictionary containing keys 'name', 'job', 'object', 'location', 'bonus',
               each with a randomly selected prompt value in uppercase.
     """
-    # keep track of prompts
-    story_prompts = {}
-    
-    # generate prompts for the dict
-    story_prompts['name'] = gen_prompt(NAMES_FILE)
-    story_prompts['job'] = gen_prompt(JOBS_FILE)
-    story_prompts['object'] = gen_prompt(OBJECTS_FILE)
-    story_prompts['location'] = gen_prompt(PLACES_FILE)
-    story_prompts['bonus'] = gen_prompt(BONUS_FILE)
-    
-    # return the prompts
-    return story_prompts
+    return _bank.all_prompts()
+
+# generate many prompt sets at once
+def gen_prompt_sets(n, seed=None):
+    """Generate a batch of complete prompt sets in one pass.
+
+    Each set is drawn uniformly (same odds as gen_all_prompts), but all N are
+    drawn from a single seedable RNG as packed prompt keys, so a batch is
+    cheap to pre-generate and the same seed always replays the same batch.
+
+    Args:
+        n (int): Number of prompt sets to generate.
+        seed (int, optional): Seed for the RNG. None uses fresh randomness.
+
+    Returns:
+        PromptSets: The sets, indexable as prompt dicts, with key(i) for each one.
+    """
+    return _bank.random_sets(n, random.Random(seed))
+
+def gen_prompt_key():
+    """Pick a random prompt set and return its prompt key (a small int)."""
+    return _bank.random_key()
+
+def prompts_from_key(key):
+    """Rebuild the prompt dict for a prompt key.
+
+    Returns:
+        dict: The prompts for the key, or None if the key is invalid or was
+              minted before the word lists were reloaded.
+    """
+    try:
+        return _bank.prompts_for_key(key)
+    except ValueError:
+        return None
 
 # generate a compliment for the results page
 def gen_compliment():
     """Generate a random compliment for display on the results page.
-    
+
     Returns:
         str: A randomly selected compliment message.
     """
     compliments = ['Great Job!', 'Excellent Work!', 'Super Job!', 'Way to Go!']
 
-    return random.choice(compliments)
\ No newline at end of file
+    return random.choice(compliments)
@@ -0,0 +1,275 @@
+"""Rate limiting + admission control for the expensive routes.
+
+Two separate guards, both checked before the view runs so a rejected
+request costs no database call at all:
+
+  - per-client token buckets. Each limited route has a budget (a burst
+    size, refilled at a steady rate), spent by the logged-in uid, or by
+    the client's IP before login. An empty bucket gets a 429 with a
+    Retry-After saying when the next token arrives
+  - per-worker concurrency caps. At most N requests of a group (saves and
+    logins, exports) run at once in each worker. One past that gets an
+    immediate 503 instead of queueing behind them, so a burst of writes
+    can't take every thread and starve page views
+
+Buckets live in a local sqlite file (PROMPTL_RATELIMIT_DB, default
+ratelimit.db) that every worker on the machine shares, so a client can't
+multiply its budget by landing on different workers. Each check is one
+atomic UPSERT. PROMPTL_RATELIMIT picks the store:
+
+    sqlite   (default) shared by every worker
+    memory   per process — single-worker dev only
+    off      no rate limits (the concurrency caps stay —
+             PROMPTL_SHED_LOAD=0 turns those off)
+
+Behind a proxy set PROMPTL_PROXY_HOPS (render: 1), so the client's IP is
+read from X-Forwarded-For instead of the proxy's address.
+
+Allowed / limited / shed counts and in-flight requests per route are
+exported at /metrics (see utils/metrics.py).
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import utils.env  # noqa: F401 — the settings below are read at import
+
+DEFAULT_RATELIMIT_DB = "ratelimit.db"
+PROXY_HOPS = int(os.getenv("PROMPTL_PROXY_HOPS", "0"))
+SHED_LOAD = os.getenv("PROMPTL_SHED_LOAD", "1").lower() in ("1", "true", "yes", "on")
+PURGE_EVERY = 1000            # sqlite: drop idle buckets every N checks
+IDLE_BUCKET_SECONDS = 3600    # a bucket untouched this long is full again anyway
+
+# endpoint -> (budget name, burst size, tokens per minute). the budget name
+# keys the buckets, so routes can share one
+BUDGETS = {
+    "create_session": ("login", 10, 10),       # keyed by IP — there's no uid yet
+    "save_writing": ("save", 6, 6),
+    "new_prompt": ("prompt", 20, 20),
+    "home": ("home", 40, 40),                  # every /new-prompt also lands here
+    "save_draft": ("draft", 30, 30),           # the writing form autosaves every few seconds
+    "search_stories": ("search", 20, 30),
+    "live_score": ("live-score", 60, 300),     # one edit at a time while typing, ~5/s at most
+    "story_stats": ("story-stats", 20, 30),    # analyzes the whole draft every call
+    "export_stories": ("export", 3, 0.2),      # a full archive read — one per 5 min after the burst
+}
+
+# endpoint -> concurrency group, and the max in flight per worker for each
+# (gunicorn.conf.py runs 16 threads per worker)
+ROUTE_GROUPS = {
+    "create_session": "writes",
+    "save_writing": "writes",
+    "export_stories": "export",
+}
+CONCURRENCY_LIMITS = {"writes": 8, "export": 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key       TEXT PRIMARY KEY,
+    tokens    REAL NOT NULL,
+    updatedAt REAL NOT NULL,
+    allowed   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updatedAt);
+"""
+
+# refill the bucket for the time since it was last touched, then take a
+# token if there's a whole one. every SET expression sees the old row, so
+# the whole check is this one atomic statement
+_TAKE = """
+INSERT INTO buckets (key, tokens, updatedAt, allowed) VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updatedAt) * :rate)
+             - (min(:capacity, tokens + (:now - updatedAt) * :rate) >= 1),
+    allowed = min(:capacity, tokens + (:now - updatedAt) * :rate) >= 1,
+    updatedAt = :now
+RETURNING allowed, tokens
+"""
+
+def _retry_after(tokens, rate):
+    """Whole seconds until a bucket holding `tokens` has one to spend."""
+    if rate <= 0:
+        return IDLE_BUCKET_SECONDS
+    return max(1, math.ceil((1 - tokens) / rate))
+
+# ─────────────────────────────────────────────────────────────
+# BUCKET STORES
+# ─────────────────────────────────────────────────────────────
+
+# take(key, capacity, rate) → (allowed, seconds until the next token)
+
+class MemoryBucketStore:
+    """Token buckets in a per-process dict."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self._checks = 0
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._checks += 1
+            if self._checks % PURGE_EVERY == 0:
+                cutoff = now - IDLE_BUCKET_SECONDS
+                self._buckets = {k: v for k, v in self._buckets.items() if v[1] > cutoff}
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+class SQLiteBucketStore:
+    """Token buckets in a local sqlite file, shared by every worker process.
+
+    Connections are per thread and opened on first use — never in the
+    gunicorn master before the fork.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._checks = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # buckets are worth nothing after a crash
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        conn = self._conn()
+        allowed, tokens = conn.execute(
+            _TAKE, {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        ).fetchone()
+        # racy across threads, but a purge that's a check early or late is fine
+        self._checks += 1
+        if self._checks % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM buckets WHERE updatedAt < ?", (now - IDLE_BUCKET_SECONDS,))
+        return bool(allowed), 0 if allowed else _retry_after(tokens, rate)
+
+def create_bucket_store(backend=None):
+    """Build the bucket store named by `backend` (or PROMPTL_RATELIMIT), or None for `off`."""
+    backend = (backend or os.getenv("PROMPTL_RATELIMIT") or "sqlite").lower()
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore(os.getenv("PROMPTL_RATELIMIT_DB", DEFAULT_RATELIMIT_DB))
+    raise RuntimeError(f"unknown PROMPTL_RATELIMIT backend: {backend!r}")
+
+# ─────────────────────────────────────────────────────────────
+# COUNTERS
+# ─────────────────────────────────────────────────────────────
+
+_stats_lock = threading.Lock()
+_allowed = defaultdict(int)     # endpoint -> requests let through
+_limited = defaultdict(int)     # endpoint -> 429s
+_shed = defaultdict(int)        # endpoint -> 503s
+_in_flight = defaultdict(int)   # concurrency group -> requests running now
+
+def _count(counter, key):
+    with _stats_lock:
+        counter[key] += 1
+
+def ratelimit_stats():
+    """Per-route allowed/limited/shed counts and per-group in-flight requests (this worker)."""
+    with _stats_lock:
+        return {
+            "allowed": dict(_allowed),
+            "limited": dict(_limited),
+            "shed": dict(_shed),
+            "in_flight": {group: _in_flight[group] for group in CONCURRENCY_LIMITS},
+        }
+
+# ─────────────────────────────────────────────────────────────
+# FLASK WIRING
+# ─────────────────────────────────────────────────────────────
+
+def client_key():
+    """Who a request's budget belongs to: their uid, or their IP before login."""
+    from flask import request, session
+
+    uid = session.get("uid")
+    if uid and request.endpoint != "create_session":
+        return "u:" + uid
+    route = request.access_route
+    if PROXY_HOPS and len(route) >= PROXY_HOPS:
+        return "ip:" + route[-PROXY_HOPS]
+    return "ip:" + (request.remote_addr or "unknown")
+
+def _reject(status, message, retry_after):
+    from flask import jsonify, make_response, request
+
+    # the json endpoints get json, pages get a line of text
+    if request.is_json or request.path.startswith(("/api/", "/auth/")):
+        response = make_response(jsonify({"error": message}), status)
+    else:
+        response = make_response(message, status)
+    response.headers["Retry-After"] = str(retry_after)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+def init_app(app, store=None):
+    """Check budgets + concurrency caps before every limited route runs."""
+    from flask import g, request
+
+    buckets = store if store is not None else create_bucket_store()
+    semaphores = {group: threading.BoundedSemaphore(limit) for group, limit in CONCURRENCY_LIMITS.items()}
+
+    @app.before_request
+    def _admit():
+        endpoint = request.endpoint
+        budget = BUDGETS.get(endpoint)
+        if budget is not None and buckets is not None:
+            name, capacity, per_minute = budget
+            allowed, retry_after = buckets.take(f"{name}:{client_key()}", capacity, per_minute / 60)
+            if not allowed:
+                _count(_limited, endpoint)
+                return _reject(429, "Slow down a little — try again in a moment.", retry_after)
+
+        group = ROUTE_GROUPS.get(endpoint) if SHED_LOAD else None
+        if group is not None:
+            # never wait: a full group means this worker is already busy enough
+            if not semaphores[group].acquire(blocking=False):
+                _count(_shed, endpoint)
+                return _reject(503, "We're a bit busy right now — try again in a moment.", 1)
+            g._admitted_group = group
+            with _stats_lock:
+                _in_flight[group] += 1
+
+        if budget is not None or group is not None:
+            _count(_allowed, endpoint)
+
+    def _release(group):
+        with _stats_lock:
+            _in_flight[group] -= 1
+        semaphores[group].release()
+
+    @app.after_request
+    def _hold(response):
+        # a streamed body (/export) is produced after the request is torn
+        # down, so the slot is only given back once the response is closed
+        group = g.pop("_admitted_group", None)
+        if group is not None:
+            response.call_on_close(lambda: _release(group))
+        return response
+
+    @app.teardown_request
+    def _release_unanswered(exc=None):
+        # no response made it through after_request (it raised) — free the slot now
+        group = g.pop("_admitted_group", None)
+        if group is not None:
+            _release(group)
@@ -0,0 +1,268 @@
+"""Bulk rescoring — recompute every story's points (and user totals) after a rules change.
+
+Run it from the project root once the scoring rules in utils/model.py change:
+
+    python -m utils.rescore [--workers 4] [--dry-run] [--checkpoint rescore.checkpoint.json]
+
+It streams users/{uid}/stories in user-id order, rescores the stored
+`prompts` + `content` in a process pool, writes `pointsEarned`/`wordCount`
+back with batched writes (only for stories whose score actually changed)
+and sets each user's `totalPoints`/`totalWords` from one aggregation over
+their rescored stories.
+
+Progress is checkpointed (the last fully written uid), so re-running after a
+crash resumes where it stopped. It works on whichever storage backend is
+configured (see utils/storage.py) — use PROMPTL_STORAGE=sqlite for a local
+archive, or FIRESTORE_EMULATOR_HOST for the local firestore emulator.
+
+note: user totals are overwritten, so run it while saves are paused (or
+accept that a story saved mid-run is missing from that user's totals until
+the next rescore). The site-wide points/words counters aren't touched — run
+`python -m utils.leaderboard` afterwards to bring them back in line.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import utils.compression as compression
+import utils.model as model
+
+DEFAULT_CHECKPOINT = "rescore.checkpoint.json"
+CHUNK_SIZE = 200          # stories sent to a pool worker at a time
+MAX_BATCH_WRITES = 400    # updates per batch (firestore caps a batch at 500)
+REPORT_EVERY = 5.0        # seconds between progress lines
+
+# ─────────────────────────────────────────────────────────────
+# SCORING (runs inside the pool workers)
+# ─────────────────────────────────────────────────────────────
+
+def _rescore_chunk(stories):
+    """Rescore a chunk of (prompts, content) pairs.
+
+    Returns:
+        list: (points, word_count) for each story, in the same order — or,
+              for a story that can't be scored, a str saying why (it's
+              skipped, and its stored score left alone).
+    """
+    results = []
+    for story_prompts, content in stories:
+        try:
+            content = compression.decompress_content(content)  # unpacked here, in the pool
+        except ValueError as e:
+            results.append(f"can't read its content: {e}")  # e.g. zstd without zstandard
+            continue
+        if not isinstance(story_prompts, dict) or not isinstance(content, str):
+            results.append("malformed prompts or content")
+            continue
+        points, _, _ = model.score_points(story_prompts, content)
+        results.append((points, len(content.split())))
+    return results
+
+# ─────────────────────────────────────────────────────────────
+# CHECKPOINTING
+# ─────────────────────────────────────────────────────────────
+
+def load_checkpoint(path):
+    """Read the checkpoint file, or a fresh one if there isn't any."""
+    if not os.path.exists(path):
+        return {"last_uid": None, "stories": 0, "users": 0}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically (a crash mid-write never corrupts it)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# ─────────────────────────────────────────────────────────────
+# BATCHED WRITES
+# ─────────────────────────────────────────────────────────────
+
+class _BatchWriter:
+    """Collects updates into batches and commits them when full.
+
+    Users are only marked done (and checkpointed) once the batch holding
+    their last write has committed.
+    """
+
+    def __init__(self, store, checkpoint, checkpoint_path, dry_run=False):
+        self.store = store
+        self.checkpoint = checkpoint
+        self.checkpoint_path = checkpoint_path
+        self.dry_run = dry_run
+        self.pending = []
+        self.finished_uids = []
+        self.finished_stories = 0
+        self.writes = 0
+
+    def update(self, uid, story_id, fields):
+        self.pending.append((uid, story_id, fields))
+        if len(self.pending) >= MAX_BATCH_WRITES:
+            self.flush()
+
+    def user_finished(self, uid, story_count):
+        self.finished_uids.append(uid)
+        self.finished_stories += story_count
+
+    def flush(self):
+        if self.pending and not self.dry_run:
+            self.store.apply_updates(self.pending)
+        self.writes += len(self.pending)
+        self.pending = []
+
+        if self.finished_uids:
+            self.checkpoint["last_uid"] = self.finished_uids[-1]
+            self.checkpoint["users"] += len(self.finished_uids)
+            self.checkpoint["stories"] += self.finished_stories
+            if not self.dry_run:
+                save_checkpoint(self.checkpoint_path, self.checkpoint)
+            self.finished_uids = []
+            self.finished_stories = 0
+
+# ─────────────────────────────────────────────────────────────
+# PIPELINE
+# ─────────────────────────────────────────────────────────────
+
+def _iter_chunks(store, last_uid):
+    """Stream stories as chunks of work.
+
+    Yields:
+        tuple: (refs, stories, closed) — (uid, story id, stored values) for
+               each story, their (prompts, content) pairs for the pool, and
+               the (uid, stored totals) of users whose stories all appear in
+               this chunk or earlier ones.
+    """
+    refs, stories, closed = [], [], []
+
+    # users stream in uid order, so resuming just starts after the checkpoint.
+    # only pull the fields we compare against — not the whole user doc
+    for user in store.iter_users(fields=["totalPoints", "totalWords"], start_after=last_uid):
+        uid = user["uid"]
+        story_fields = ["prompts", "content", "pointsEarned", "wordCount"]
+        for story in store.iter_stories(uid, fields=story_fields):
+            refs.append((uid, story["id"], (story.get("pointsEarned"), story.get("wordCount"))))
+            stories.append((story.get("prompts"), story.get("content")))
+            if len(stories) >= CHUNK_SIZE:
+                yield refs, stories, closed
+                refs, stories, closed = [], [], []
+
+        closed.append((uid, (user.get("totalPoints"), user.get("totalWords"))))
+
+    if refs or closed:
+        yield refs, stories, closed
+
+def rescore_all(workers=None, checkpoint_path=DEFAULT_CHECKPOINT, dry_run=False):
+    """Rescore every story in the archive and recompute every user's totals.
+
+    Args:
+        workers (int, optional): Process pool size (defaults to the CPU count).
+        checkpoint_path (str): Where progress is saved for resuming.
+        dry_run (bool): Score + report, but don't write anything.
+
+    Returns:
+        dict: Run summary — stories, skipped, writes, users, seconds, stories_per_second.
+    """
+    # imported here so the pool workers never touch the storage backend
+    import utils.database as database
+
+    store = database.get_store()
+    checkpoint = load_checkpoint(checkpoint_path)
+    writer = _BatchWriter(store, checkpoint, checkpoint_path, dry_run=dry_run)
+
+    totals = {}  # uid -> [points, words, story_count] for users still in flight
+    stories_done = skipped = 0
+    started = last_report = time.perf_counter()
+
+    def _consume(refs, future, closed):
+        nonlocal stories_done, skipped
+        for (uid, story_id, stored), result in zip(refs, future.result()):
+            user_totals = totals.setdefault(uid, [0, 0, 0])
+            if isinstance(result, str):
+                # not rescored — its stored score still counts towards the user's totals
+                print(f"[rescore] skipped story {story_id} of {uid}: {result}")
+                skipped += 1
+                points, words = (value if isinstance(value, int) else 0 for value in stored)
+                user_totals[0] += points
+                user_totals[1] += words
+                user_totals[2] += 1
+                continue
+            points, words = result
+            user_totals[0] += points
+            user_totals[1] += words
+            user_totals[2] += 1
+            if stored != (points, words):
+                writer.update(uid, story_id, {"pointsEarned": points, "wordCount": words})
+        stories_done += len(refs)
+
+        # every story for these users has been rescored — one aggregate write each
+        for uid, stored in closed:
+            points, words, story_count = totals.pop(uid, (0, 0, 0))
+            if stored != (points, words):
+                writer.update(uid, None, {"totalPoints": points, "totalWords": words})
+            writer.user_finished(uid, story_count)
+
+    workers = workers or os.cpu_count() or 1
+    # spawned, not forked — the store's client (and its open stream) mustn't
+    # be copied into the workers
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        max_in_flight = 2 * workers
+
+        for refs, stories, closed in _iter_chunks(store, checkpoint.get("last_uid")):
+            in_flight.append((refs, pool.submit(_rescore_chunk, stories), closed))
+
+            # results are consumed in submission order, which keeps the
+            # "user is finished" bookkeeping (and the checkpoint) in uid order
+            while len(in_flight) >= max_in_flight:
+                _consume(*in_flight.popleft())
+
+            now = time.perf_counter()
+            if now - last_report >= REPORT_EVERY:
+                rate = stories_done / (now - started)
+                print(f"[rescore] {stories_done:,} stories rescored ({rate:,.0f}/s)")
+                last_report = now
+
+        while in_flight:
+            _consume(*in_flight.popleft())
+
+    writer.flush()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "stories": stories_done,
+        "skipped": skipped,
+        "writes": writer.writes,
+        "users": checkpoint["users"],
+        "seconds": round(elapsed, 3),
+        "stories_per_second": round(stories_done / elapsed, 1) if elapsed else 0.0,
+        "dry_run": dry_run,
+    }
+    print(f"[rescore] done — {stories_done:,} stories in {elapsed:.1f}s "
+          f"({summary['stories_per_second']:,.0f} stories/s), {writer.writes:,} writes, {skipped:,} skipped")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore every story with the current scoring rules.")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="checkpoint file for resuming")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="score and report without writing")
+    args = parser.parse_args(argv)
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    summary = rescore_all(workers=args.workers, checkpoint_path=args.checkpoint, dry_run=args.dry_run)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
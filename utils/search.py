@@ -0,0 +1,283 @@
+"""Full-text search over each user's own stories.
+
+The index is a local sqlite FTS5 table — an inverted index of every token
+to the stories (and positions) it appears in — over each story's title,
+content and prompt words. It sits next to the real store (firestore or
+sqlite alike) and is kept up to date by every story save; the stories
+themselves never have to be loaded to search them.
+
+Every row also carries an `owner` token derived from the uid, and every
+query ANDs it in, so a search only ever walks the posting lists for the
+searcher's own stories' terms — it stays a few ms even for users with
+thousands of stories. Results are ranked by bm25 (a title hit counts for
+more than a hit in the story text) and come with a highlighted snippet.
+
+The index is derived data: if it's lost or out of date, rebuild it from
+the store (streamed, one user at a time):
+
+    python -m utils.search --rebuild
+
+Lives in PROMPTL_SEARCH_DB (default search.db). Connections are per
+thread and opened on first use, never before a fork.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from markupsafe import Markup, escape
+
+import utils.compression as compression
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_DB = "search.db"
+MAX_RESULTS = 20
+MAX_QUERY_TERMS = 8
+SNIPPET_TOKENS = 16
+REBUILD_BATCH = 500        # stories per transaction during --rebuild
+
+# the columns search terms are matched against (owner is only for scoping)
+TEXT_COLUMNS = ("title", "content", "prompts")
+# bm25 weights, in column order: owner (never scored), title, content, prompts
+COLUMN_WEIGHTS = (0.0, 8.0, 1.0, 3.0)
+# columns a snippet can come from, best first. never -1 ("whichever matched
+# best"): every query matches the owner token, so that could pick the hash
+SNIPPET_COLUMNS = (2, 3)  # content, prompts
+
+SCHEMA = """
+-- one row per indexed story; its id is the fts row id
+CREATE TABLE IF NOT EXISTS indexed_stories (
+    id        INTEGER PRIMARY KEY,
+    storyId   TEXT NOT NULL UNIQUE,
+    uid       TEXT NOT NULL,
+    createdAt TEXT
+);
+
+-- prefix indexes keep the as-you-type last word (a 2-3 letter prefix) fast
+CREATE VIRTUAL TABLE IF NOT EXISTS story_text USING fts5(
+    owner, title, content, prompts,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# snippet() markers — control characters, so they can't collide with story
+# text, and get swapped for <mark> tags after the text is html-escaped
+_MARK_START, _MARK_END = "\x02", "\x03"
+_TERM = re.compile(r"\w+")
+
+def _owner_token(uid):
+    # uids can hold characters the tokenizer would split on; a hex digest can't
+    return "u" + hashlib.sha1(uid.encode("utf-8")).hexdigest()[:24]
+
+def _prompt_words(prompts):
+    return " ".join(str(word) for word in (prompts or {}).values())
+
+def match_expression(uid, query):
+    """The FTS5 query for a user's search box text, or None if it has no words.
+
+    Every word has to match (the last one as a prefix, so results show up
+    while someone's still typing). Words are quoted, so nothing the user
+    types is read as FTS5 syntax, and only look at the text columns —
+    never the owner token.
+    """
+    terms = _TERM.findall(query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    words = [f'"{term}"' for term in terms]
+    words[-1] += "*"
+    return f'owner : "{_owner_token(uid)}" AND {{{" ".join(TEXT_COLUMNS)}}} : (' + " AND ".join(words) + ")"
+
+def _highlight(snippet):
+    """Escape a raw snippet and turn its markers into <mark> tags."""
+    return Markup(
+        str(escape(snippet)).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    )
+
+def _best_snippet(snippets):
+    """The first snippet with a match in it, or the story text's opening if
+    only the title matched."""
+    return next((snippet for snippet in snippets if _MARK_START in snippet), snippets[0])
+
+class SearchIndex:
+    """The sqlite FTS5 index of every user's stories."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _add(self, conn, uid, story_id, title, content, prompts, created_at):
+        """Index one story (inside a transaction). Already-indexed ids are skipped."""
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO indexed_stories (storyId, uid, createdAt) VALUES (?, ?, ?)",
+            (story_id, uid, created_at.isoformat() if created_at else None),
+        )
+        if cursor.rowcount:
+            conn.execute(
+                "INSERT INTO story_text (rowid, owner, title, content, prompts) VALUES (?, ?, ?, ?, ?)",
+                (cursor.lastrowid, _owner_token(uid), title or "", content or "", _prompt_words(prompts)),
+            )
+        return bool(cursor.rowcount)
+
+    def add(self, uid, story_id, title, content, prompts, created_at=None):
+        """Index one story (stories never change, so indexing twice is a no-op)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._add(conn, uid, story_id, title, content, prompts, created_at)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def add_many(self, rows):
+        """Index (uid, story_id, title, content, prompts, created_at) rows in one transaction.
+
+        Returns:
+            int: How many of them weren't indexed yet.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = sum(self._add(conn, *row) for row in rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return added
+
+    def search(self, uid, query, limit=MAX_RESULTS):
+        """Rank a user's stories against a query.
+
+        Returns:
+            list: Dicts with 'id', 'title', 'created_at' (datetime or None)
+                  and 'snippet' (safe html with the matches in <mark>), best first.
+        """
+        expression = match_expression(uid, query)
+        if expression is None:
+            return []
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+        snippets = ", ".join(
+            f"snippet(story_text, {column}, :start, :end, '…', {SNIPPET_TOKENS})" for column in SNIPPET_COLUMNS
+        )
+        rows = self._conn().execute(
+            f"SELECT s.storyId, t.title, s.createdAt, {snippets}"
+            f" FROM story_text t JOIN indexed_stories s ON s.id = t.rowid"
+            f" WHERE story_text MATCH :match ORDER BY bm25(story_text, {weights}) LIMIT :limit",
+            {"start": _MARK_START, "end": _MARK_END, "match": expression, "limit": limit},
+        ).fetchall()
+        return [
+            {
+                "id": story_id,
+                "title": title,
+                "created_at": datetime.fromisoformat(created_at) if created_at else None,
+                "snippet": _highlight(_best_snippet(snippets)),
+            }
+            for story_id, title, created_at, *snippets in rows
+        ]
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM indexed_stories")
+        conn.execute("DELETE FROM story_text")
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Get this process's search index, creating it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(os.getenv("PROMPTL_SEARCH_DB", DEFAULT_SEARCH_DB))
+    return _index
+
+def index_story(uid, story_id, title, content, prompts, created_at=None):
+    """Add a just-saved story to the search index.
+
+    Never raises — a story that misses the index is still saved, and the
+    next --rebuild picks it up.
+    """
+    try:
+        get_index().add(uid, story_id, title, content, prompts, created_at or datetime.now(timezone.utc))
+    except Exception as e:
+        logger.error("error indexing story %s for %s: %s", story_id, uid, e)
+
+def search_stories(uid, query, limit=MAX_RESULTS):
+    """Search one user's stories. Returns [] (and logs) if the index fails."""
+    try:
+        return get_index().search(uid, query, limit)
+    except Exception as e:
+        logger.error("search failed for %s: %s", uid, e)
+        return []
+
+# ─────────────────────────────────────────────────────────────
+# BULK BUILD
+# ─────────────────────────────────────────────────────────────
+
+STORY_FIELDS = ["title", "content", "prompts", "createdAt"]
+
+def rebuild(store, index, clear=False):
+    """Index every story in the store, streaming one user at a time.
+
+    Stories already in the index are skipped, so an interrupted build can
+    just be run again.
+
+    Returns:
+        dict: 'users', 'stories' seen and 'added' to the index.
+    """
+    if clear:
+        index.clear()
+    users = stories = added = 0
+    started = time.monotonic()
+    pending = []
+    for user in store.iter_users(fields=[]):
+        users += 1
+        for story in store.iter_stories(user["uid"], fields=STORY_FIELDS):
+            stories += 1
+            content = compression.decompress_content(story.get("content"))
+            pending.append((user["uid"], story["id"], story.get("title"), content,
+                            story.get("prompts"), story.get("createdAt")))
+            if len(pending) >= REBUILD_BATCH:
+                added += index.add_many(pending)
+                pending = []
+        if users % 100 == 0:
+            logger.info("%d users, %d stories (%d new) in %.0fs", users, stories, added, time.monotonic() - started)
+    if pending:
+        added += index.add_many(pending)
+    return {"users": users, "stories": stories, "added": added}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the story search index from the store.")
+    parser.add_argument("--rebuild", action="store_true", help="index every story that isn't indexed yet")
+    parser.add_argument("--clear", action="store_true", help="drop the whole index first")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.error("nothing to do (pass --rebuild)")
+
+    import utils.database as db
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    totals = rebuild(db.get_store(), get_index(), clear=args.clear)
+    print(f"indexed {totals['added']} new stories ({totals['stories']} stories, {totals['users']} users)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Server-side sessions — the cookie only carries an opaque session id.
+
+Flask's default session signs the whole session into the cookie, so every
+request uploads it and re-verifies its HMAC. Here the session data stays
+on the server, and the cookie just holds a random 256-bit id. That keeps
+requests small, and lets us keep per-session state that would be too big
+or too private for a cookie.
+
+Pick a backend with PROMPTL_SESSIONS:
+
+    sqlite   (default) a local file shared by every worker on the machine
+             (PROMPTL_SESSION_DB, default sessions.db)
+    memory   an in-process LRU — single-worker dev only, since each
+             gunicorn worker would have its own
+    cookie   flask's signed-cookie sessions, as before
+
+Sessions expire PERMANENT_SESSION_LIFETIME after their last write. A
+session that's only read gets its expiry pushed out at most once per
+SESSION_TOUCH_INTERVAL, so plain page views don't each cost a write.
+Expired rows are purged every so often as sessions are saved.
+
+note: sqlite sessions live on the instance's own disk, so a host that
+wipes the disk on deploy logs everyone out then.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+
+DEFAULT_SESSION_DB = "sessions.db"
+MEMORY_SESSIONS = 10000           # max sessions the memory backend keeps
+SESSION_TOUCH_INTERVAL = 3600     # seconds between expiry refreshes of an unchanged session
+PURGE_EVERY = 500                 # sqlite: purge expired rows every N saves
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id        TEXT PRIMARY KEY,
+    data      TEXT NOT NULL,
+    expiresAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expiresAt);
+"""
+
+class ServerSession(SecureCookieSession):
+    """A session dict plus the id it's stored under.
+
+    Same modified/accessed tracking as flask's cookie session; `sid` is
+    None until the session is first saved.
+    """
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.regenerated = False
+
+    def regenerate(self):
+        """Move the session to a fresh id (call on login, so an id planted
+        before login can't be used to ride along after it)."""
+        self.regenerated = True
+        self.modified = True
+
+# ─────────────────────────────────────────────────────────────
+# BACKENDS
+# ─────────────────────────────────────────────────────────────
+
+# a store keeps each session as (expires_at, serialized data) — it never
+# looks inside the data
+
+class MemorySessionStore:
+    """Sessions in a per-process LRU dict."""
+
+    def __init__(self, maxsize=MEMORY_SESSIONS):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # sid -> (expires_at, data)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._entries[sid] = (expires_at, data)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+class SQLiteSessionStore:
+    """Sessions in a local sqlite file, shared by every worker process.
+
+    Connections are per thread and opened on first use — never in the
+    gunicorn master before the fork.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._saves = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        row = self._conn().execute(
+            "SELECT data, expiresAt FROM sessions WHERE id = ? AND expiresAt > ?", (sid, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return row[1], row[0]
+
+    def save(self, sid, data, expires_at):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO sessions (id, data, expiresAt) VALUES (?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET data = excluded.data, expiresAt = excluded.expiresAt",
+            (sid, data, expires_at),
+        )
+        # racy across threads, but a purge that's a save early or late is fine
+        self._saves += 1
+        if self._saves % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM sessions WHERE expiresAt <= ?", (time.time(),))
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+# ─────────────────────────────────────────────────────────────
+# FLASK SESSION INTERFACE
+# ─────────────────────────────────────────────────────────────
+
+class ServerSessionInterface(SessionInterface):
+    """Loads/saves the session from a backend store, keyed by the cookie's id."""
+
+    session_class = ServerSession
+    # the same tagged JSON flask's cookie sessions use, so anything that
+    # fit in a cookie session fits here
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self.store.load(sid)
+            if loaded is not None:
+                expires_at, data = loaded
+                return self.session_class(self.serializer.loads(data), sid=sid, expires_at=expires_at)
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        # emptied (logout) → drop it server-side too
+        if not session:
+            if session.modified:
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add("Cookie")
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        stale = session.expires_at is None or session.expires_at - now < lifetime - SESSION_TOUCH_INTERVAL
+        if not (session.modified or stale):
+            return
+
+        if session.regenerated and session.sid:
+            self.store.delete(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = now + lifetime
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), session.expires_at)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add("Cookie")
+
+def create_session_interface(backend=None):
+    """Build the session interface named by `backend` (or PROMPTL_SESSIONS).
+
+    Returns:
+        SessionInterface: Or None for `cookie` (keep flask's default).
+    """
+    backend = (backend or os.getenv("PROMPTL_SESSIONS") or "sqlite").lower()
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        return ServerSessionInterface(MemorySessionStore())
+    if backend == "sqlite":
+        return ServerSessionInterface(SQLiteSessionStore(os.getenv("PROMPTL_SESSION_DB", DEFAULT_SESSION_DB)))
+    raise RuntimeError(f"unknown PROMPTL_SESSIONS backend: {backend!r}")
+
+def init_app(app):
+    """Swap in the configured server-side session backend."""
+    interface = create_session_interface()
+    if interface is not None:
+        app.session_interface = interface
+
+def regenerate(session):
+    """Give a server-side session a fresh id (no-op for cookie sessions)."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
@@ -0,0 +1,344 @@
+"""SQLite storage backend — for local runs, benchmarks and small deployments.
+
+Select it with PROMPTL_STORAGE=sqlite (the file goes to PROMPTL_SQLITE_PATH).
+The database runs in WAL mode so readers never block the writer, and each
+thread gets its own connection (sqlite connections can't be shared across
+threads safely).
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from utils.storage import DEFAULT_SQLITE_PATH, LEADERBOARD_FIELDS, LEADERBOARDS, LISTING_FIELDS, SITE_COUNTERS, StoryStore, next_streak
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    uid           TEXT PRIMARY KEY,
+    email         TEXT,
+    displayName   TEXT,
+    createdAt     TEXT NOT NULL,
+    totalPoints   INTEGER NOT NULL DEFAULT 0,
+    totalWords    INTEGER NOT NULL DEFAULT 0,
+    currentStreak INTEGER NOT NULL DEFAULT 0,
+    lastStoryDate TEXT,
+    version       INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS stories (
+    id           TEXT PRIMARY KEY,
+    uid          TEXT NOT NULL REFERENCES users(uid),
+    title        TEXT NOT NULL,
+    content      TEXT NOT NULL,
+    prompts      TEXT NOT NULL,
+    wordCount    INTEGER NOT NULL DEFAULT 0,
+    pointsEarned INTEGER NOT NULL DEFAULT 0,
+    createdAt    TEXT NOT NULL
+);
+
+-- the archive query: one user's stories, newest first (id breaks ties so
+-- page cursors are exact)
+CREATE INDEX IF NOT EXISTS stories_uid_created ON stories (uid, createdAt DESC, id DESC);
+
+-- leaderboards: the top N by each total is a walk down one of these
+CREATE INDEX IF NOT EXISTS users_total_points ON users (totalPoints DESC);
+CREATE INDEX IF NOT EXISTS users_total_words ON users (totalWords DESC);
+CREATE INDEX IF NOT EXISTS users_current_streak ON users (currentStreak DESC);
+
+-- site-wide counters (users, stories, points, words), bumped on every save
+CREATE TABLE IF NOT EXISTS site_stats (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_BUMP_COUNTER = (
+    "INSERT INTO site_stats (name, value) VALUES (?, ?)"
+    " ON CONFLICT (name) DO UPDATE SET value = value + excluded.value"
+)
+
+# columns added after the first release: (table, column, definition). files
+# created before them get the column added on open
+_ADDED_COLUMNS = [
+    ("users", "version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# columns that hold timestamps / json, so rows can be turned back into the
+# same shapes firestore returns
+_TIMESTAMP_FIELDS = ("createdAt", "lastStoryDate")
+_JSON_FIELDS = ("prompts",)
+
+def _to_db_time(value):
+    """Store timestamps as fixed-width ISO strings so they sort correctly as text."""
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds") if value else None
+
+def _row_to_dict(row):
+    data = dict(row)
+    for field in _TIMESTAMP_FIELDS:
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    for field in _JSON_FIELDS:
+        if data.get(field):
+            data[field] = json.loads(data[field])
+    return data
+
+def _new_story_id():
+    """A random 20-char id, like the ones firestore's add() generates."""
+    return secrets.token_urlsafe(15)
+
+class SQLiteStore(StoryStore):
+    """Stores users + stories in a local sqlite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # create the schema up front so every later connection can skip it
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        for table, column, definition in _ADDED_COLUMNS:
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("PROMPTL_SQLITE_PATH", DEFAULT_SQLITE_PATH))
+
+    def _conn(self):
+        """Get this thread's connection, opening (and tuning) it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None → we manage transactions explicitly with BEGIN
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, far fewer fsyncs
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, conn):
+        """Context manager for a write transaction (BEGIN IMMEDIATE takes the write lock up front)."""
+        return _Transaction(conn)
+
+    # ─────────────────────────────────────────────────────────
+    # USER OPERATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def get_or_create_user(self, uid, email, display_name=None):
+        user = self.get_user(uid)
+        if user is not None:
+            return user
+
+        # first time login — create their row with default values
+        new_user = {
+            "email": email,
+            "displayName": display_name or email.split("@")[0],
+            "createdAt": datetime.now(timezone.utc),
+            "totalPoints": 0,
+            "totalWords": 0,
+            "currentStreak": 0,
+            "lastStoryDate": None,
+        }
+        conn = self._conn()
+        with self._transaction(conn):
+            # OR IGNORE: if a concurrent login created it first, keep theirs
+            created = conn.execute(
+                "INSERT OR IGNORE INTO users (uid, email, displayName, createdAt) VALUES (?, ?, ?, ?)",
+                (uid, new_user["email"], new_user["displayName"], _to_db_time(new_user["createdAt"])),
+            ).rowcount
+            if created:
+                conn.execute(_BUMP_COUNTER, ("users", 1))
+        return self.get_user(uid)
+
+    def get_user(self, uid):
+        row = self._conn().execute("SELECT * FROM users WHERE uid = ?", (uid,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    # ─────────────────────────────────────────────────────────
+    # STORY OPERATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def add_story(self, uid, title, story_content, prompts, word_count, points_earned, user_hint=None,
+                  story_id=None, created_at=None):
+        story_id = story_id or _new_story_id()
+        now = created_at or datetime.now(timezone.utc)
+        conn = self._conn()
+
+        # story insert + totals + streak all commit together
+        with self._transaction(conn):
+            if conn.execute("SELECT 1 FROM stories WHERE id = ?", (story_id,)).fetchone():
+                return story_id, None  # already saved — a retry mustn't count twice
+            conn.execute(
+                "INSERT INTO stories (id, uid, title, content, prompts, wordCount, pointsEarned, createdAt)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (story_id, uid, title, story_content, json.dumps(prompts),
+                 word_count, points_earned, _to_db_time(now)),
+            )
+            row = conn.execute(
+                "SELECT currentStreak, lastStoryDate FROM users WHERE uid = ?", (uid,)
+            ).fetchone()
+            user = _row_to_dict(row)
+            new_streak = next_streak(user["lastStoryDate"], user["currentStreak"], now.date())
+            conn.execute(
+                "UPDATE users SET totalPoints = totalPoints + ?, totalWords = totalWords + ?,"
+                " currentStreak = ?, lastStoryDate = ?, version = version + 1 WHERE uid = ?",
+                (points_earned, word_count, new_streak, _to_db_time(now), uid),
+            )
+            conn.executemany(_BUMP_COUNTER, [("stories", 1), ("points", points_earned), ("words", word_count)])
+            updated_user = _row_to_dict(conn.execute("SELECT * FROM users WHERE uid = ?", (uid,)).fetchone())
+        return story_id, updated_user
+
+    def get_user_stories(self, uid):
+        rows = self._conn().execute(
+            "SELECT * FROM stories WHERE uid = ? ORDER BY createdAt DESC", (uid,)
+        ).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def get_story(self, uid, story_id):
+        # scoped by uid too, so we can't return another user's story
+        row = self._conn().execute(
+            "SELECT * FROM stories WHERE id = ? AND uid = ?", (story_id, uid)
+        ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def get_user_stories_page(self, uid, page_size, after=None, before=None, fields=None):
+        # no `content` in listings, unless asked for
+        columns = ", ".join(["id"] + [_column(f) for f in (fields or LISTING_FIELDS)])
+        conn = self._conn()
+
+        # fetch one extra row to find out whether there's another page
+        if before is not None:
+            created_at, story_id = before
+            rows = conn.execute(
+                f"SELECT {columns} FROM stories WHERE uid = ? AND (createdAt, id) > (?, ?)"
+                " ORDER BY createdAt ASC, id ASC LIMIT ?",
+                (uid, _to_db_time(created_at), story_id, page_size + 1),
+            ).fetchall()
+            has_more = len(rows) > page_size
+            rows = rows[:page_size][::-1]  # back to newest first
+        else:
+            where, params = "uid = ?", [uid]
+            if after is not None:
+                created_at, story_id = after
+                where += " AND (createdAt, id) < (?, ?)"
+                params += [_to_db_time(created_at), story_id]
+            rows = conn.execute(
+                f"SELECT {columns} FROM stories WHERE {where} ORDER BY createdAt DESC, id DESC LIMIT ?",
+                (*params, page_size + 1),
+            ).fetchall()
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+
+        return [_row_to_dict(row) for row in rows], has_more
+
+    # ─────────────────────────────────────────────────────────
+    # LEADERBOARDS + SITE STATS
+    # ─────────────────────────────────────────────────────────
+
+    def get_leaderboard(self, field, limit, active_since=None):
+        if field not in LEADERBOARDS.values():
+            raise ValueError(f"unknown leaderboard field: {field!r}")
+        columns = ", ".join(["uid"] + LEADERBOARD_FIELDS)
+        where, params = "", []
+        if active_since is not None:
+            where, params = "WHERE lastStoryDate >= ?", [_to_db_time(active_since)]
+        rows = self._conn().execute(
+            f"SELECT {columns} FROM users {where} ORDER BY {field} DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def get_site_stats(self):
+        stats = dict.fromkeys(SITE_COUNTERS, 0)
+        stats.update(self._conn().execute("SELECT name, value FROM site_stats").fetchall())
+        return stats
+
+    def set_site_stats(self, stats):
+        conn = self._conn()
+        with self._transaction(conn):
+            conn.execute("DELETE FROM site_stats")
+            conn.executemany(
+                "INSERT INTO site_stats (name, value) VALUES (?, ?)",
+                [(name, stats.get(name, 0)) for name in SITE_COUNTERS],
+            )
+
+    # ─────────────────────────────────────────────────────────
+    # BULK OPERATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def iter_users(self, fields=None, start_after=None):
+        columns = ", ".join(["uid"] + [_column(f) for f in fields]) if fields is not None else "*"
+        # a separate connection so streaming doesn't collide with writes on this thread's
+        conn = self._stream_conn()
+        rows = conn.execute(
+            f"SELECT {columns} FROM users WHERE uid > ? ORDER BY uid", (start_after or "",)
+        )
+        try:
+            for row in rows:
+                yield _row_to_dict(row)
+        finally:
+            conn.close()
+
+    def iter_stories(self, uid, fields=None):
+        columns = ", ".join(["id"] + [_column(f) for f in fields]) if fields is not None else "*"
+        conn = self._stream_conn()
+        rows = conn.execute(f"SELECT {columns} FROM stories WHERE uid = ?", (uid,))
+        try:
+            for row in rows:
+                yield _row_to_dict(row)
+        finally:
+            conn.close()
+
+    def apply_updates(self, updates):
+        conn = self._conn()
+        with self._transaction(conn):
+            for uid, story_id, fields in updates:
+                assignments = ", ".join(f"{_column(field)} = ?" for field in fields)
+                values = [_to_db_value(field, value) for field, value in fields.items()]
+                if story_id is None:
+                    conn.execute(f"UPDATE users SET {assignments} WHERE uid = ?", (*values, uid))
+                else:
+                    conn.execute(
+                        f"UPDATE stories SET {assignments} WHERE id = ? AND uid = ?",
+                        (*values, story_id, uid),
+                    )
+
+    def _stream_conn(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+_COLUMNS = {
+    "email", "displayName", "createdAt", "totalPoints", "totalWords", "currentStreak",
+    "lastStoryDate", "title", "content", "prompts", "wordCount", "pointsEarned",
+}
+
+def _column(field):
+    """Whitelist field names before they're formatted into SQL."""
+    if field not in _COLUMNS:
+        raise ValueError(f"unknown field: {field!r}")
+    return field
+
+def _to_db_value(field, value):
+    if field in _TIMESTAMP_FIELDS:
+        return _to_db_time(value)
+    if field in _JSON_FIELDS:
+        return json.dumps(value)
+    return value
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (or ROLLBACK if the block raises)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
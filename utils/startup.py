@@ -0,0 +1,61 @@
+"""Startup warm-up, split around gunicorn's fork.
+
+Nothing heavy happens at import time anymore: firebase, google.auth and
+the storage clients all load on first use. Left alone, that first use is
+some user's first request. gunicorn.conf.py moves it earlier instead:
+
+  preload()      in the master, once (preload_app=True). Imports the
+                 storage backend + JWT libraries, fetches the token
+                 signing certs, reads the asset manifest and compiles
+                 every template. No sockets, threads or database
+                 handles survive it, so forking after it is safe and
+                 every worker inherits the work.
+  warm_worker()  in each worker, after the fork. Opens the storage
+                 client(s), starts the database_async I/O loop and (with
+                 PROMPTL_JOURNAL) the journal drain thread —
+                 grpc channels, sqlite connections and threads must
+                 never be created before a fork.
+
+See benchmarks/startup.py for the import-cost and time-to-first-request
+report.
+"""
+
+import logging
+import time
+
+import utils.database as db
+import utils.database_async as adb
+import utils.journal as journal
+from utils import assets, token_verifier
+from utils.storage import backend_class
+
+logger = logging.getLogger(__name__)
+
+def _step(name, fn):
+    """Run one warm-up step, logging how long it took. Failures are logged,
+    not raised — the app still works, it just pays for that step later."""
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        logger.warning("%s failed (%s), leaving it for the first request", name, e)
+        return
+    logger.info("%s took %.1f ms", name, (time.perf_counter() - started) * 1000)
+
+def _compile_templates(app):
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+def preload(app):
+    """Fork-safe warm-up, for the gunicorn master (or any single process)."""
+    _step("storage backend import", backend_class)
+    _step("token verifier", token_verifier.preload)
+    _step("asset manifest", assets.load_manifest)
+    _step("templates", lambda: _compile_templates(app))
+
+def warm_worker():
+    """Per-process warm-up — open clients/connections. Run after any fork."""
+    _step("storage client", lambda: db.get_store().warm_up())
+    _step("async I/O loop", adb.warm_up)
+    if journal.ENABLED:
+        _step("story journal", journal.start)
@@ -0,0 +1,246 @@
+"""Storage backend interface for Promptl.
+
+utils/database.py is what the routes call; it forwards every user/story
+operation to a StoryStore picked by the PROMPTL_STORAGE env var:
+
+    PROMPTL_STORAGE=firestore   (default) — utils/firestore_store.py
+    PROMPTL_STORAGE=sqlite      — utils/sqlite_store.py, file at PROMPTL_SQLITE_PATH
+
+Every backend returns the same dict shapes firestore does (camelCase field
+names, datetimes for timestamps, 'uid'/'id' added), so nothing above this
+layer needs to know which one is running.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_BACKEND = "firestore"
+DEFAULT_SQLITE_PATH = "promptl.db"
+
+# the only story fields the archive listing shows — never the full content
+LISTING_FIELDS = ["title", "wordCount", "pointsEarned", "createdAt"]
+
+# leaderboards (name -> the user field they rank by), the user fields a
+# leaderboard row needs, and the site-wide counters kept next to them
+LEADERBOARDS = {"points": "totalPoints", "words": "totalWords", "streak": "currentStreak"}
+LEADERBOARD_FIELDS = ["displayName", "totalPoints", "totalWords", "currentStreak", "lastStoryDate"]
+SITE_COUNTERS = ("users", "stories", "points", "words")
+
+class StoryStore(ABC):
+    """Base class for storage backends — subclasses implement every abstract method
+    (a backend missing one fails when it's created, not on the first request)."""
+
+    @classmethod
+    def from_env(cls):
+        """Build the backend from its env settings (the base one has none)."""
+        return cls()
+
+    # ── user operations ──
+
+    @abstractmethod
+    def get_or_create_user(self, uid, email, display_name=None):
+        """Fetch a user doc (with 'uid'), creating it with default stats on first login."""
+
+    @abstractmethod
+    def get_user(self, uid):
+        """Fetch a user doc (with 'uid'), or None if it doesn't exist."""
+
+    # ── story operations ──
+
+    @abstractmethod
+    def add_story(self, uid, title, story_content, prompts, word_count, points_earned, user_hint=None,
+                  story_id=None, created_at=None):
+        """Save a story and update the author's totals + streak, and bump
+        their `version` (which keys their cached pages, see utils/page_cache.py).
+
+        Args:
+            story_content (str | bytes): Stored as given — text, or bytes
+                from utils/compression.py (readers get back whichever it was).
+            user_hint (dict, optional): A recent copy of the user doc (e.g. from
+                a cache). Backends may use it to skip re-reading the user, as
+                long as they verify it's still current before committing.
+            story_id (str, optional): Save under this id instead of a new one.
+                If a story with this id already exists nothing is written and
+                the user comes back as None — so a retried save can't count
+                twice (utils/journal.py relies on this).
+            created_at (datetime, optional): When the story was written, if
+                it's being saved later (defaults to now).
+
+        Returns:
+            tuple: (story_id, user) — the user doc as it is after the save,
+                   or None if the backend can't tell.
+        """
+
+    @abstractmethod
+    def get_user_stories(self, uid):
+        """Fetch all of a user's stories (with 'id'), newest first."""
+
+    @abstractmethod
+    def get_story(self, uid, story_id):
+        """Fetch one of a user's stories (with 'id'), or None if it doesn't exist."""
+
+    @abstractmethod
+    def get_user_stories_page(self, uid, page_size, after=None, before=None, fields=None):
+        """Fetch one page of a user's story listing, newest first.
+
+        Only LISTING_FIELDS (+ 'id') are fetched, unless `fields` says
+        otherwise. Pages are keyed by a (createdAt, id) cursor, so every page
+        costs the same no matter how deep into the archive it is.
+
+        Args:
+            page_size (int): Stories per page.
+            after (tuple, optional): (createdAt, id) cursor — the page of stories older than it.
+            before (tuple, optional): (createdAt, id) cursor — the page of stories newer than it.
+            fields (list, optional): Fetch these fields instead (must include createdAt).
+
+        Returns:
+            tuple: (stories, has_more) — has_more says whether there are more
+                   stories past this page in the direction we were moving.
+        """
+
+    # ── leaderboards + site stats ──
+
+    @abstractmethod
+    def get_leaderboard(self, field, limit, active_since=None):
+        """Fetch the top users by one of their running totals, highest first.
+
+        Read straight off an index on `field`, so it costs O(log n + limit)
+        however many users there are. Rows hold 'uid' + LEADERBOARD_FIELDS.
+
+        Args:
+            field (str): One of the LEADERBOARDS fields.
+            limit (int): How many users.
+            active_since (datetime, optional): Skip users whose last story is
+                older than this (a stored streak is stale once they stop).
+        """
+
+    @abstractmethod
+    def get_site_stats(self):
+        """Site-wide counters (SITE_COUNTERS), kept up to date by every save."""
+
+    @abstractmethod
+    def set_site_stats(self, stats):
+        """Overwrite the site-wide counters (used by the leaderboard rebuild)."""
+
+    def async_store(self):
+        """Return an asyncio flavour of this backend, or None if it has no
+        native async client (utils/database_async.py then uses threads)."""
+        return None
+
+    def warm_up(self):
+        """Open clients/connections now instead of on the first request
+        (called once per gunicorn worker, after the fork)."""
+
+    # ── bulk operations (used by maintenance jobs like utils/rescore.py) ──
+
+    @abstractmethod
+    def iter_users(self, fields=None, start_after=None):
+        """Stream user docs (with 'uid') in uid order.
+
+        Args:
+            fields (list, optional): Only fetch these fields.
+            start_after (str, optional): Skip every uid up to and including this one.
+        """
+
+    @abstractmethod
+    def iter_stories(self, uid, fields=None):
+        """Stream all of a user's story docs (with 'id'), in no particular order."""
+
+    @abstractmethod
+    def apply_updates(self, updates):
+        """Apply a list of field updates in one batch.
+
+        Args:
+            updates (list): (uid, story_id, fields) tuples. story_id None
+                            means the fields are for the user doc itself.
+        """
+
+def next_streak(last_story_date, current_streak, today):
+    """Work out a user's streak after they save a story today.
+
+    Streak logic:
+      - If they've never written: streak = 1
+      - If last story was today: streak unchanged (multiple stories same day = same streak)
+      - If last story was yesterday: streak += 1
+      - If last story was 2+ days ago: streak resets to 1
+
+    Note: this uses UTC dates. for a production app you'd want to use the
+    user's local timezone, but UTC is fine for now.
+
+    Args:
+        last_story_date (datetime | date | None): When they last saved a story.
+        current_streak (int | None): Their streak as stored.
+        today (date): Today's (UTC) date.
+
+    Returns:
+        int: The new streak value.
+    """
+    # backends return timestamps as datetime objects — extract just the date part
+    if last_story_date is not None and hasattr(last_story_date, "date"):
+        last_story_date = last_story_date.date()
+
+    if last_story_date is None:
+        return 1  # first story ever
+    if last_story_date == today:
+        return current_streak if current_streak is not None else 1  # already wrote today, no change
+    if last_story_date == today - timedelta(days=1):
+        return (current_streak or 0) + 1  # consecutive day! 🔥
+    return 1  # streak broken, restart at 1
+
+def streak_cutoff(today):
+    """The oldest lastStoryDate a streak is still alive at (start of yesterday, UTC).
+
+    The stored currentStreak only changes when someone saves a story, so a
+    user who stopped writing keeps their old number until then.
+    """
+    return datetime.combine(today - timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+
+# ─────────────────────────────────────────────────────────────
+# PAGE CURSORS
+# ─────────────────────────────────────────────────────────────
+# cursors go in /prior-pieces URLs as "<createdAt in µs since epoch>.<story id>"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_cursor(story):
+    """Turn a listed story into an opaque page token."""
+    micros = (story["createdAt"] - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{story['id']}"
+
+def decode_cursor(token):
+    """Turn a page token back into a (createdAt, id) cursor.
+
+    Raises:
+        ValueError: if the token is malformed.
+    """
+    micros, _, story_id = token.partition(".")
+    if not story_id:
+        raise ValueError(f"bad page token: {token!r}")
+    try:
+        return _EPOCH + timedelta(microseconds=int(micros)), story_id
+    except OverflowError:
+        # a timestamp past the years datetime can hold
+        raise ValueError(f"bad page token: {token!r}") from None
+
+def backend_class(backend=None):
+    """Import and return the store class named by `backend` (or PROMPTL_STORAGE).
+
+    Only imports — no clients or connections — so it's safe to call in the
+    gunicorn master before workers fork (see gunicorn.conf.py).
+    """
+    backend = (backend or os.getenv("PROMPTL_STORAGE") or DEFAULT_BACKEND).lower()
+
+    # backends are imported lazily so the sqlite one never pulls in firebase
+    if backend == "firestore":
+        from utils.firestore_store import FirestoreStore
+        return FirestoreStore
+    if backend == "sqlite":
+        from utils.sqlite_store import SQLiteStore
+        return SQLiteStore
+
+    raise RuntimeError(f"unknown PROMPTL_STORAGE backend: {backend!r}")
+
+def create_store(backend=None):
+    """Build the storage backend named by `backend` (or PROMPTL_STORAGE)."""
+    return backend_class(backend).from_env()
@@ -0,0 +1,287 @@
+"""Firebase ID token verification with local caching.
+
+firebase_auth.verify_id_token() is correct but does the same work again for
+every call, even for a token it verified a second ago (tab switches and
+frontend retries send the same token over and over). This verifier:
+
+  - caches Google's public signing certificates for as long as their HTTP
+    Cache-Control says they're valid (refetching early only if a token is
+    signed with a key we haven't seen yet). One thread refetches them while
+    the rest keep verifying against the old ones
+  - remembers every token it has verified (keyed by a hash of the token)
+    until that token's own `exp`, so repeat verifications are a dict lookup
+  - keeps timing + counter metrics (see token_metrics())
+
+The checks are the same ones the firebase admin SDK does: RS256 signature
+against Google's certs, `exp`/`iat`, audience = our project id, issuer =
+securetoken.google.com/<project id>, and a non-empty `sub` (the uid).
+
+When the auth emulator is in use (its tokens are unsigned), or our project
+id can't be worked out, verification falls back to the firebase SDK.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CERTS_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com"
+)
+ISSUER_PREFIX = "https://securetoken.google.com/"
+
+DEFAULT_CERT_TTL = 3600        # seconds, if google doesn't send a max-age
+MIN_REFRESH_INTERVAL = 60      # seconds between "unknown key id" refetches
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class InvalidTokenError(ValueError):
+    """The token failed one of the verification checks."""
+
+# ─────────────────────────────────────────────────────────────
+# METRICS
+# ─────────────────────────────────────────────────────────────
+
+class _Timer:
+    """Count + total/max duration of something we time."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+# ─────────────────────────────────────────────────────────────
+# SIGNING CERTIFICATES
+# ─────────────────────────────────────────────────────────────
+
+class CertCache:
+    """Google's token-signing certs, cached for their HTTP lifetime."""
+
+    def __init__(self, url=CERTS_URL):
+        self.url = url
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()        # guards the fields above, never held over the network
+        self._fetch_lock = threading.Lock()  # held by the one thread fetching
+        self.fetch_timer = _Timer()
+
+    def _needs_fetch(self, now, key_id):
+        """Call with self._lock held."""
+        unknown_key = (
+            key_id is not None
+            and key_id not in self._certs
+            and now - self._fetched_at >= MIN_REFRESH_INTERVAL
+        )
+        return now >= self._expires_at or unknown_key
+
+    def get(self, key_id=None):
+        """Return the {key id: PEM cert} map, refetching it when it's stale.
+
+        If key_id is given and isn't in the (fresh) map, the certs are
+        refetched once — google may have just rotated keys — but no more
+        often than MIN_REFRESH_INTERVAL.
+
+        Only one thread fetches at a time. While it does, other callers get
+        the certs they'd have had anyway (stale ones still verify tokens
+        signed with their keys) — only a caller with nothing usable waits.
+        """
+        with self._lock:
+            certs = self._certs
+            if not self._needs_fetch(time.time(), key_id):
+                return certs
+        usable = bool(certs) and (key_id is None or key_id in certs)
+        if not self._fetch_lock.acquire(blocking=not usable):
+            return certs  # someone else is already fetching
+        try:
+            with self._lock:
+                # a fetch may have finished while we waited for the lock
+                if not self._needs_fetch(time.time(), key_id):
+                    return self._certs
+            now = time.time()
+            try:
+                fetched, lifetime = self._fetch()
+            except Exception:
+                if not usable:
+                    raise
+                logger.warning("refetching google's signing certs failed, using the old ones", exc_info=True)
+                return certs
+            with self._lock:
+                self._certs = fetched
+                self._fetched_at = now
+                self._expires_at = now + lifetime
+                return fetched
+        finally:
+            self._fetch_lock.release()
+
+    def _fetch(self):
+        """Download the certs. Returns (certs, seconds they stay fresh)."""
+        import requests
+
+        started = time.perf_counter()
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        self.fetch_timer.record(time.perf_counter() - started)
+        return response.json(), _cache_lifetime(response.headers)
+
+def _cache_lifetime(headers):
+    """Seconds a response stays fresh, from its Cache-Control (minus Age)."""
+    match = _MAX_AGE.search(headers.get("Cache-Control", ""))
+    lifetime = int(match.group(1)) if match else DEFAULT_CERT_TTL
+    try:
+        lifetime -= int(headers.get("Age", 0))
+    except ValueError:
+        pass
+    return max(lifetime, 0)
+
+# ─────────────────────────────────────────────────────────────
+# VERIFIER
+# ─────────────────────────────────────────────────────────────
+
+def _project_id():
+    """Our firebase project id (the expected token audience), or None."""
+    cred_json = os.getenv("FIREBASE_CREDENTIALS")
+    if cred_json:
+        try:
+            project_id = json.loads(cred_json).get("project_id")
+        except ValueError:
+            project_id = None
+        if project_id:
+            return project_id
+    return os.getenv("FIREBASE_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+
+class TokenVerifier:
+    """Verifies firebase ID tokens, memoizing the good ones until they expire."""
+
+    def __init__(self, project_id=None, cert_cache=None, max_tokens=VERIFIED_TOKEN_CACHE_SIZE):
+        self.project_id = project_id
+        self.certs = cert_cache or CertCache()
+        self.max_tokens = max_tokens
+        self._verified = OrderedDict()  # sha256(token) -> decoded claims
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.verify_timer = _Timer()  # full (non-memoized) verifications
+
+    def verify(self, id_token):
+        """Verify a token and return its decoded claims (with 'uid').
+
+        Raises:
+            InvalidTokenError (or a google.auth error): if the token is bad.
+        """
+        key = hashlib.sha256(id_token.encode()).digest()
+        now = time.time()
+
+        with self._lock:
+            claims = self._verified.get(key)
+            if claims is not None and claims["exp"] > now:
+                self._verified.move_to_end(key)
+                self.hits += 1
+                return dict(claims)
+            self._verified.pop(key, None)  # expired (or never seen)
+            self.misses += 1
+
+        started = time.perf_counter()
+        try:
+            claims = self._verify_uncached(id_token)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            self.verify_timer.record(time.perf_counter() - started)
+
+        with self._lock:
+            self._verified[key] = claims
+            while len(self._verified) > self.max_tokens:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def _verify_uncached(self, id_token):
+        project_id = self.project_id or _project_id()
+        if os.getenv("FIREBASE_AUTH_EMULATOR_HOST") or not project_id:
+            # emulator tokens aren't signed — let the SDK handle those
+            return self._verify_with_sdk(id_token)
+
+        from google.auth import jwt
+
+        header = jwt.decode_header(id_token)
+        if header.get("alg") != "RS256":
+            raise InvalidTokenError(f"unexpected token algorithm: {header.get('alg')!r}")
+        key_id = header.get("kid")
+        certs = self.certs.get(key_id)
+        if key_id not in certs:
+            raise InvalidTokenError("token signed with an unknown key")
+
+        # checks the signature, exp/iat and the audience
+        claims = jwt.decode(id_token, certs={key_id: certs[key_id]}, audience=project_id)
+
+        if claims.get("iss") != ISSUER_PREFIX + project_id:
+            raise InvalidTokenError("token has the wrong issuer")
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise InvalidTokenError("token has no valid subject (uid)")
+        if claims.get("auth_time", 0) > time.time():
+            raise InvalidTokenError("token auth_time is in the future")
+
+        claims["uid"] = sub
+        return claims
+
+    def _verify_with_sdk(self, id_token):
+        from firebase_admin import auth as firebase_auth
+        from utils.firebase_app import initialize_firebase
+
+        initialize_firebase()
+        return firebase_auth.verify_id_token(id_token)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "cached_tokens": len(self._verified),
+                "hits": self.hits,
+                "misses": self.misses,
+                "failures": self.failures,
+                "verify": self.verify_timer.snapshot(),
+                "cert_fetch": self.certs.fetch_timer.snapshot(),
+            }
+
+_verifier = TokenVerifier()
+
+def verify_id_token(id_token):
+    """Verify a firebase ID token (memoized). Raises if it's invalid."""
+    return _verifier.verify(id_token)
+
+def token_metrics():
+    """Hit/miss/failure counters and verify/cert-fetch timings for this worker."""
+    return _verifier.metrics()
+
+def preload():
+    """Import the JWT code and fetch the signing certs ahead of the first login.
+
+    Holds no connections afterwards (the certs are just a dict), so it's
+    safe in the gunicorn master — every worker then starts with them.
+    """
+    from google.auth import jwt  # noqa: F401
+
+    _verifier.certs.get()